@@ -1,108 +1,514 @@
-from typing import Dict, List, Tuple, Set
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union, TYPE_CHECKING
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import heapq
 import math
-import networkx as nx
-from utils.graph_constructor import constroi_grafo
+import multiprocessing
+import time
+import numpy as np
+from utils.matriz_distancias import MatrizDistancias, como_matriz
 from utils.bb_utils import (
-    gerar_rotas_factiveis,
-    mapear_clientes_para_rotas,
-    custo_minimo_por_cliente,
-    calcular_lower_bound
+    gerar_rotas,
+    compacta_rotas,
+    mascaras_numpy,
+    ordem_otima,
+    rotas_por_bit,
+    solucao_incumbente,
+    bits,
+    ContextoBB,
+    EstatisticasBB,
+    TabelaTransposicao
 )
+from utils.limitantes import LimitanteInferior, limitante_padrao
+from utils.instrumentacao import Instrumentacao
 
+if TYPE_CHECKING:
+    import networkx as nx
+
+# folga numérica ao comparar limitantes calculados por caminhos diferentes
+_FOLGA = 1e-9
+
+# subproblema da busca: (lb, clientes restantes, rotas fixadas, custo acumulado, estado do limitante)
+Tarefa = Tuple[float, int, Tuple[int, ...], float, object]
+
+
+class _BuscaBB:
+    """
+    estado da busca do branch and bound (incumbente, memo, orçamento e contadores),
+    usado tanto na busca sequencial quanto em cada processo da busca paralela
+    """
+
+    def __init__(
+        self,
+        contexto: ContextoBB,
+        lim: LimitanteInferior,
+        memo_max_mb: float,
+        estatisticas: EstatisticasBB,
+        best_cost: float,
+        prazo: Optional[float] = None,
+        max_nos: Optional[int] = None
+    ) -> None:
+        self.ctx = contexto
+        self.lim = lim
+        self.reduzidos = lim.custos_reduzidos()
+        self.estatisticas = estatisticas
+        # memoização: chave = máscara dos clientes restantes -> melhor custo observado
+        self.memo = TabelaTransposicao(memo_max_mb, estatisticas)
+        self.best_cost = best_cost
+        self.best_rotas: Optional[List[int]] = None
+        self.prazo = prazo
+        self.max_nos = max_nos
+        self.interrompido = False
+        # menor limitante entre os nós que ficaram sem explorar quando o orçamento estourou
+        self.lb_aberto = math.inf
+
+        # busca paralela: ao passar de `limite_tarefa` nós, a tarefa é dividida e os ramos ainda
+        # não explorados vão para `fronteira`; a incumbente é compartilhada entre os processos
+        self.limite_tarefa: Optional[int] = None
+        self.dividindo = False
+        self.fronteira: List[Tarefa] = []
+        self.incumbente = None
+        self.trava = None
+
+        # progresso a cada `intervalo_progresso` nós; só no processo principal
+        self.instrumentacao: Optional[Instrumentacao] = None
+        self.intervalo_progresso = 0
+
+    def estourou_orcamento(self) -> bool:
+        nos = self.estatisticas.nos
+        if self.max_nos is not None and nos >= self.max_nos:
+            self.interrompido = True
+        elif nos % 256 == 0:
+            if self.prazo is not None and time.monotonic() >= self.prazo:
+                self.interrompido = True
+            if self.incumbente is not None and self.incumbente.value < self.best_cost:
+                # outro processo achou uma solução melhor
+                self.best_cost = self.incumbente.value
+        return self.interrompido
+
+    def relata_progresso(self) -> None:
+        e = self.estatisticas
+        self.instrumentacao.notifica(
+            "nos", e.nos, melhor=self.best_cost, podas_lower_bound=e.podas_lower_bound,
+            podas_memo=e.podas_memo, memo_acertos=e.memo_acertos,
+        )
+
+    # escolhemos o cliente entre os restantes com menor número de rotas possíveis, pra não abrir muitos ramos de uma vez
+    def escolher_cliente(self, restantes: int) -> int:
+        rotas_do_bit = self.ctx.rotas_do_bit
+        return min(bits(restantes), key=lambda k: len(rotas_do_bit[k]))
+
+    def filhos(self, restantes: int, current_cost: float, estado_lb) -> Iterator[Tuple[int, int, float, object, float]]:
+        """
+        gera (rota, restantes, custo, estado do limitante, lb) dos filhos do nó que não foram podados
+        """
+        route_masks = self.ctx.route_masks
+        route_costs = self.ctx.route_costs
+        lim = self.lim
+
+        reduzidos = self.reduzidos
+        if reduzidos is not None:
+            base = current_cost + lim.parte_aditiva(estado_lb)
+
+        # escolher cliente para ramificar
+        cliente = self.escolher_cliente(restantes)
+
+        # para cada rota que contenha esse cliente, e que esteja contida nos restantes
+        for ridx in self.ctx.rotas_do_bit[cliente]:
+            if reduzidos is not None and base + reduzidos[ridx] >= self.best_cost + _FOLGA:
+                # as rotas estão em ordem de custo reduzido: as próximas também seriam podadas
+                self.estatisticas.podas_lower_bound += 1
+                break
+            rmask = route_masks[ridx]
+            if rmask & restantes == rmask:
+                new_restantes = restantes ^ rmask
+                new_cost = current_cost + route_costs[ridx]
+
+                # poda direta
+                if new_cost >= self.best_cost:
+                    self.estatisticas.podas_lower_bound += 1
+                    continue
+                # poda por lower bound no novo estado, atualizado de forma incremental
+                novo_estado = lim.apos_rota(estado_lb, new_restantes, ridx)
+                lb = new_cost + lim.valor(novo_estado)
+                if lb >= self.best_cost:
+                    self.estatisticas.podas_lower_bound += 1
+                    continue
+                yield ridx, new_restantes, new_cost, novo_estado, lb
+
+    def nova_solucao(self, current_cost: float, current_routes: List[int]) -> None:
+        if current_cost < self.best_cost:
+            self.best_cost = current_cost
+            self.best_rotas = list(current_routes)
+            self.estatisticas.solucoes += 1
+            if self.incumbente is not None:
+                with self.trava:
+                    if current_cost < self.incumbente.value:
+                        self.incumbente.value = current_cost
+
+    # função recursiva de branch and bound, a dfs vai testar todas as possibilidades que não foram podadas e o lb vai proteger o ramo com a solução exata que queremos
+    def dfs(self, restantes: int, current_routes: List[int], current_cost: float, estado_lb) -> None:
+        self.estatisticas.nos += 1
+        if self.instrumentacao is not None and self.estatisticas.nos % self.intervalo_progresso == 0:
+            self.relata_progresso()
+
+        # caso base: todos atendidos
+        if not restantes:
+            self.nova_solucao(current_cost, current_routes)
+            return
+
+        # já visitamos este conjunto com custo melhor; pode podar
+        if self.memo.deve_podar(restantes, current_cost):
+            return
+
+        # poda por lower bound
+        lb = current_cost + self.lim.valor(estado_lb)
+        if lb >= self.best_cost:
+            self.estatisticas.podas_lower_bound += 1
+            return
+
+        for ridx, new_restantes, new_cost, novo_estado, novo_lb in self.filhos(restantes, current_cost, estado_lb):
+            if self.dividindo:
+                self.fronteira.append((novo_lb, new_restantes, tuple(current_routes) + (ridx,), new_cost, novo_estado))
+                continue
+            if self.interrompido or self.estourou_orcamento():
+                self.lb_aberto = min(self.lb_aberto, lb)
+                return
+            if self.limite_tarefa is not None and self.estatisticas.nos >= self.limite_tarefa:
+                # tarefa grande demais: devolve este ramo e os seguintes para outros processos
+                self.dividindo = True
+                self.fronteira.append((novo_lb, new_restantes, tuple(current_routes) + (ridx,), new_cost, novo_estado))
+                continue
+            current_routes.append(ridx)
+            self.dfs(new_restantes, current_routes, new_cost, novo_estado)
+            current_routes.pop()
+
+    def melhor_primeiro(self, restantes: int, estado_raiz) -> None:
+        # cada nó guarda as rotas fixadas como lista encadeada (rota, pai) para economizar memória
+        fila = [(self.lim.valor(estado_raiz), 0, restantes, 0.0, estado_raiz, None)]
+        contador = 1
+        while fila:
+            lb, _, restantes, current_cost, estado_lb, caminho = heapq.heappop(fila)
+            if lb >= self.best_cost:
+                # todos os nós da fila têm limitante pior que a incumbente
+                break
+            if self.estourou_orcamento():
+                self.lb_aberto = lb
+                break
+            self.estatisticas.nos += 1
+            if self.instrumentacao is not None and self.estatisticas.nos % self.intervalo_progresso == 0:
+                self.relata_progresso()
+            if self.memo.deve_podar(restantes, current_cost):
+                continue
+            for ridx, new_restantes, new_cost, novo_estado, novo_lb in self.filhos(restantes, current_cost, estado_lb):
+                if not new_restantes:
+                    self.nova_solucao(new_cost, _rotas_do_caminho((ridx, caminho)))
+                    continue
+                heapq.heappush(fila, (novo_lb, contador, new_restantes, new_cost, novo_estado, (ridx, caminho)))
+                contador += 1
+
+
+def _prepara_busca(
+    G: MatrizDistancias,
+    clientes: List[int],
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    rotas: Optional[List[Tuple[List[int], float]]],
+    best_cost: float,
+    limitante: Optional[Callable[[ContextoBB], LimitanteInferior]],
+    descartar_rotas: bool,
+    prazo: Optional[float],
+    instrumentacao: Optional[Instrumentacao]
+) -> Tuple[ContextoBB, LimitanteInferior, int]:
+    """
+    fases "rotas" e "limitante" do branch and bound: gera as rotas, calcula o limitante e monta as
+    listas de ramificação. levanta TimeoutError se o `prazo` passar antes de terminar.
+    retorna:
+        (contexto, limitante, máscara com todos os clientes)
+    """
+    inicio = time.perf_counter() if instrumentacao is not None else 0.0
+    # aqui decidimos representar as rotas como máscaras de bits e extraimos seus custos
+    if rotas is None:
+        route_masks, route_costs = compacta_rotas(gerar_rotas(G, clientes, demands, depot, capacity, prazo), len(clientes))
+    else:
+        bit_de: Dict[int, int] = {c: k for k, c in enumerate(clientes)}
+        route_masks, route_costs = compacta_rotas(
+            ((sum(1 << bit_de[c] for c in rota), custo) for rota, custo in rotas), len(clientes)
+        )
+    if instrumentacao is not None:
+        instrumentacao.conta("rotas", len(route_masks))
+        inicio = instrumentacao.cronometra("rotas", inicio)
+
+    contexto = ContextoBB(
+        G=G, depot=depot, capacity=capacity, clientes=clientes,
+        demanda_bit=[demands[c] for c in clientes],
+        route_masks=route_masks, route_costs=route_costs, rotas_do_bit=[], prazo=prazo,
+    )
+    lim = (limitante or limitante_padrao)(contexto)
+    ALL_MASK = (1 << len(clientes)) - 1
+
+    # listas de ramificação em ordem de custo reduzido (ou de custo médio, sem parte aditiva)
+    reduzidos = lim.custos_reduzidos()
+    limite = math.inf
+    if reduzidos is not None:
+        chave = np.asarray(reduzidos, dtype=np.float64)
+        if descartar_rotas and best_cost < math.inf:
+            # base + reduzido >= best_cost + _FOLGA poda a rota em `filhos`, e a base nunca é menor que na raiz
+            limite = best_cost + _FOLGA - lim.parte_aditiva(lim.estado_inicial(ALL_MASK))
+    else:
+        tamanhos = sum(((mascaras_numpy(route_masks) >> k) & 1).astype(np.float64) for k in range(len(clientes)))
+        chave = np.asarray(route_costs, dtype=np.float64) / tamanhos
+    contexto.rotas_do_bit = rotas_por_bit(route_masks, len(clientes), chave, limite)
+    if instrumentacao is not None:
+        instrumentacao.conta("rotas_descartadas", len(route_masks) - int(np.count_nonzero(chave < limite)))
+        instrumentacao.cronometra("limitante", inicio)
+    return contexto, lim, ALL_MASK
 
 
 def cvrp_branch_and_bound(
-    G: nx.Graph,
+    G: Union["nx.Graph", MatrizDistancias],
     demands: Dict[int, int],
     depot: int,
-    capacity: int
+    capacity: int,
+    memo_max_mb: float = 512.0,
+    estatisticas: Optional[EstatisticasBB] = None,
+    limitante: Optional[Callable[[ContextoBB], LimitanteInferior]] = None,
+    solucao_inicial: Optional[List[List[int]]] = None,
+    heuristica_inicial: Optional[str] = "clarke_wright",
+    estrategia: str = "profundidade",
+    tempo_limite: Optional[float] = None,
+    max_nos: Optional[int] = None,
+    n_processos: int = 1,
+    nos_por_tarefa: int = 2000,
+    rotas: Optional[List[Tuple[List[int], float]]] = None,
+    descartar_rotas: bool = True,
+    limite_superior: Optional[Any] = None,
+    instrumentacao: Optional[Instrumentacao] = None
 ) -> Tuple[List[List[int]], float]:
     """
     Algoritmo exato com a lógica do branch and bound para o CVRP
+
+    os clientes restantes e as rotas são representados como máscaras de bits (bit k = k-ésimo cliente),
+    e a memoização usa uma tabela de transposição limitada a `memo_max_mb` megabytes.
+    se `estatisticas` for informado, os contadores de nós, podas e acertos da memo são preenchidos nele.
+    `limitante` recebe o ContextoBB e devolve o limitante inferior usado nas podas
+    (padrão: `limitante_padrao`, ver utils/limitantes.py).
+
+    a busca começa com uma solução incumbente: `solucao_inicial` se informada, senão a da
+    `heuristica_inicial` ("clarke_wright", "grasp" ou None para começar sem incumbente).
+    `estrategia` é "profundidade" (dfs) ou "melhor_primeiro" (expande sempre o nó de menor
+    limitante). com `tempo_limite` (segundos) ou `max_nos` a busca vira anytime: ao estourar o
+    orçamento devolve a melhor solução encontrada, e `estatisticas` traz o limitante inferior
+    provado e o gap dessa solução (gap 0 e otimo=True quando a busca termina). o prazo também vale
+    para a geração das rotas e para o LP do limitante: se passar antes da busca, devolve a
+    incumbente com limitante inferior 0. `max_nos` conta só os nós da busca.
+
+    com `n_processos` > 1 a dfs é dividida entre processos: os primeiros níveis da árvore viram
+    tarefas, cada tarefa que passa de `nos_por_tarefa` nós devolve seus ramos abertos para a fila
+    (balanceamento dinâmico) e as melhorias da incumbente são compartilhadas entre todos os processos.
+
+    as rotas factíveis são geradas em fluxo (`gerar_rotas`) direto para arrays compactos de
+    máscara int64 + custo float64; a ordem de visita só é calculada para as rotas da solução.
+    `rotas` troca esse conjunto por um já pronto de (clientes, custo), como o gerado pela geração de
+    colunas; a busca passa a ser exata só em relação a essas rotas, que precisam incluir as rotas de
+    um cliente só. com `descartar_rotas`, as rotas cujo custo reduzido já basta para passar da
+    incumbente na raiz (e portanto em qualquer nó) saem das listas de ramificação.
+
+    `limite_superior` é um multiprocessing.Value("d") compartilhado com outros processos (ver o
+    portfólio em heuristicas/portfolio.py): a busca lê o valor a cada 256 nós e poda com ele, e
+    escreve nele as soluções melhores que achar. a solução de custo igual ao valor lido fica com
+    quem a publicou, então, se a busca terminar sem achar nada melhor, o ótimo é esse valor.
+
+    `instrumentacao` recebe os tempos das fases ("incumbente", "rotas", "limitante", "busca"),
+    os contadores de `estatisticas` e o progresso a cada `intervalo("nos")` nós.
     Retorna:
         (rotas, custo_total)
     """
 
+    prazo = time.monotonic() + tempo_limite if tempo_limite is not None else None
+    inicio = time.perf_counter() if instrumentacao is not None else 0.0
+    G = como_matriz(G)
+    if estatisticas is None:
+        estatisticas = EstatisticasBB()
+
     # lista de clientes
     clientes = [n for n in G.nodes if n != depot]
     if not clientes:
         return [], 0.0
 
-   
-    rotas = gerar_rotas_factiveis(G, clientes, demands, depot, capacity)
-    routes_by_client = mapear_clientes_para_rotas(clientes, rotas)
-    min_cost_per_client = custo_minimo_por_cliente(clientes, rotas, routes_by_client)
+    best_solution, best_cost = solucao_incumbente(G, demands, depot, capacity, solucao_inicial, heuristica_inicial)
+    if instrumentacao is not None:
+        inicio = instrumentacao.cronometra("incumbente", inicio)
 
-    # aqui decidimos representar as rotas como um conjunto e extraimos seus custos
-    route_sets: List[Set[int]] = [set(rota) for rota, _ in rotas]
-    route_costs: List[float] = [cost for _, cost in rotas]
+    try:
+        contexto, lim, ALL_MASK = _prepara_busca(
+            G, clientes, demands, depot, capacity, rotas, best_cost, limitante, descartar_rotas, prazo, instrumentacao
+        )
+    except TimeoutError:
+        # o prazo acabou antes da busca (na geração das rotas ou no LP do limitante): fica a
+        # incumbente, sem limitante inferior provado
+        estatisticas.limite_inferior = 0.0
+        estatisticas.otimo = False
+        if best_cost < math.inf:
+            estatisticas.gap = 1.0 if best_cost else 0.0
+        if instrumentacao is not None:
+            instrumentacao.absorve(estatisticas)
+        return best_solution, best_cost
+    route_masks = contexto.route_masks
+    if instrumentacao is not None:
+        inicio = time.perf_counter()
 
-    ALL_SET: Set[int] = set(clientes)
+    busca = _BuscaBB(contexto, lim, memo_max_mb, estatisticas, best_cost, prazo, max_nos)
+    if limite_superior is not None:
+        busca.incumbente = limite_superior
+        busca.trava = limite_superior.get_lock()
+        busca.best_cost = min(busca.best_cost, limite_superior.value)
+    if instrumentacao is not None:
+        busca.instrumentacao = instrumentacao
+        busca.intervalo_progresso = instrumentacao.intervalo("nos")
 
-    # memoização: chave = frozenset(clientes_restantes) -> melhor custo observado
-    memo_best: Dict[frozenset, float] = {}
-    best_cost = math.inf
-    best_solution: List[List[int]] = []
+    # inicia busca
+    if estrategia == "profundidade" and n_processos > 1:
+        _dfs_paralelo(busca, ALL_MASK, n_processos, nos_por_tarefa, memo_max_mb)
+    elif estrategia == "profundidade":
+        busca.dfs(ALL_MASK, [], 0.0, lim.estado_inicial(ALL_MASK))
+    elif estrategia == "melhor_primeiro":
+        busca.melhor_primeiro(ALL_MASK, lim.estado_inicial(ALL_MASK))
+    else:
+        raise ValueError(f"Estratégia inválida: {estrategia}")
 
-   
-    # escolhemos o cliente entre os restantes com menor número de rotas possíveis, pra não abrir muitos ramos de uma vez
-    def escolher_cliente(restantes: Set[int]) -> int:
-        candidato = None
-        min_ops = math.inf
-        for c in restantes:
-            ops = len(routes_by_client.get(c, []))
-            if ops < min_ops:
-                min_ops = ops
-                candidato = c
-        # candidato nunca será None se instância é viável
-        return candidato if candidato is not None else next(iter(restantes))
+    if busca.best_rotas is not None:
+        best_cost = busca.best_cost
+        if rotas is not None:
+            best_solution = [list(rotas[r][0]) for r in busca.best_rotas]
+        else:
+            best_solution = [ordem_otima(G, [clientes[k] for k in bits(route_masks[r])], depot) for r in busca.best_rotas]
 
-    # função recursiva de branch and bound, a dfs vai testar todas as possibilidades que não foram podadas e o lb vai proteger o ramo com a solução exata que queremos
-    def dfs(restantes: Set[int], current_routes: List[int], current_cost: float):
-        nonlocal best_cost, best_solution
+    # as distâncias são inteiras, então o limitante pode ser arredondado pra cima; busca.best_cost
+    # inclui o `limite_superior` recebido de fora, que também vale como limitante do ótimo
+    estatisticas.limite_inferior = busca.best_cost if not busca.interrompido else min(float(math.ceil(busca.lb_aberto - 1e-6)), busca.best_cost)
+    # com `limite_superior` a busca pode terminar sem ter a solução ótima, que ficou com outro processo
+    estatisticas.otimo = not busca.interrompido and best_cost <= estatisticas.limite_inferior
+    if best_cost < math.inf:
+        estatisticas.gap = (best_cost - estatisticas.limite_inferior) / best_cost if best_cost else 0.0
 
-        # caso base: todos atendidos
-        if not restantes:
-            if current_cost < best_cost:
-                best_cost = current_cost
-                best_solution = [list(rotas[r][0]) for r in current_routes]
-            return
+    if instrumentacao is not None:
+        instrumentacao.cronometra("busca", inicio)
+        instrumentacao.absorve(estatisticas)
+    return best_solution, best_cost
 
-        key = frozenset(restantes)
-        prev = memo_best.get(key)
-        if prev is not None and current_cost >= prev:
-            # já visitamos este conjunto com custo melhor; pode podar
-            return
 
-        memo_best[key] = current_cost
+# busca de cada processo do pool, criada uma única vez pelo initializer
+_busca_worker: Optional[_BuscaBB] = None
 
-        # poda por lower bound
-        lb = current_cost + calcular_lower_bound(restantes, min_cost_per_client)
-        if lb >= best_cost:
-            return
 
-        # escolher cliente para ramificar
-        cliente = escolher_cliente(restantes)
+def _inicializa_worker_bb(contexto, lim, memo_max_mb, prazo, incumbente, trava) -> None:
+    global _busca_worker
+    _busca_worker = _BuscaBB(contexto, lim, memo_max_mb, EstatisticasBB(), incumbente.value, prazo)
+    _busca_worker.incumbente = incumbente
+    _busca_worker.trava = trava
 
-        # para cada rota que contenha esse cliente, e que esteja contida nos restantes
-        for ridx in routes_by_client.get(cliente, []):
-            rset = route_sets[ridx]
-            if rset.issubset(restantes):
-                new_restantes = restantes - rset
-                new_cost = current_cost + route_costs[ridx]
 
-                # poda direta
-                if new_cost >= best_cost:
-                    continue
-                # poda por lower bound no novo estado
-                if new_cost + calcular_lower_bound(new_restantes, min_cost_per_client) >= best_cost:
+def _executa_tarefa_bb(tarefa: Tarefa, limite_nos: int):
+    """
+    explora uma subárvore no worker; devolve (custo, rotas da melhor solução achada ou None,
+    ramos devolvidos, estatísticas, lb dos nós abertos, interrompido)
+    """
+    busca = _busca_worker
+    busca.estatisticas = EstatisticasBB()
+    busca.memo.estatisticas = busca.estatisticas
+    busca.best_rotas = None
+    busca.fronteira = []
+    busca.dividindo = False
+    busca.lb_aberto = math.inf
+    busca.limite_tarefa = limite_nos
+    busca.best_cost = min(busca.best_cost, busca.incumbente.value)
+
+    lb, restantes, fixadas, custo, estado = tarefa
+    if busca.interrompido:
+        busca.lb_aberto = lb
+    elif lb < busca.best_cost:
+        busca.dfs(restantes, list(fixadas), custo, estado)
+    return busca.best_cost, busca.best_rotas, busca.fronteira, busca.estatisticas, busca.lb_aberto, busca.interrompido
+
+
+def _dfs_paralelo(busca: _BuscaBB, todos: int, n_processos: int, nos_por_tarefa: int, memo_max_mb: float) -> None:
+    """
+    divide os primeiros níveis da árvore em tarefas e distribui entre os processos,
+    redistribuindo os ramos devolvidos por tarefas que ficaram grandes demais
+    """
+    lim = busca.lim
+
+    # divisão inicial em largura, ramificando no cliente de `escolher_cliente`
+    estado = lim.estado_inicial(todos)
+    tarefas: List[Tarefa] = [(lim.valor(estado), todos, (), 0.0, estado)]
+    while tarefas and len(tarefas) < n_processos * 4:
+        lb, restantes, fixadas, custo, estado = tarefas.pop(0)
+        if lb >= busca.best_cost:
+            continue
+        busca.estatisticas.nos += 1
+        for ridx, new_restantes, new_cost, novo_estado, novo_lb in busca.filhos(restantes, custo, estado):
+            if not new_restantes:
+                busca.nova_solucao(new_cost, list(fixadas) + [ridx])
+            else:
+                tarefas.append((novo_lb, new_restantes, fixadas + (ridx,), new_cost, novo_estado))
+    tarefas.sort(key=lambda t: t[0])
+
+    # com `limite_superior`, os processos usam o valor compartilhado recebido de fora
+    if busca.incumbente is not None:
+        incumbente, trava = busca.incumbente, busca.trava
+    else:
+        incumbente = multiprocessing.Value("d", busca.best_cost, lock=False)
+        trava = multiprocessing.Lock()
+    proximo_relato = busca.intervalo_progresso
+    with ProcessPoolExecutor(
+        max_workers=n_processos,
+        initializer=_inicializa_worker_bb,
+        initargs=(busca.ctx, lim, memo_max_mb, busca.prazo, incumbente, trava),
+    ) as pool:
+        lb_de = {}
+        for tarefa in tarefas:
+            lb_de[pool.submit(_executa_tarefa_bb, tarefa, nos_por_tarefa)] = tarefa[0]
+        while lb_de:
+            prontos, _ = wait(list(lb_de), return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                lb_tarefa = lb_de.pop(futuro)
+                if futuro.cancelled():
+                    busca.lb_aberto = min(busca.lb_aberto, lb_tarefa)
                     continue
+                custo, rotas, fronteira, estatisticas, lb_aberto, interrompido = futuro.result()
+                busca.estatisticas.acumula(estatisticas)
+                if rotas is not None and custo < busca.best_cost:
+                    busca.best_cost = custo
+                    busca.best_rotas = rotas
+                    busca.estatisticas.solucoes += 1
+                if busca.instrumentacao is not None and busca.estatisticas.nos >= proximo_relato:
+                    busca.relata_progresso()
+                    proximo_relato = (busca.estatisticas.nos // busca.intervalo_progresso + 1) * busca.intervalo_progresso
+                if interrompido:
+                    busca.interrompido = True
+                    busca.lb_aberto = min(busca.lb_aberto, lb_aberto)
 
-                current_routes.append(ridx)
-                dfs(new_restantes, current_routes, new_cost)
-                current_routes.pop()
+                if busca.max_nos is not None and busca.estatisticas.nos >= busca.max_nos:
+                    busca.interrompido = True
+                for tarefa in fronteira:
+                    if tarefa[0] >= busca.best_cost:
+                        continue
+                    if busca.interrompido:
+                        busca.lb_aberto = min(busca.lb_aberto, tarefa[0])
+                    else:
+                        lb_de[pool.submit(_executa_tarefa_bb, tarefa, nos_por_tarefa)] = tarefa[0]
 
-    # inicia busca
-    dfs(ALL_SET, [], 0.0)
+            if busca.interrompido:
+                for futuro in lb_de:
+                    futuro.cancel()
 
-    return best_solution, best_cost
+
+def _rotas_do_caminho(caminho) -> List[int]:
+    """converte a lista encadeada (rota, pai) de um nó da busca em melhor-primeiro para a lista de rotas"""
+    rotas: List[int] = []
+    while caminho is not None:
+        ridx, caminho = caminho
+        rotas.append(ridx)
+    rotas.reverse()
+    return rotas
@@ -0,0 +1,307 @@
+from typing import Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+import heapq
+import math
+import time
+import numpy as np
+
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+from utils.bb_utils import EstatisticasBB, bits, ordem_otima, solucao_incumbente
+from utils.simplex import matriz_incidencia, simplex_revisado
+from utils.instrumentacao import Instrumentacao
+from exatos.branch_and_bound import cvrp_branch_and_bound
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# tolerância dos custos reduzidos
+_TOL = 1e-6
+# rótulos mantidos por carga na precificação heurística, tentada antes da exata
+_ROTULOS_HEURISTICA = 200
+
+
+class _PoolColunas:
+    """
+    rotas do problema mestre como máscara de clientes + custo; a ordem de visita só é
+    calculada para as rotas da solução final
+    """
+
+    def __init__(self) -> None:
+        self.masks: List[int] = []
+        self.custos: List[float] = []
+        self.coluna_de: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+    def adiciona(self, mask: int, custo: float) -> bool:
+        """adiciona a rota, ou barateia a já existente; retorna True se mudou algo"""
+        coluna = self.coluna_de.get(mask)
+        if coluna is None:
+            self.coluna_de[mask] = len(self.masks)
+            self.masks.append(mask)
+            self.custos.append(custo)
+            return True
+        if custo < self.custos[coluna] - _TOL:
+            self.custos[coluna] = custo
+            return True
+        return False
+
+
+def cvrp_geracao_colunas(
+    G: Union["nx.Graph", MatrizDistancias],
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    estatisticas: Optional[EstatisticasBB] = None,
+    solucao_inicial: Optional[List[List[int]]] = None,
+    heuristica_inicial: Optional[str] = "clarke_wright",
+    tempo_limite: Optional[float] = None,
+    colunas_por_rodada: int = 100,
+    max_rotas: int = 2_000_000,
+    memo_max_mb: float = 512.0,
+    instrumentacao: Optional[Instrumentacao] = None
+) -> Tuple[List[List[int]], float]:
+    """
+    algoritmo exato para o CVRP por particionamento de conjuntos com geração de colunas.
+
+    1. o problema mestre começa com as rotas de um cliente só e as da solução inicial
+       (`solucao_inicial` ou da `heuristica_inicial`, como no branch and bound);
+    2. a relaxação linear é resolvida pelo simplex revisado (utils/simplex.py) e os duais
+       alimentam a precificação, um algoritmo de rótulos para o ESPPRC (caminho mínimo
+       elementar com restrição de capacidade) que devolve rotas com custo reduzido negativo;
+       o ciclo se repete até nenhuma rota ter custo reduzido negativo (limitante inferior z_LP);
+    3. o branch and bound sobre as colunas geradas tenta melhorar a incumbente (custo z_UB);
+    4. como z = z_LP + soma dos custos reduzidos das rotas usadas, toda solução com custo
+       <= z_UB - 1 só usa rotas com custo reduzido <= z_UB - 1 - z_LP. essas rotas são
+       enumeradas pelo mesmo algoritmo de rótulos e o branch and bound sobre elas prova o ótimo.
+
+    se a enumeração passar de `max_rotas` rotas ou o `tempo_limite` (segundos) estourar, devolve
+    a melhor solução encontrada, com o limitante inferior e o gap em `estatisticas`.
+    as demandas dos clientes precisam ser positivas.
+    `instrumentacao` recebe os tempos do mestre, da precificação e da enumeração, um passo
+    "rodadas" por rodada da geração de colunas e o que os branch and bound internos registram.
+    Retorna:
+        (rotas, custo_total)
+    """
+    prazo = time.monotonic() + tempo_limite if tempo_limite is not None else None
+    G = como_matriz(G)
+    if estatisticas is None:
+        estatisticas = EstatisticasBB()
+
+    clientes = [n for n in G.nodes if n != depot]
+    if not clientes:
+        return [], 0.0
+    dem = [demands[c] for c in clientes]
+    if any(d > capacity for d in dem):
+        raise ValueError("Instância inviável: há cliente com demanda maior que a capacidade")
+    if any(d <= 0 for d in dem):
+        raise ValueError("A geração de colunas exige demandas positivas")
+
+    # distâncias em índices locais: clientes 0..m-1 e o depósito em m
+    m = len(clientes)
+    pos = [G.indice[c] for c in clientes] + [G.indice[depot]]
+    D = G.matriz[np.ix_(pos, pos)].astype(np.float64)
+    bit_de = {c: k for k, c in enumerate(clientes)}
+
+    melhor_rotas, melhor_custo = solucao_incumbente(G, demands, depot, capacity, solucao_inicial, heuristica_inicial)
+
+    pool = _PoolColunas()
+    for k in range(m):
+        pool.adiciona(1 << k, D[m, k] + D[k, m])
+    for rota in melhor_rotas:
+        mask = 0
+        for c in rota:
+            mask |= 1 << bit_de[c]
+        pool.adiciona(mask, G.custo_rota(rota, depot))
+
+    def tempo_esgotado() -> bool:
+        return prazo is not None and time.monotonic() >= prazo
+
+    def restante() -> Optional[float]:
+        return max(0.0, prazo - time.monotonic()) if prazo is not None else None
+
+    # geração de colunas sobre a relaxação linear
+    base = list(range(m))
+    valor_lp: Optional[float] = None
+    inicio = time.perf_counter() if instrumentacao is not None else 0.0
+    while not tempo_esgotado():
+        A = matriz_incidencia(pool.masks, m)
+        try:
+            _, duais, valor, base = simplex_revisado(A, np.array(pool.custos), np.ones(m), base, prazo=prazo)
+        except TimeoutError:
+            # sem o LP da rodada não há limitante: fica a incumbente
+            break
+        if instrumentacao is not None:
+            inicio = instrumentacao.cronometra("mestre", inicio)
+            instrumentacao.passo("rodadas", valor_lp=valor, colunas=len(pool))
+        # a precificação exata só roda quando a heurística não acha mais nenhuma rota
+        novas = _rotas_reduzidas(D, dem, capacity, duais, -_TOL, colunas_por_rodada, max_rotulos=_ROTULOS_HEURISTICA)
+        mudou = any([pool.adiciona(mask, custo) for mask, custo in novas])
+        if not mudou:
+            novas = _rotas_reduzidas(D, dem, capacity, duais, -_TOL, colunas_por_rodada)
+            mudou = any([pool.adiciona(mask, custo) for mask, custo in novas])
+        if instrumentacao is not None:
+            inicio = instrumentacao.cronometra("precificacao", inicio)
+        if not mudou:
+            valor_lp = valor
+            break
+    if instrumentacao is not None:
+        instrumentacao.conta("colunas", len(pool))
+
+    def resolve_inteiro(masks: List[int], custos: List[float], **orcamento) -> bool:
+        """branch and bound sobre um conjunto de rotas; retorna se a busca terminou"""
+        nonlocal melhor_rotas, melhor_custo
+        rotas = [([clientes[k] for k in bits(mask)], custo) for mask, custo in zip(masks, custos)]
+        parcial = EstatisticasBB()
+        solucao, custo = cvrp_branch_and_bound(
+            G, demands, depot, capacity, memo_max_mb=memo_max_mb, estatisticas=parcial,
+            solucao_inicial=melhor_rotas, rotas=rotas, instrumentacao=instrumentacao, **orcamento
+        )
+        estatisticas.acumula(parcial)
+        if custo < melhor_custo:
+            melhor_rotas, melhor_custo = solucao, custo
+            estatisticas.solucoes += 1
+        return parcial.otimo
+
+    provado = False
+    if valor_lp is not None:
+        limite = math.ceil(valor_lp - _TOL)
+        if melhor_custo > limite:
+            # as colunas da relaxação costumam conter uma solução ótima ou quase
+            resolve_inteiro(pool.masks, pool.custos, tempo_limite=restante(), max_nos=100_000)
+        if melhor_custo <= limite:
+            provado = True
+        elif not tempo_esgotado():
+            # só as rotas que podem fazer parte de uma solução melhor que a incumbente
+            limiar = melhor_custo - 1 - valor_lp + _TOL
+            inicio = time.perf_counter() if instrumentacao is not None else 0.0
+            enumeradas = _rotas_reduzidas(D, dem, capacity, duais, limiar, max_rotas, completo=True)
+            if instrumentacao is not None:
+                instrumentacao.cronometra("enumeracao", inicio)
+                instrumentacao.conta("rotas_enumeradas", len(enumeradas) if enumeradas is not None else 0)
+            if enumeradas is not None and not tempo_esgotado():
+                candidatas = _PoolColunas()
+                for k in range(m):
+                    candidatas.adiciona(1 << k, D[m, k] + D[k, m])
+                for mask, custo in enumeradas:
+                    candidatas.adiciona(mask, custo)
+                provado = resolve_inteiro(candidatas.masks, candidatas.custos, tempo_limite=restante())
+
+    # coloca os clientes de cada rota na ordem de menor custo (exata, então o ótimo provado continua valendo)
+    rotas_finais: List[List[int]] = []
+    for rota in melhor_rotas:
+        rotas_finais.append(ordem_otima(G, rota, depot))
+    melhor_custo = float(sum(G.custo_rota(r, depot) for r in rotas_finais))
+
+    estatisticas.otimo = provado
+    if provado:
+        estatisticas.limite_inferior = melhor_custo
+    elif valor_lp is not None:
+        estatisticas.limite_inferior = min(math.ceil(valor_lp - _TOL), melhor_custo)
+    if melhor_custo < math.inf:
+        estatisticas.gap = (melhor_custo - estatisticas.limite_inferior) / melhor_custo if melhor_custo else 0.0
+    if instrumentacao is not None:
+        # os branch and bound internos deixaram os resultados deles; vale o da geração de colunas
+        instrumentacao.resultados.update(
+            limite_inferior=estatisticas.limite_inferior, gap=estatisticas.gap, otimo=estatisticas.otimo
+        )
+    return rotas_finais, melhor_custo
+
+
+def _limite_completar(D: np.ndarray, dem: List[int], Q: int, duais: np.ndarray) -> List[List[float]]:
+    """
+    f[v][q] = menor custo reduzido para sair do cliente v e voltar ao depósito levando no máximo
+    q de carga, sem exigir caminho elementar (relaxação calculada por programação dinâmica na carga).
+    é um limitante inferior para completar qualquer rótulo parado em v com carga Q - q.
+    """
+    m = len(dem)
+    demanda = np.array(dem)
+    volta = D[:m, m]
+    reduzido = D[:m, :m] - duais[None, :]
+    np.fill_diagonal(reduzido, np.inf)
+    f = np.empty((Q + 1, m))
+    for q in range(Q + 1):
+        melhor = volta.copy()
+        validos = np.flatnonzero(demanda <= q)
+        if validos.size:
+            candidatos = reduzido[:, validos] + f[q - demanda[validos], validos][None, :]
+            np.minimum(melhor, candidatos.min(axis=1), out=melhor)
+        f[q] = melhor
+    return f.T.tolist()
+
+
+def _rotas_reduzidas(
+    D: np.ndarray,
+    dem: List[int],
+    Q: int,
+    duais: np.ndarray,
+    limiar: float,
+    max_rotas: int,
+    completo: bool = False,
+    max_rotulos: Optional[int] = None
+) -> Optional[List[Tuple[int, float]]]:
+    """
+    algoritmo de rótulos para o ESPPRC: rotas elementares (máscara, custo) com custo reduzido
+    custo - soma dos duais <= limiar.
+
+    cada rótulo é (cliente atual, clientes visitados) com o menor custo reduzido até ali; os
+    rótulos são estendidos em ordem de carga, então todos os rótulos de um conjunto de clientes
+    ficam prontos ao mesmo tempo e cada rota sai com a ordem de menor custo. um rótulo é
+    descartado quando nem a melhor forma de completá-lo (`_limite_completar`) chega ao limiar.
+
+    na precificação (completo=False) para depois da carga em que já achou `max_rotas` rotas;
+    na enumeração (completo=True) devolve todas, ou None se passarem de `max_rotas`.
+    com `max_rotulos` só os rótulos de menor custo reduzido de cada carga são estendidos
+    (precificação heurística: rápida, mas pode não achar rotas que existem).
+    """
+    m = len(dem)
+    dep = m
+    f = _limite_completar(D, dem, Q, duais)
+    reduzido = (D[:, :m] - duais[None, :]).tolist()
+    volta = D[:m, m].tolist()
+    soma_duais = duais.tolist()
+
+    # baldes[carga] = {(cliente, visitados): (custo reduzido, soma dos duais)}
+    baldes: List[Optional[Dict[Tuple[int, int], Tuple[float, float]]]] = [dict() for _ in range(Q + 1)]
+    for j in range(m):
+        rc = reduzido[dep][j]
+        if rc + f[j][Q - dem[j]] <= limiar:
+            baldes[dem[j]][(j, 1 << j)] = (rc, soma_duais[j])
+
+    encontradas: Dict[int, Tuple[float, float]] = {}
+    for carga in range(Q + 1):
+        balde = baldes[carga]
+        baldes[carga] = None
+        folga = Q - carga
+        rotulos = balde.items()
+        if max_rotulos is not None and len(balde) > max_rotulos:
+            rotulos = heapq.nsmallest(max_rotulos, rotulos, key=lambda item: item[1][0])
+        for (no, mask), (rc, pi) in rotulos:
+            fechada = rc + volta[no]
+            if fechada <= limiar:
+                anterior = encontradas.get(mask)
+                if anterior is None or fechada < anterior[0]:
+                    encontradas[mask] = (fechada, pi)
+            linha = reduzido[no]
+            for j in range(m):
+                if dem[j] > folga or mask >> j & 1:
+                    continue
+                nova_carga = carga + dem[j]
+                novo_rc = rc + linha[j]
+                if novo_rc + f[j][Q - nova_carga] > limiar:
+                    continue
+                chave = (j, mask | 1 << j)
+                destino = baldes[nova_carga]
+                atual = destino.get(chave)
+                if atual is None or novo_rc < atual[0]:
+                    destino[chave] = (novo_rc, pi + soma_duais[j])
+        if len(encontradas) >= max_rotas:
+            if completo:
+                return None
+            break
+
+    # custo real = custo reduzido + soma dos duais dos clientes da rota
+    rotas = sorted(encontradas.items(), key=lambda item: item[1][0])
+    if not completo:
+        rotas = rotas[:max_rotas]
+    return [(mask, rc + pi) for mask, (rc, pi) in rotas]
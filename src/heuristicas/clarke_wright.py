@@ -1,83 +1,188 @@
-from typing import Dict, List, Tuple
-import networkx as nx
+from typing import Dict, Iterator, List, Optional, Tuple, Union, TYPE_CHECKING
+import time
+import numpy as np
+
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+from utils.instrumentacao import Instrumentacao
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# quantidade de economias ordenadas no primeiro lote; os lotes seguintes dobram de tamanho
+_LOTE_INICIAL = 4096
+
+
+def calcula_economias(
+    D: MatrizDistancias,
+    depot: int,
+    k_vizinhos: Optional[int] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    calcula as economias s_ij = d(0, i) + d(0, j) - d(i, j) de forma vetorizada.
+
+    sem `k_vizinhos` considera todos os pares i < j; com `k_vizinhos` considera só
+    os pares em que j está entre os k clientes mais próximos de i (economias granulares),
+    o que reduz a memória de O(n²) para O(n·k).
+
+    retorna:
+        (economias, i, j) com i e j nas posições da matriz e i < j
+    """
+    dep = D.indice[depot]
+    n = len(D)
+    clientes = np.array([p for p in range(n) if p != dep], dtype=np.int32)
+    m = len(clientes)
+
+    if k_vizinhos is None or k_vizinhos >= m - 1:
+        i = np.repeat(clientes, np.arange(m - 1, -1, -1))
+        j = np.concatenate([clientes[k + 1:] for k in range(m)]) if m else clientes
+    else:
+        vizinhos = D.vizinhos_mais_proximos(k_vizinhos, excluir=[dep])[clientes]
+        origem = np.repeat(clientes.astype(np.int64), vizinhos.shape[1])
+        destino = vizinhos.ravel().astype(np.int64)
+        # cada par aparece uma vez só, com o menor índice primeiro
+        chaves = np.unique(np.minimum(origem, destino) * n + np.maximum(origem, destino))
+        i, j = (chaves // n).astype(np.int32), (chaves % n).astype(np.int32)
+
+    d0 = D.matriz[dep]
+    economias = d0[i] + d0[j] - D.matriz[i, j]
+    return economias, i, j
+
+
+def _economias_em_ordem(
+    economias: np.ndarray,
+    i: np.ndarray,
+    j: np.ndarray
+) -> Iterator[np.ndarray]:
+    """
+    entrega os índices das economias em ordem decrescente (empates por i e depois j),
+    em lotes ordenados sob demanda em vez de ordenar o vetor inteiro de uma vez
+    """
+    restantes = np.arange(economias.size, dtype=np.int32)
+    lote = _LOTE_INICIAL
+    while restantes.size:
+        if restantes.size > lote:
+            valores = economias[restantes]
+            corte = valores.size - lote
+            limiar = np.partition(valores, corte)[corte]
+            # pega todos os empates com o limiar para manter a ordem estável entre lotes
+            selecao = valores >= limiar
+            escolhidos, restantes = restantes[selecao], restantes[~selecao]
+        else:
+            escolhidos, restantes = restantes, restantes[:0]
+        ordem = np.lexsort((j[escolhidos], i[escolhidos], -economias[escolhidos]))
+        yield escolhidos[ordem]
+        lote *= 2
+
 
 def clarke_wright(
-    G: nx.Graph,
+    G: Union["nx.Graph", MatrizDistancias],
     demands: Dict[int, int],
     depot: int,
-    capacity: int
+    capacity: int,
+    k_vizinhos: Optional[int] = None,
+    instrumentacao: Optional[Instrumentacao] = None
 ) -> Tuple[List[List[int]], float]:
     """
     executa a heurística de Clarke & Wright.
-    
+
     argumentos:
-        G: grafo com pesos 'weight' nas arestas
+        G: grafo com pesos 'weight' nas arestas ou MatrizDistancias
         demands: dicionário {nó: demanda}
         depot: nó do depósito
         capacity: capacidade máxima do veículo
+        k_vizinhos: se informado, usa só as economias entre cada cliente e seus
+            k vizinhos mais próximos (recomendado para instâncias com milhares de clientes)
+        instrumentacao: se informada, recebe os tempos das fases ("economias", "merges",
+            "rotas") e os contadores de economias, pares avaliados e merges
     retorna:
         (rotas, custo_total)
     """
 
-    # inicialização do alg.
-    clientes: List[int] = [n for n in G.nodes if n != depot]
-    rotas: Dict[int, List[int]] = {i: [i] for i in clientes}
-    rota_capacidade: Dict[int, int] = {i: demands[i] for i in clientes}
-    rota_de: Dict[int, int] = {i: i for i in clientes}
-
-    # aqui fazemos o cálculo das economias
-    savings: List[Tuple[float, int, int]] = []
-    for i in clientes:
-        for j in clientes:
-            if i < j:
-                s_ij = G[depot][i]['weight'] + G[depot][j]['weight'] - G[i][j]['weight']
-                savings.append((s_ij, i, j))
-    savings.sort(reverse=True, key=lambda x: x[0])
-
-    # mergeamos as sequências que nos ajudam na economia e excluímos as que não servem mais
-    for _, i, j in savings:
-        ri, rj = rota_de[i], rota_de[j]
-        if ri == rj:
-            continue
-        capacidade_i, capacidade_j = rota_capacidade[ri], rota_capacidade[rj]
-        if capacidade_i + capacidade_j > capacity:
+    inicio = time.perf_counter() if instrumentacao is not None else 0.0
+    G = como_matriz(G)
+    n = len(G)
+    dep = G.indice[depot]
+
+    # cada rota é um caminho: guardamos os (até dois) vizinhos de cada cliente e,
+    # na raiz do union-find, as duas pontas e a carga da rota. o merge é O(1).
+    vizinho_a: List[int] = [-1] * n
+    vizinho_b: List[int] = [-1] * n
+    pai: List[int] = list(range(n))
+    ponta_1: List[int] = list(range(n))
+    ponta_2: List[int] = list(range(n))
+    carga: List[int] = [demands.get(no, 0) for no in G.nos]
+    interno = np.zeros(n, dtype=bool)
+
+    def raiz(c: int) -> int:
+        while pai[c] != c:
+            pai[c] = pai[pai[c]]
+            c = pai[c]
+        return c
+
+    economias, pos_i, pos_j = calcula_economias(G, depot, k_vizinhos)
+    if instrumentacao is not None:
+        instrumentacao.conta("economias", int(economias.size))
+        inicio = instrumentacao.cronometra("economias", inicio)
+
+    # mergeamos as rotas cujas pontas dão economia, na ordem decrescente das economias
+    merges = 0
+    for lote in _economias_em_ordem(economias, pos_i, pos_j):
+        # descarta de uma vez os pares com algum cliente que já ficou no meio de uma rota
+        lote = lote[~(interno[pos_i[lote]] | interno[pos_j[lote]])]
+        if instrumentacao is not None:
+            instrumentacao.conta("pares_avaliados", int(lote.size))
+        for i, j in zip(pos_i[lote].tolist(), pos_j[lote].tolist()):
+            if interno[i] or interno[j]:
+                continue
+            ri, rj = raiz(i), raiz(j)
+            if ri == rj:
+                continue
+            if carga[ri] + carga[rj] > capacity:
+                continue
+
+            # a outra ponta de cada rota vira ponta da rota mergeada
+            outra_i = ponta_2[ri] if ponta_1[ri] == i else ponta_1[ri]
+            outra_j = ponta_2[rj] if ponta_1[rj] == j else ponta_1[rj]
+
+            for c, novo in ((i, j), (j, i)):
+                if vizinho_a[c] == -1:
+                    vizinho_a[c] = novo
+                else:
+                    vizinho_b[c] = novo
+                    interno[c] = True
+
+            novo_id, velho_id = (ri, rj) if ri < rj else (rj, ri)
+            pai[velho_id] = novo_id
+            carga[novo_id] = carga[ri] + carga[rj]
+            ponta_1[novo_id] = outra_i
+            ponta_2[novo_id] = outra_j
+            merges += 1
+
+    if instrumentacao is not None:
+        instrumentacao.conta("merges", merges)
+        inicio = instrumentacao.cronometra("merges", inicio)
+
+    # percorre cada rota a partir de uma das pontas
+    final_rotas: List[List[int]] = []
+    for r in range(n):
+        if r == dep or raiz(r) != r:
             continue
+        rota: List[int] = []
+        anterior, atual = -1, ponta_1[r]
+        while atual != -1:
+            rota.append(G.nos[atual])
+            proximo = vizinho_a[atual] if vizinho_a[atual] != anterior else vizinho_b[atual]
+            anterior, atual = atual, proximo
+        final_rotas.append(rota)
 
-        rota_i, rota_j = rotas[ri], rotas[rj]
-        pode_mergear = False
-        rota_mergeada: List[int] = []
-
-        if rota_i[-1] == i and rota_j[0] == j:
-            rota_mergeada = rota_i + rota_j; pode_mergear = True
-        elif rota_i[0] == i and rota_j[-1] == j:
-            rota_mergeada = rota_j + rota_i; pode_mergear = True
-        elif rota_i[0] == i and rota_j[0] == j:
-            rota_mergeada = list(reversed(rota_i)) + rota_j; pode_mergear = True
-        elif rota_i[-1] == i and rota_j[-1] == j:
-            rota_mergeada = rota_i + list(reversed(rota_j)); pode_mergear = True
-
-        if pode_mergear:
-            novo_id = min(ri, rj)
-            rotas[novo_id] = rota_mergeada
-            rota_capacidade[novo_id] = capacidade_i + capacidade_j
-            for c in rota_mergeada:
-                rota_de[c] = novo_id
-            # remove rotas antigas pra limpar a lista
-            for velho_id in (ri, rj):
-                if velho_id != novo_id:
-                    rotas.pop(velho_id, None)
-                    rota_capacidade.pop(velho_id, None)
-
-    # calcular custo total
-    def custo_rota(rota: List[int]) -> float:
-        if not rota:
-            return 0.0
-        custo = G[depot][rota[0]]['weight']
-        for a, b in zip(rota, rota[1:]):
-            custo += G[a][b]['weight']
-        custo += G[rota[-1]][depot]['weight']
-        return custo
-
-    final_rotas = list(rotas.values())
-    total_custo = sum(custo_rota(r) for r in final_rotas)
+    # calcular custo total de uma vez, somando as arestas de todas as rotas na matriz
+    origem: List[int] = []
+    destino: List[int] = []
+    for rota in final_rotas:
+        caminho = [dep] + [G.indice[c] for c in rota] + [dep]
+        origem.extend(caminho[:-1])
+        destino.extend(caminho[1:])
+    total_custo = int(G.matriz[origem, destino].sum()) if origem else 0
+    if instrumentacao is not None:
+        instrumentacao.cronometra("rotas", inicio)
     return final_rotas, total_custo
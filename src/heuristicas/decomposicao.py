@@ -0,0 +1,270 @@
+from typing import Any, Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor
+import inspect
+import math
+import time
+import numpy as np
+
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+from utils.instrumentacao import Instrumentacao
+from utils.api import carrega_algoritmo, nome_algoritmo
+from meta_heuristicas.busca_local import busca_local
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# na varredura, o corte de cada cluster é escolhido entre os últimos clientes da janela
+# (a partir desta fração de max_clientes), onde a demanda acumulada desperdiça menos capacidade
+_JANELA_CORTE = 2 / 3
+# no k-means, cada cluster recebe até esta folga acima da demanda média
+_FOLGA_DEMANDA = 1.1
+
+
+def _clientes_e_coordenadas(G: MatrizDistancias, depot: int) -> Tuple[List[int], np.ndarray, np.ndarray]:
+    if G.coords is None:
+        raise ValueError("A decomposição precisa das coordenadas da instância")
+    clientes = [no for no in G.nos if no != depot]
+    xy = G.coords[[G.indice[c] for c in clientes]]
+    return clientes, xy, G.coords[G.indice[depot]]
+
+
+def particiona_varredura(
+    G: MatrizDistancias,
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    max_clientes: int
+) -> List[List[int]]:
+    """
+    varredura: ordena os clientes pelo ângulo em torno do depósito, começando no maior intervalo
+    entre ângulos consecutivos, e corta clusters de até `max_clientes`. o corte fica entre os
+    últimos clientes da janela, no ponto em que a demanda do cluster mais se aproxima de um
+    múltiplo da capacidade (menos sobra no último veículo).
+    """
+    clientes, xy, centro = _clientes_e_coordenadas(G, depot)
+    n = len(clientes)
+    if not n:
+        return []
+    angulo = np.arctan2(xy[:, 1] - centro[1], xy[:, 0] - centro[0])
+    ordem = np.argsort(angulo, kind="stable")
+    ordenados = angulo[ordem]
+    intervalos = np.diff(np.append(ordenados, ordenados[0] + 2 * math.pi))
+    ordem = np.roll(ordem, -(int(np.argmax(intervalos)) + 1))
+
+    demanda = np.array([demands[clientes[i]] for i in ordem], dtype=np.int64)
+    acumulada = np.concatenate(([0], np.cumsum(demanda)))
+    clusters: List[List[int]] = []
+    i = 0
+    while i < n:
+        if n - i <= max_clientes:
+            fim = n
+        else:
+            # candidatos do maior para o menor, para o argmin preferir clusters maiores nos empates
+            candidatos = np.arange(i + max_clientes, i + max(1, int(max_clientes * _JANELA_CORTE)) - 1, -1)
+            sobra = -(acumulada[candidatos] - acumulada[i]) % capacity
+            fim = int(candidatos[np.argmin(sobra)])
+        clusters.append([clientes[k] for k in ordem[i:fim]])
+        i = fim
+    return clusters
+
+
+def particiona_kmeans(
+    G: MatrizDistancias,
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    max_clientes: int,
+    seed: Optional[int] = None,
+    iteracoes: int = 20
+) -> List[List[int]]:
+    """
+    k-means sobre as coordenadas com k = ceil(n / max_clientes), seguido de uma atribuição com
+    limite de clientes (max_clientes) e de demanda (média por cluster + folga, arredondada para
+    múltiplo da capacidade): os clientes com maior diferença entre o segundo e o primeiro centro
+    mais próximo escolhem primeiro. os clusters saem em ordem de ângulo em torno do depósito.
+    """
+    clientes, xy, centro = _clientes_e_coordenadas(G, depot)
+    n = len(clientes)
+    if not n:
+        return []
+    k = math.ceil(n / max_clientes)
+    rng = np.random.default_rng(seed)
+    centros = xy[rng.choice(n, size=k, replace=False)]
+    for _ in range(iteracoes):
+        rotulo = ((xy[:, None, :] - centros[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+        novos = centros.copy()
+        for c in range(k):
+            membros = xy[rotulo == c]
+            if len(membros):
+                novos[c] = membros.mean(axis=0)
+        if np.allclose(novos, centros):
+            break
+        centros = novos
+
+    distancia = ((xy[:, None, :] - centros[None, :, :]) ** 2).sum(axis=2)
+    preferencia = np.argsort(distancia, axis=1)
+    if k > 1:
+        linhas = np.arange(n)
+        arrependimento = distancia[linhas, preferencia[:, 1]] - distancia[linhas, preferencia[:, 0]]
+    else:
+        arrependimento = np.zeros(n)
+    demanda = [demands[c] for c in clientes]
+    limite_demanda = math.ceil(sum(demanda) / k * _FOLGA_DEMANDA / capacity) * capacity
+    tamanho = [0] * k
+    carga = [0] * k
+    rotulo = [-1] * n
+    for i in np.argsort(-arrependimento, kind="stable").tolist():
+        livres = [c for c in preferencia[i].tolist() if tamanho[c] < max_clientes]
+        # sem cluster com demanda livre, o limite de demanda é relaxado (o de clientes nunca)
+        escolhido = next((c for c in livres if carga[c] + demanda[i] <= limite_demanda), livres[0])
+        rotulo[i] = escolhido
+        tamanho[escolhido] += 1
+        carga[escolhido] += demanda[i]
+
+    clusters: List[List[int]] = [[] for _ in range(k)]
+    for i, c in enumerate(rotulo):
+        clusters[c].append(clientes[i])
+    angulo = np.arctan2(centros[:, 1] - centro[1], centros[:, 0] - centro[0])
+    return [clusters[c] for c in np.argsort(angulo).tolist() if clusters[c]]
+
+
+def _resolve_cluster(
+    algoritmo: str,
+    G: MatrizDistancias,
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    parametros: Dict[str, Any]
+) -> Tuple[List[List[int]], float]:
+    """resolve uma sub-instância (também chamada nos processos do pool)"""
+    return carrega_algoritmo(algoritmo)(G, demands, depot, capacity, **parametros)
+
+
+def _parametros_aceitos(algoritmo: str, parametros: Dict[str, Any]) -> Dict[str, Any]:
+    aceitos = inspect.signature(carrega_algoritmo(algoritmo)).parameters
+    return {nome: valor for nome, valor in parametros.items() if nome in aceitos}
+
+
+def _melhora_fronteira(
+    G: MatrizDistancias,
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    rotas_a: List[List[int]],
+    rotas_b: List[List[int]]
+) -> Optional[Tuple[List[List[int]], List[List[int]]]]:
+    """
+    busca local sobre as rotas de dois clusters vizinhos (relocate, swap e 2-opt* entre rotas dos
+    dois lados); devolve as rotas redistribuídas entre os clusters, ou None se não melhorou
+    """
+    clientes_a = [c for rota in rotas_a for c in rota]
+    de_a = set(clientes_a)
+    sub = G.submatriz([depot] + clientes_a + [c for rota in rotas_b for c in rota])
+    antes = sum(sub.custo_rota(r, depot) for r in rotas_a + rotas_b)
+    rotas = busca_local(sub, rotas_a + rotas_b, depot, demands, capacity)
+    if sum(sub.custo_rota(r, depot) for r in rotas) >= antes:
+        return None
+    # cada rota fica no cluster de onde veio a maioria dos seus clientes
+    novas_a: List[List[int]] = []
+    novas_b: List[List[int]] = []
+    for rota in rotas:
+        (novas_a if 2 * sum(c in de_a for c in rota) >= len(rota) else novas_b).append(rota)
+    return novas_a, novas_b
+
+
+def cvrp_decomposicao(
+    G: Union["nx.Graph", MatrizDistancias],
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    metodo: str = "varredura",
+    max_clientes: int = 100,
+    algoritmo_clusters: str = "clarke_wright",
+    parametros: Optional[Dict[str, Any]] = None,
+    max_clientes_exato: int = 12,
+    tempo_limite_exato: float = 10.0,
+    melhorar_fronteiras: bool = True,
+    n_processos: int = 1,
+    seed: Optional[int] = None,
+    tempo_limite: Optional[float] = None,
+    instrumentacao: Optional[Instrumentacao] = None
+) -> Tuple[List[List[int]], float]:
+    """
+    decomposição cluster-first, route-second para instâncias grandes: divide os clientes em
+    clusters, resolve cada sub-instância (depósito + clientes do cluster) de forma independente e
+    junta as rotas, melhorando depois a fronteira entre clusters vizinhos.
+
+    argumentos:
+        metodo: "varredura" (ângulo em torno do depósito, ver `particiona_varredura`) ou "kmeans"
+            (ver `particiona_kmeans`); os dois precisam das coordenadas da instância
+        max_clientes: tamanho máximo de cada cluster
+        algoritmo_clusters: algoritmo de `utils.api.ALGORITMOS` usado nos clusters, com os `parametros`
+            que ele aceitar (seed, tempo_limite e n_processos=1 são repassados quando aceitos)
+        max_clientes_exato: clusters com até este número de clientes são resolvidos pelo branch and
+            bound, com `tempo_limite_exato` segundos cada (0 desliga)
+        melhorar_fronteiras: aplica a busca local às rotas de cada par de clusters vizinhos
+        n_processos: número de processos que resolvem os clusters em paralelo
+        tempo_limite: orçamento total; cada cluster recebe uma parte proporcional ao seu tamanho
+        instrumentacao: tempos das fases ("particao", "clusters", "fronteiras") e contadores
+            clusters, clusters_exatos e melhorias_fronteira
+    retorna:
+        (rotas, custo_total)
+    """
+    inicio = time.perf_counter() if instrumentacao is not None else 0.0
+    G = como_matriz(G)
+    if metodo == "varredura":
+        clusters = particiona_varredura(G, demands, depot, capacity, max_clientes)
+    elif metodo == "kmeans":
+        clusters = particiona_kmeans(G, demands, depot, capacity, max_clientes, seed)
+    else:
+        raise ValueError(f"Método de particionamento inválido: {metodo}")
+    if instrumentacao is not None:
+        instrumentacao.conta("clusters", len(clusters))
+        inicio = instrumentacao.cronometra("particao", inicio)
+
+    algoritmo = nome_algoritmo(algoritmo_clusters)
+    n_clientes = sum(len(c) for c in clusters)
+    tarefas = []
+    exatos = 0
+    for i, cluster in enumerate(clusters):
+        exato = len(cluster) <= max_clientes_exato
+        exatos += exato
+        nome = "branch_and_bound" if exato else algoritmo
+        extras = dict(parametros or {}) if not exato else {}
+        extras.setdefault("n_processos", 1)
+        if seed is not None:
+            extras.setdefault("seed", seed + i)
+        if tempo_limite is not None:
+            extras["tempo_limite"] = tempo_limite * len(cluster) / n_clientes
+        if exato:
+            extras["tempo_limite"] = min(extras.get("tempo_limite", tempo_limite_exato), tempo_limite_exato)
+        sub = G.submatriz([depot] + cluster)
+        tarefas.append((nome, sub, {c: demands[c] for c in cluster}, depot, capacity, _parametros_aceitos(nome, extras)))
+    if instrumentacao is not None:
+        instrumentacao.conta("clusters_exatos", exatos)
+
+    if n_processos > 1 and len(tarefas) > 1:
+        with ProcessPoolExecutor(max_workers=n_processos) as pool:
+            resultados = list(pool.map(_resolve_cluster, *zip(*tarefas)))
+    else:
+        resultados = [_resolve_cluster(*tarefa) for tarefa in tarefas]
+    rotas_cluster = [[list(r) for r in rotas if r] for rotas, _ in resultados]
+    if instrumentacao is not None:
+        inicio = instrumentacao.cronometra("clusters", inicio)
+
+    if melhorar_fronteiras and len(rotas_cluster) > 1:
+        # pares de clusters consecutivos em ângulo, incluindo o último com o primeiro
+        pares = [(i, i + 1) for i in range(len(rotas_cluster) - 1)]
+        if len(rotas_cluster) > 2:
+            pares.append((len(rotas_cluster) - 1, 0))
+        for a, b in pares:
+            melhoradas = _melhora_fronteira(G, demands, depot, capacity, rotas_cluster[a], rotas_cluster[b])
+            if melhoradas is not None:
+                rotas_cluster[a], rotas_cluster[b] = melhoradas
+                if instrumentacao is not None:
+                    instrumentacao.conta("melhorias_fronteira")
+        if instrumentacao is not None:
+            instrumentacao.cronometra("fronteiras", inicio)
+
+    rotas = [rota for grupo in rotas_cluster for rota in grupo]
+    return rotas, float(sum(G.custo_rota(r, depot) for r in rotas))
@@ -0,0 +1,191 @@
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
+import inspect
+import math
+import multiprocessing
+import queue
+import time
+
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+from utils.instrumentacao import Instrumentacao
+from utils.api import carrega_algoritmo, nome_algoritmo
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# os algoritmos recebem o orçamento com esta folga (segundos), para que a última solução de cada
+# um chegue antes do prazo do portfólio
+_FOLGA_PRAZO = 0.25
+# parâmetros usados no portfólio quando o usuário não informa outros: o GRASP e o LNS rodam até o prazo
+_PADROES: Dict[str, Dict[str, Any]] = {
+    "grasp": {"max_iterations": None},
+    "lns": {"max_iterations": None},
+}
+
+
+def _executa_algoritmo(
+    nome: str,
+    G: MatrizDistancias,
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    parametros: Dict[str, Any],
+    fila: Any,
+    limite_superior: Any
+) -> None:
+    """
+    roda um algoritmo do portfólio no processo filho. cada solução melhor (pelo `ao_melhorar`,
+    quando o algoritmo aceita) e a solução final vão para a fila como
+    (algoritmo, rotas, custo, final, limite inferior, instrumentação, erro)
+    """
+    funcao = carrega_algoritmo(nome)
+    aceitos = inspect.signature(funcao).parameters
+    extras = dict(parametros)
+    instrumentacao = Instrumentacao()
+    extras["instrumentacao"] = instrumentacao
+
+    def publica(rotas: List[List[int]], custo: float) -> None:
+        with limite_superior.get_lock():
+            if custo < limite_superior.value:
+                limite_superior.value = custo
+        fila.put((nome, rotas, custo, False, None, None, None))
+
+    if "ao_melhorar" in aceitos:
+        extras["ao_melhorar"] = lambda rotas, custo, _: publica(rotas, custo)
+    if "limite_superior" in aceitos:
+        extras["limite_superior"] = limite_superior
+    try:
+        rotas, custo = funcao(G, demands, depot, capacity, **extras)
+    except Exception as erro:
+        fila.put((nome, None, math.inf, True, None, None, f"{type(erro).__name__}: {erro}"))
+        return
+    with limite_superior.get_lock():
+        if rotas and custo < limite_superior.value:
+            limite_superior.value = custo
+    limite_inferior = instrumentacao.resultados.get("limite_inferior")
+    fila.put((nome, rotas, custo, True, limite_inferior, instrumentacao, None))
+
+
+def cvrp_portfolio(
+    G: Union["nx.Graph", MatrizDistancias],
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    algoritmos: Sequence[str] = ("clarke_wright", "grasp", "branch_and_bound"),
+    parametros: Optional[Dict[str, Dict[str, Any]]] = None,
+    tempo_limite: float = 30.0,
+    max_clientes_exato: int = 25,
+    ao_melhorar: Optional[Callable[[List[List[int]], float, float], None]] = None,
+    instrumentacao: Optional[Instrumentacao] = None
+) -> Tuple[List[List[int]], float]:
+    """
+    portfólio: roda os `algoritmos` ao mesmo tempo, cada um num processo, sobre a mesma matriz, e
+    devolve a melhor solução no `tempo_limite` ou assim que um algoritmo exato provar o ótimo.
+
+    o melhor custo conhecido fica num multiprocessing.Value compartilhado: as heurísticas escrevem
+    nele a cada melhora (pelo `ao_melhorar` delas) e o Branch and Bound o lê durante a busca para
+    podar (parâmetro `limite_superior`). as soluções chegam ao processo principal por uma fila,
+    então as dos algoritmos ainda em andamento no prazo não se perdem; esses processos são
+    encerrados no fim.
+
+    argumentos:
+        algoritmos: nomes de ALGORITMOS (ver utils/api.py)
+        parametros: {algoritmo: {parâmetro: valor}}; o GRASP e o LNS rodam por padrão até o prazo.
+            cada algoritmo roda no próprio processo, então n_processos > 1 num deles divide a CPU
+            com os demais
+        tempo_limite: prazo em segundos; os algoritmos que aceitam `tempo_limite` recebem o mesmo
+            prazo (menos uma folga pequena)
+        max_clientes_exato: os algoritmos exatos só entram no portfólio até esse número de
+            clientes, já que a geração de rotas deles cresce exponencialmente
+        ao_melhorar: chamada como ao_melhorar(rotas, custo, segundos desde o início) a cada nova melhor solução
+        instrumentacao: se informada, recebe os contadores e tempos de cada algoritmo com o nome dele
+            como prefixo, e em `resultados` o algoritmo da melhor solução ("vencedor"), se o ótimo foi
+            provado ("otimo") e o melhor limitante inferior recebido
+    retorna:
+        (rotas, custo_total)
+    """
+    G = como_matriz(G)
+    inicio = time.time()
+    prazo = inicio + tempo_limite
+    parametros = parametros or {}
+    n_clientes = sum(1 for no in G.nos if no != depot)
+    nomes: List[str] = []
+    for nome in map(nome_algoritmo, algoritmos):
+        if nome in ("branch_and_bound", "geracao_colunas") and n_clientes > max_clientes_exato:
+            continue
+        if nome not in nomes:
+            nomes.append(nome)
+    if not nomes:
+        raise ValueError("Nenhum algoritmo para o portfólio")
+
+    contexto = multiprocessing.get_context()
+    fila = contexto.Queue()
+    limite_superior = contexto.Value("d", math.inf)
+    processos: Dict[str, Any] = {}
+    for nome in nomes:
+        extras = dict(_PADROES.get(nome, {}))
+        extras.update(parametros.get(nome, {}))
+        if "tempo_limite" in inspect.signature(carrega_algoritmo(nome)).parameters:
+            extras["tempo_limite"] = min(extras.get("tempo_limite", tempo_limite), max(0.0, tempo_limite - _FOLGA_PRAZO))
+        processos[nome] = contexto.Process(
+            target=_executa_algoritmo, args=(nome, G, demands, depot, capacity, extras, fila, limite_superior)
+        )
+        processos[nome].start()
+
+    melhor: Optional[Tuple[float, List[List[int]], str]] = None
+    limite_inferior = 0.0
+    erros: List[str] = []
+    pendentes = set(nomes)
+
+    def recebe(mensagem: Tuple) -> None:
+        nonlocal melhor, limite_inferior
+        nome, rotas, custo, final, lb, tempos, erro = mensagem
+        if rotas is not None and (melhor is None or custo < melhor[0]):
+            melhor = (custo, [list(r) for r in rotas if r], nome)
+            if ao_melhorar is not None:
+                ao_melhorar(melhor[1], custo, time.time() - inicio)
+        if instrumentacao is not None:
+            instrumentacao.conta("solucoes_recebidas")
+        if not final:
+            return
+        pendentes.discard(nome)
+        if erro is not None:
+            erros.append(f"{nome}: {erro}")
+        if lb is not None:
+            limite_inferior = max(limite_inferior, lb)
+        if tempos is not None and instrumentacao is not None:
+            for contador, n in tempos.contadores.items():
+                instrumentacao.conta(f"{nome}.{contador}", n)
+            for fase, segundos in tempos.tempos.items():
+                instrumentacao.tempos[f"{nome}.{fase}"] = segundos
+
+    def provado() -> bool:
+        return melhor is not None and melhor[0] <= limite_inferior
+
+    try:
+        while pendentes and not provado():
+            restante = prazo - time.time()
+            if restante <= 0:
+                break
+            try:
+                recebe(fila.get(timeout=restante))
+            except queue.Empty:
+                break
+    finally:
+        # soluções que já estavam na fila contam, mesmo que tenham chegado junto com o prazo. a fila
+        # é esvaziada antes de encerrar os processos, porque um processo encerrado no meio de um
+        # `put` deixa uma mensagem pela metade na fila
+        while True:
+            try:
+                recebe(fila.get_nowait())
+            except queue.Empty:
+                break
+        for processo in processos.values():
+            if processo.is_alive():
+                processo.terminate()
+            processo.join()
+
+    if melhor is None:
+        raise RuntimeError("Nenhum algoritmo do portfólio terminou a tempo" + (": " + "; ".join(erros) if erros else ""))
+    if instrumentacao is not None:
+        instrumentacao.resultados.update(vencedor=melhor[2], otimo=provado(), limite_inferior=limite_inferior)
+    return melhor[1], float(melhor[0])
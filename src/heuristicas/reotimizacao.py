@@ -0,0 +1,219 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union, TYPE_CHECKING
+import numpy as np
+
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+from heuristicas.clarke_wright import clarke_wright
+from meta_heuristicas.busca_local import busca_local
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+
+class RoteamentoIncremental:
+    """
+    mantém uma solução do CVRP e a reotimiza a cada alteração (clientes novos, cancelados ou com
+    demanda alterada) sem resolver a instância de novo.
+
+    cada alteração custa O(n): o novo nó entra na matriz com `adiciona_no` e o cliente é colocado
+    na posição de menor custo de inserção entre as rotas em que cabe (ou numa rota nova). as rotas
+    tocadas e as rotas dos clientes mais próximos ficam marcadas, e `reotimiza` roda a busca
+    local só sobre elas, numa submatriz com os clientes dessas rotas.
+
+    a MatrizDistancias recebida é alterada no lugar; clientes cancelados continuam na matriz,
+    mas saem de `demands`, que passa a ser a lista de clientes da instância.
+    """
+
+    def __init__(
+        self,
+        G: Union["nx.Graph", MatrizDistancias],
+        demands: Dict[int, int],
+        depot: int,
+        capacity: int,
+        rotas: Optional[List[List[int]]] = None,
+        k_vizinhos: int = 20,
+        rotas_vizinhas: int = 2
+    ) -> None:
+        """
+        argumentos:
+            rotas: solução inicial; se não informada, usa a de Clarke & Wright
+            k_vizinhos: vizinhos por cliente testados na busca local
+            rotas_vizinhas: quantas rotas, além da alterada, entram na reotimização de cada
+                alteração (as dos clientes mais próximos do cliente alterado)
+        """
+        self.G = como_matriz(G)
+        self.demands = {no: dem for no, dem in demands.items() if no != depot}
+        self.depot = depot
+        self.capacity = capacity
+        self.k_vizinhos = k_vizinhos
+        self.rotas_vizinhas = rotas_vizinhas
+        if rotas is None:
+            rotas, _ = clarke_wright(self.G, self.demands, depot, capacity)
+        self._rotas: List[List[int]] = [list(r) for r in rotas if r]
+        self.carga = [sum(self.demands[c] for c in r) for r in self._rotas]
+        self.custo_rotas = [self.G.custo_rota(r, depot) for r in self._rotas]
+        self.rota_de: Dict[int, int] = {c: k for k, r in enumerate(self._rotas) for c in r}
+        self._afetadas: Set[int] = set()
+
+    @property
+    def rotas(self) -> List[List[int]]:
+        """rotas atuais, sem as que ficaram vazias"""
+        return [list(r) for r in self._rotas if r]
+
+    @property
+    def custo(self) -> float:
+        return float(sum(self.custo_rotas))
+
+    def _marca_vizinhas(self, no: int) -> None:
+        """marca as rotas dos clientes mais próximos de `no` (O(n) pela linha da matriz)"""
+        if self.rotas_vizinhas <= 0:
+            return
+        linha = self.G.matriz[self.G.indice[no]]
+        k = min(len(linha) - 1, 4 * self.k_vizinhos)
+        candidatos = np.argpartition(linha, k)[:k + 1] if k > 0 else np.arange(len(linha))
+        nos = self.G.nos
+        rotas = set()
+        for p in candidatos[np.argsort(linha[candidatos], kind="stable")]:
+            r = self.rota_de.get(nos[p])
+            if r is not None and r not in rotas:
+                rotas.add(r)
+                if len(rotas) > self.rotas_vizinhas:
+                    break
+        self._afetadas |= rotas
+
+    def _atualiza_rota(self, r: int) -> None:
+        rota = self._rotas[r]
+        self.carga[r] = sum(self.demands[c] for c in rota)
+        self.custo_rotas[r] = self.G.custo_rota(rota, self.depot) if rota else 0
+        for c in rota:
+            self.rota_de[c] = r
+
+    def _insere(self, no: int) -> int:
+        """insere o cliente na posição de menor custo entre as rotas em que cabe; devolve a rota"""
+        indice = self.G.indice
+        matriz = self.G.matriz
+        p = indice[no]
+        dep = indice[self.depot]
+        demanda = self.demands[no]
+        # arestas (a, b) de todas as rotas em que o cliente cabe, avaliadas de uma vez pelo NumPy
+        # (sem a lista de listas da matriz, que em instâncias grandes ocuparia gigabytes)
+        antes: List[int] = []
+        depois: List[int] = []
+        origem: List[Tuple[int, int]] = []
+        for r, rota in enumerate(self._rotas):
+            if not rota or self.carga[r] + demanda > self.capacity:
+                continue
+            posicoes = [indice[c] for c in rota]
+            antes += [dep] + posicoes
+            depois += posicoes + [dep]
+            origem += [(r, i) for i in range(len(rota) + 1)]
+        melhor: Optional[Tuple[int, int, int]] = None
+        if origem:
+            a = np.array(antes, dtype=np.intp)
+            b = np.array(depois, dtype=np.intp)
+            deltas = matriz[a, p].astype(np.int64) + matriz[p, b] - matriz[a, b]
+            k = int(np.argmin(deltas))
+            melhor = (int(deltas[k]),) + origem[k]
+        if melhor is None or melhor[0] >= int(matriz[dep, p]) + int(matriz[p, dep]):
+            self._rotas.append([no])
+            self.carga.append(0)
+            self.custo_rotas.append(0)
+            r = len(self._rotas) - 1
+        else:
+            _, r, i = melhor
+            self._rotas[r].insert(i, no)
+        self._atualiza_rota(r)
+        return r
+
+    def _retira(self, no: int) -> int:
+        r = self.rota_de.pop(no)
+        self._rotas[r].remove(no)
+        self._atualiza_rota(r)
+        return r
+
+    def adiciona_cliente(
+        self,
+        no: int,
+        demanda: int,
+        coord: Optional[Tuple[float, float]] = None,
+        distancias: Optional[Sequence[int]] = None
+    ) -> None:
+        """
+        novo cliente com as distâncias até os nós da matriz (na ordem de `G.nos`) ou, se a matriz
+        tiver coordenadas, só com a coordenada dele
+        """
+        if no == self.depot or no in self.rota_de:
+            raise ValueError(f"O cliente {no} já está na solução")
+        if demanda > self.capacity:
+            raise ValueError(f"Demanda {demanda} do cliente {no} maior que a capacidade {self.capacity}")
+        if distancias is None:
+            if coord is None:
+                raise ValueError("Informe a coordenada ou as distâncias do novo cliente")
+            distancias = self.G.distancias_ate(coord)
+        self.G.adiciona_no(no, distancias, coord)
+        self.demands[no] = demanda
+        self._afetadas.add(self._insere(no))
+        self._marca_vizinhas(no)
+
+    def remove_cliente(self, no: int) -> None:
+        if no not in self.rota_de:
+            raise ValueError(f"O cliente {no} não está na solução")
+        self._afetadas.add(self._retira(no))
+        del self.demands[no]
+        self._marca_vizinhas(no)
+
+    def altera_demanda(self, no: int, demanda: int) -> None:
+        """nova demanda; se a rota passar da capacidade, o cliente é reinserido onde couber"""
+        if no not in self.rota_de:
+            raise ValueError(f"O cliente {no} não está na solução")
+        if demanda > self.capacity:
+            raise ValueError(f"Demanda {demanda} do cliente {no} maior que a capacidade {self.capacity}")
+        r = self.rota_de[no]
+        self.carga[r] += demanda - self.demands[no]
+        self.demands[no] = demanda
+        self._afetadas.add(r)
+        if self.carga[r] > self.capacity:
+            self._retira(no)
+            self._afetadas.add(self._insere(no))
+        self._marca_vizinhas(no)
+
+    def reotimiza(self) -> None:
+        """busca local só sobre as rotas marcadas pelas alterações desde a última chamada"""
+        afetadas = sorted(r for r in self._afetadas if self._rotas[r])
+        self._afetadas = set()
+        if not afetadas:
+            return
+        clientes = [c for r in afetadas for c in self._rotas[r]]
+        sub = self.G.submatriz([self.depot] + clientes)
+        antes = sum(self.custo_rotas[r] for r in afetadas)
+        novas = busca_local(sub, [self._rotas[r] for r in afetadas], self.depot, self.demands, self.capacity, self.k_vizinhos)
+        if sum(sub.custo_rota(rota, self.depot) for rota in novas) >= antes:
+            return
+        # a busca local não cria rotas, então as novas cabem nas posições das antigas
+        for k, r in enumerate(afetadas):
+            self._rotas[r] = novas[k] if k < len(novas) else []
+            self._atualiza_rota(r)
+
+    def atualiza(
+        self,
+        novos: Optional[Dict[int, Tuple[int, Tuple[float, float]]]] = None,
+        cancelados: Iterable[int] = (),
+        demandas: Optional[Dict[int, int]] = None
+    ) -> Tuple[List[List[int]], float]:
+        """
+        aplica um lote de alterações e reotimiza as rotas afetadas.
+
+        argumentos:
+            novos: {cliente: (demanda, coordenada)} dos clientes que entram
+            cancelados: clientes que saem
+            demandas: {cliente: nova demanda} dos clientes que continuam
+        retorna:
+            (rotas, custo_total)
+        """
+        for no in cancelados:
+            self.remove_cliente(no)
+        for no, demanda in (demandas or {}).items():
+            self.altera_demanda(no, demanda)
+        for no, (demanda, coord) in (novos or {}).items():
+            self.adiciona_cliente(no, demanda, coord)
+        self.reotimiza()
+        return self.rotas, self.custo
@@ -0,0 +1,79 @@
+from collections import deque
+from typing import Dict, List, Sequence, Tuple, Union, TYPE_CHECKING
+import numpy as np
+
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+
+def tour_gigante(rotas: List[List[int]]) -> List[int]:
+    """concatena as rotas num único tour sem o depósito (a representação usada pelo `split`)"""
+    return [c for rota in rotas for c in rota]
+
+
+def split(
+    G: Union["nx.Graph", MatrizDistancias],
+    tour: Sequence[int],
+    depot: int,
+    demands: Dict[int, int],
+    capacity: int
+) -> Tuple[List[List[int]], float]:
+    """
+    divide um tour gigante (permutação dos clientes) na melhor sequência de rotas que respeitam a
+    capacidade, mantendo a ordem do tour: caminho mínimo no grafo auxiliar em que o arco (i, j)
+    é a rota com os clientes i+1..j.
+
+    versão linear (Vidal, 2016): com o custo da rota i+1..j escrito como
+    f(i) + dist(j) + volta(j), em que f(i) = p(i) + ida(i+1) - dist(i+1) só depende do
+    predecessor i, os predecessores candidatos ficam num deque em ordem crescente de f. um
+    predecessor mais à frente no tour e com f menor ou igual domina os anteriores (cabe em rotas
+    por mais tempo), e a frente do deque sai quando a rota passa da capacidade, então cada
+    cliente entra e sai do deque uma vez: O(n) no total.
+
+    retorna:
+        (rotas, custo_total)
+    """
+    G = como_matriz(G)
+    n = len(tour)
+    if not n:
+        return [], 0.0
+    dep = G.indice[depot]
+    posicoes = np.array([G.indice[c] for c in tour], dtype=np.intp)
+    # ida e volta ao depósito e distância acumulada ao longo do tour (dist[k] = de tour[0] a tour[k-1])
+    ida = G.matriz[dep, posicoes].tolist()
+    volta = G.matriz[posicoes, dep].tolist()
+    dist = [0] + np.concatenate(([0], np.cumsum(G.matriz[posicoes[:-1], posicoes[1:]], dtype=np.int64))).tolist()
+    carga = [0] + np.cumsum([demands[c] for c in tour], dtype=np.int64).tolist()
+    if max(demands[c] for c in tour) > capacity:
+        raise ValueError("Instância inviável: há cliente com demanda maior que a capacidade")
+
+    # p[j]: custo mínimo para atender os j primeiros clientes; antes[j]: predecessor no caminho
+    p = [0] * (n + 1)
+    antes = [0] * (n + 1)
+
+    def f(i: int) -> int:
+        return p[i] + ida[i] - dist[i + 1]
+
+    candidatos = deque([0])
+    for j in range(1, n + 1):
+        while carga[j] - carga[candidatos[0]] > capacity:
+            candidatos.popleft()
+        i = candidatos[0]
+        p[j] = f(i) + dist[j] + volta[j - 1]
+        antes[j] = i
+        if j < n:
+            fj = f(j)
+            while candidatos and f(candidatos[-1]) >= fj:
+                candidatos.pop()
+            candidatos.append(j)
+
+    rotas: List[List[int]] = []
+    j = n
+    while j > 0:
+        i = antes[j]
+        rotas.append(list(tour[i:j]))
+        j = i
+    rotas.reverse()
+    return rotas, float(p[n])
@@ -0,0 +1,155 @@
+from typing import Dict, List, Optional, Union, TYPE_CHECKING
+
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+from utils.solucao import Solucao
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+
+def busca_local(
+    G: Union["nx.Graph", MatrizDistancias],
+    rotas: List[List[int]],
+    depot: int,
+    demands: Optional[Dict[int, int]] = None,
+    capacity: Optional[int] = None,
+    k_vizinhos: int = 20
+) -> List[List[int]]:
+    """
+    busca local por primeira melhora com avaliação dos movimentos pela diferença de custo (O(1)).
+
+    vizinhanças: relocate (cliente antes/depois de outro), swap e 2-opt dentro da rota e,
+    quando `demands` e `capacity` são informados, também relocate, swap e 2-opt* entre rotas
+    com checagem de capacidade pelas cargas guardadas. só são testados os movimentos que
+    aproximam cada cliente de um dos seus `k_vizinhos` vizinhos mais próximos.
+
+    retorna:
+        rotas melhoradas (sem rotas vazias)
+    """
+    G = como_matriz(G)
+    demanda = [0] * len(G)
+    if demands is not None:
+        for no, dem in demands.items():
+            if no in G.indice:
+                demanda[G.indice[no]] = dem
+    # sem as demandas não há como checar a capacidade, então só há movimentos dentro das rotas
+    capacidade = capacity if demands is not None else None
+    solucao = Solucao(G, depot, demanda, [[G.indice[c] for c in r] for r in rotas if r], capacidade)
+    melhora_solucao(solucao, k_vizinhos)
+    return solucao.como_rotas()
+
+
+def melhora_solucao(solucao: Solucao, k_vizinhos: int = 20) -> Solucao:
+    """
+    aplica a busca local de `busca_local` diretamente numa Solucao (alterada no lugar e devolvida);
+    os movimentos entre rotas só são tentados se a solução tiver capacidade.
+    o custo da solução final fica em `solucao.custo_total`, sem precisar recalcular as rotas.
+    """
+    solucao.prepara_alteracoes()
+    G = solucao.G
+    d = solucao.d
+    dep = solucao.dep
+    demanda = solucao.demanda
+    entre_rotas = solucao.capacidade is not None
+    Q = solucao.capacidade if entre_rotas else 0
+
+    R = solucao.rotas
+    rota_de = solucao.rota_de
+    indice_de = solucao.indice_de
+    carga = solucao.carga
+    acumulada = solucao.demanda_acumulada
+
+    clientes = [c for r in R for c in r]
+    vizinhos = G.vizinhos_mais_proximos(k_vizinhos, excluir=[dep]).tolist()
+
+    def anterior(r: int, i: int) -> int:
+        return R[r][i - 1] if i > 0 else dep
+
+    def proximo(r: int, i: int) -> int:
+        rota = R[r]
+        return rota[i + 1] if i + 1 < len(rota) else dep
+
+    def tenta_movimentos(u: int, v: int) -> bool:
+        """avalia os movimentos entre u e o vizinho v e aplica o primeiro que melhora"""
+        r1, i1 = rota_de[u], indice_de[u]
+        r2, i2 = rota_de[v], indice_de[v]
+        mesma_rota = r1 == r2
+        if not mesma_rota and not entre_rotas:
+            return False
+        pu, nu = anterior(r1, i1), proximo(r1, i1)
+        pv, nv = anterior(r2, i2), proximo(r2, i2)
+        du, dv = d[u], d[v]
+        cabe_u = mesma_rota or carga[r2] + demanda[u] <= Q
+
+        # relocate: retira u e insere entre v e o próximo de v, ou entre o anterior de v e v
+        remocao = d[pu][u] + du[nu] - d[pu][nu]
+        if cabe_u and nv != u and pu != v:
+            if dv[u] + du[nv] - dv[nv] - remocao < 0:
+                solucao.move(u, r2, i2 + 1 if r1 != r2 or i2 < i1 else i2)
+                return True
+        if cabe_u and pv != u and nu != v:
+            if d[pv][u] + du[v] - d[pv][v] - remocao < 0:
+                solucao.move(u, r2, i2 if r1 != r2 or i2 < i1 else i2 - 1)
+                return True
+
+        # swap entre clientes não adjacentes
+        if nu != v and nv != u:
+            if mesma_rota or (carga[r1] - demanda[u] + demanda[v] <= Q and carga[r2] - demanda[v] + demanda[u] <= Q):
+                delta = (d[pu][v] + dv[nu] + d[pv][u] + du[nv]) - (d[pu][u] + du[nu] + d[pv][v] + dv[nv])
+                if delta < 0:
+                    solucao.rota_mutavel(r1)[i1] = v
+                    solucao.rota_mutavel(r2)[i2] = u
+                    return _atualiza(solucao, r1, r2)
+
+        if mesma_rota:
+            # 2-opt: inverte o trecho entre u e v para que os dois fiquem adjacentes
+            if i1 < i2:
+                if du[v] + d[nu][nv] - du[nu] - dv[nv] < 0:
+                    rota = solucao.rota_mutavel(r1)
+                    rota[i1 + 1:i2 + 1] = rota[i2:i1:-1]
+                    return _atualiza(solucao, r1, r1)
+            elif pu != v:
+                if d[pv][pu] + dv[u] - d[pv][v] - d[pu][u] < 0:
+                    rota = solucao.rota_mutavel(r1)
+                    rota[i2:i1] = rota[i2:i1][::-1]
+                    return _atualiza(solucao, r1, r1)
+            return False
+
+        # 2-opt*: troca as caudas das rotas, ligando u a v
+        pre_u = acumulada[r1][i1]
+        pre_pv = acumulada[r2][i2 - 1] if i2 > 0 else 0
+        if pre_u + carga[r2] - pre_pv <= Q and pre_pv + carga[r1] - pre_u <= Q:
+            if du[v] + d[pv][nu] - du[nu] - d[pv][v] < 0:
+                nova_u, nova_v = R[r1][:i1 + 1] + R[r2][i2:], R[r2][:i2] + R[r1][i1 + 1:]
+                solucao.troca_rota(r1, nova_u)
+                solucao.troca_rota(r2, nova_v)
+                return True
+        pre_v = acumulada[r2][i2]
+        if pre_u + pre_v <= Q and carga[r1] - pre_u + carga[r2] - pre_v <= Q:
+            if du[v] + d[nu][nv] - du[nu] - dv[nv] < 0:
+                inicio_u, fim_u = R[r1][:i1 + 1], R[r1][i1 + 1:]
+                inicio_v, fim_v = R[r2][:i2 + 1], R[r2][i2 + 1:]
+                solucao.troca_rota(r1, inicio_u + inicio_v[::-1])
+                solucao.troca_rota(r2, fim_u[::-1] + fim_v)
+                return True
+        return False
+
+    melhorou = True
+    while melhorou:
+        melhorou = False
+        for u in clientes:
+            for v in vizinhos[u]:
+                if rota_de[v] == -1:
+                    continue
+                if tenta_movimentos(u, v):
+                    melhorou = True
+                    break
+
+    return solucao
+
+
+def _atualiza(solucao: Solucao, r1: int, r2: int) -> bool:
+    solucao.atualiza(r1)
+    if r2 != r1:
+        solucao.atualiza(r2)
+    return True
@@ -1,96 +1,402 @@
-from typing import Dict, List, Tuple
-import networkx as nx
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import itertools
+import multiprocessing
+import random
+import time
 
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+from utils.instrumentacao import Instrumentacao
+from utils.solucao import Solucao
+from meta_heuristicas.busca_local import busca_local, melhora_solucao
+from meta_heuristicas.path_relinking import PoolElite, path_relinking
+from heuristicas.split import split, tour_gigante
 from utils.grasp_utils import (
-    criar_LRC, 
-    escolher_da_LRC_random, 
-    custo_rota, 
-    custo_total,
-    numero_veiculos_estimado, 
-    pode_adicionar
+    AlphaReativo,
+    CandidatosGRASP,
+    criar_LRC_vetorizada,
+    escolher_da_LRC_random,
+    semente_iteracao
 )
 
-def greedy_search(G: nx.Graph, demands: Dict[int, int], depot: int, capacity: int, alpha: float) -> List[List[int]]:
-    clientes = [n for n in G.nodes() if n != depot]
-    clientes_nao_visitados = set(clientes)
-    n_veiculos = numero_veiculos_estimado(demands, capacity)
+if TYPE_CHECKING:
+    import networkx as nx
 
-    rotas: List[List[int]] = [[] for _ in range(n_veiculos)]
+# fração dos clientes: duas soluções do pool elite diferem em pelo menos essa parte das arestas
+_DIVERSIDADE_ELITE = 0.1
+# iterações por bloco enviado aos processos quando não há max_iterations (modo anytime)
+_BLOCO_ANYTIME = 4
+# construções aceitas pelo GRASP: rota a rota ou tour gigante dividido pelo split
+CONSTRUCOES = ("rotas", "split")
 
-    for k in range(n_veiculos):
+def greedy_search(
+    G: Union["nx.Graph", MatrizDistancias],
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    alpha: float,
+    rng: Optional[random.Random] = None,
+    k_vizinhos: Optional[int] = None
+) -> List[List[int]]:
+    """
+    construção gulosa aleatorizada: cada rota recebe clientes da LRC até nenhum caber no veículo.
+
+    os candidatos ficam ordenados por demanda (ver `CandidatosGRASP`), então os que cabem são
+    achados por busca binária, e a LRC sai do mínimo e do máximo da linha de distâncias, sem
+    ordenar. com `k_vizinhos` a LRC é montada só com os k vizinhos mais próximos do último
+    cliente que ainda cabem, e os demais só são vistos quando nenhum deles está disponível.
+    """
+    G = como_matriz(G)
+    candidatos = CandidatosGRASP(G, demands, depot)
+    dep = G.indice[depot]
+    vizinhos = G.vizinhos_mais_proximos(k_vizinhos, excluir=[dep]) if k_vizinhos else None
+
+    rotas: List[List[int]] = []
+    while candidatos:
+        rota: List[int] = []
         capacidade_restante = capacity
-        ultimo = depot
-        while True:
-            candidatos = [c for c in clientes_nao_visitados if pode_adicionar(demands.get(c, 0), capacidade_restante)]
-            if not candidatos:
-                break
-            lrc = criar_LRC(alpha, G, ultimo, candidatos)
-            escolhido = escolher_da_LRC_random(lrc)
-            rotas[k].append(escolhido)
-            capacidade_restante -= demands.get(escolhido, 0)
-            clientes_nao_visitados.remove(escolhido)
+        ultimo = dep
+        while candidatos:
+            disponiveis = candidatos.disponiveis(vizinhos[ultimo], capacidade_restante) if vizinhos is not None else None
+            if disponiveis is None or not disponiveis.size:
+                disponiveis = candidatos.que_cabem(capacidade_restante)
+                if not disponiveis.size:
+                    break
+            lrc = criar_LRC_vetorizada(alpha, G.matriz[ultimo, disponiveis], disponiveis)
+            escolhido = int(escolher_da_LRC_random(lrc, rng))
+            rota.append(escolhido)
+            capacidade_restante -= int(candidatos.demanda[escolhido])
+            candidatos.remove(escolhido)
             ultimo = escolhido
-        if not clientes_nao_visitados:
-            break
+        if not rota:
+            raise ValueError("Instância inviável: há cliente com demanda maior que a capacidade")
+        rotas.append([G.nos[p] for p in rota])
 
-    while clientes_nao_visitados:
-        rotas.append([])
-        capacidade_restante = capacity
-        ultimo = depot
+    return rotas
+
+def greedy_tour(
+    G: Union["nx.Graph", MatrizDistancias],
+    demands: Dict[int, int],
+    depot: int,
+    alpha: float,
+    rng: Optional[random.Random] = None,
+    k_vizinhos: Optional[int] = None
+) -> List[int]:
+    """
+    tour gigante pela mesma regra da LRC de `greedy_search`, mas sem capacidade: o tour passa
+    por todos os clientes e o `split` decide depois onde cada rota termina
+    """
+    G = como_matriz(G)
+    candidatos = CandidatosGRASP(G, demands, depot)
+    dep = G.indice[depot]
+    vizinhos = G.vizinhos_mais_proximos(k_vizinhos, excluir=[dep]) if k_vizinhos else None
+    sem_limite = int(candidatos.demanda.max(initial=0))
+
+    tour: List[int] = []
+    ultimo = dep
+    while candidatos:
+        disponiveis = candidatos.disponiveis(vizinhos[ultimo], sem_limite) if vizinhos is not None else None
+        if disponiveis is None or not disponiveis.size:
+            disponiveis = candidatos.que_cabem(sem_limite)
+        lrc = criar_LRC_vetorizada(alpha, G.matriz[ultimo, disponiveis], disponiveis)
+        escolhido = int(escolher_da_LRC_random(lrc, rng))
+        tour.append(escolhido)
+        candidatos.remove(escolhido)
+        ultimo = escolhido
+    return [G.nos[p] for p in tour]
+
+def local_search(
+    G: Union["nx.Graph", MatrizDistancias],
+    rotas: List[List[int]],
+    depot: int,
+    demands: Optional[Dict[int, int]] = None,
+    capacity: Optional[int] = None
+) -> List[List[int]]:
+    """
+    melhora as rotas com a busca local por diferença de custo (2-opt, relocate e swap);
+    com demands e capacity também move clientes entre rotas
+    """
+    return busca_local(G, rotas, depot, demands, capacity)
+
+def _iteracao_grasp(
+    G: MatrizDistancias,
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    alpha: float,
+    rng: random.Random,
+    k_vizinhos: Optional[int] = None,
+    instrumentacao: Optional[Instrumentacao] = None,
+    elite: Optional[PoolElite] = None,
+    prazo: Optional[float] = None,
+    construcao: str = "rotas"
+) -> Tuple[List[List[int]], float]:
+    """
+    uma iteração do GRASP: construção gulosa aleatorizada (rota a rota ou, com construcao="split",
+    tour gigante dividido pelo `split`) seguida da busca local. com `elite`,
+    o path relinking caminha de uma solução sorteada do pool até o ótimo local (no sentido
+    contrário, partindo da solução de elite, os resultados foram melhores), a melhor solução
+    intermediária passa pela busca local e a melhor das duas tenta entrar no pool
+    """
+    inicio = time.perf_counter() if instrumentacao is not None else 0.0
+    if construcao == "split":
+        candidatoGreedy, _ = split(G, greedy_tour(G, demands, depot, alpha, rng, k_vizinhos), depot, demands, capacity)
+    else:
+        candidatoGreedy = greedy_search(G, demands, depot, capacity, alpha, rng, k_vizinhos)
+    if instrumentacao is not None:
+        inicio = instrumentacao.cronometra("construcao", inicio)
+    # a Solucao mantém o custo das rotas durante a busca local, então não é preciso recalculá-lo
+    solucao = melhora_solucao(Solucao.de_rotas(G, candidatoGreedy, depot, demands, capacity))
+    candidato, custo = solucao.como_rotas(), float(solucao.custo_total)
+    if construcao == "split":
+        # o ótimo local vira tour gigante de novo; se o split achar cortes melhores, mais uma busca local
         while True:
-            candidatos = [c for c in clientes_nao_visitados if pode_adicionar(demands.get(c, 0), capacidade_restante)]
-            if not candidatos:
+            rotas_split, custo_split = split(G, tour_gigante(candidato), depot, demands, capacity)
+            if custo_split >= custo:
                 break
-            lrc = criar_LRC(alpha, G, ultimo, candidatos)
-            escolhido = escolher_da_LRC_random(lrc)
-            rotas[-1].append(escolhido)
-            capacidade_restante -= demands.get(escolhido, 0)
-            clientes_nao_visitados.remove(escolhido)
-            ultimo = escolhido
+            if instrumentacao is not None:
+                instrumentacao.conta("split_melhorias")
+            solucao = melhora_solucao(Solucao.de_rotas(G, rotas_split, depot, demands, capacity))
+            candidato, custo = solucao.como_rotas(), float(solucao.custo_total)
+    if instrumentacao is not None:
+        inicio = instrumentacao.cronometra("busca_local", inicio)
+    if elite is None:
+        return candidato, custo
+
+    if len(elite):
+        guia = elite.sorteia(rng)
+        intermediaria, _ = path_relinking(G, guia, candidato, depot, demands, capacity, prazo)
+        religada = melhora_solucao(Solucao.de_rotas(G, intermediaria, depot, demands, capacity))
+        if religada.custo_total < custo:
+            candidato, custo = religada.como_rotas(), float(religada.custo_total)
+            if instrumentacao is not None:
+                instrumentacao.conta("path_relinking_melhorias")
+        if instrumentacao is not None:
+            instrumentacao.cronometra("path_relinking", inicio)
+    elite.adiciona(candidato, custo)
+    return candidato, custo
+
+
+def _alpha_da_iteracao(
+    alphas: List[float],
+    probabilidades: Optional[List[float]],
+    rng: random.Random
+) -> Tuple[int, float]:
+    """
+    (índice, valor) do alpha usado numa iteração; sem probabilidades (GRASP não reativo) não
+    consome números do gerador, mantendo as iterações iguais às de um alpha fixo
+    """
+    if probabilidades is None:
+        return 0, alphas[0]
+    indice = rng.choices(range(len(alphas)), weights=probabilidades)[0]
+    return indice, alphas[indice]
+
+
+# dados da instância em cada processo do pool, enviados uma única vez pelo initializer
+_instancia_worker: Optional[Tuple[MatrizDistancias, Dict[int, int], int, int, List[float], Optional[int], str]] = None
+_parar_worker = None
+_instrumentar_worker = False
+
+
+def _inicializa_worker(G, demands, depot, capacity, alphas, k_vizinhos, construcao, parar, instrumentar=False) -> None:
+    global _instancia_worker, _parar_worker, _instrumentar_worker
+    _instancia_worker = (G, demands, depot, capacity, alphas, k_vizinhos, construcao)
+    _parar_worker = parar
+    _instrumentar_worker = instrumentar
 
-    rotas = [r for r in rotas if r]
-    return rotas
 
-def local_search(G: nx.Graph, rotas: List[List[int]], depot: int) -> List[List[int]]:
+def _executa_bloco(
+    seed: int,
+    iteracoes: range,
+    prazo: Optional[float],
+    custo_alvo: Optional[float],
+    probabilidades: Optional[List[float]] = None,
+    elite: Optional[PoolElite] = None
+) -> Tuple[Optional[Tuple[float, int, List[List[int]]]], bool, List[Tuple[int, float]], Optional[Instrumentacao], Optional[PoolElite]]:
     """
-    percorre a lista pra fazer trocas adjacentes
+    executa um bloco de iterações no worker e devolve ((custo, iteração, rotas) da melhor, atingiu_alvo,
+    (índice do alpha, custo) de cada iteração, tempos das fases se o pool foi criado com instrumentação,
+    cópia do pool elite atualizada pelo bloco)
     """
-    melhor = [r[:] for r in rotas]
-    improved = True
-    while improved:
-        improved = False
-        for k, rota in enumerate(melhor):
-            for i in range(len(rota) - 1):
-                antes = custo_rota(G, rota, depot)
-                rota[i], rota[i+1] = rota[i+1], rota[i]
-                depois = custo_rota(G, rota, depot)
-                if depois < antes:
-                    improved = True
-                else:
-                    rota[i], rota[i+1] = rota[i+1], rota[i]
-            melhor[k] = rota
-    return melhor
+    G, demands, depot, capacity, alphas, k_vizinhos, construcao = _instancia_worker
+    instrumentacao = Instrumentacao() if _instrumentar_worker else None
+    melhor = None
+    historico: List[Tuple[int, float]] = []
+    for it in iteracoes:
+        if _parar_worker.is_set() or (prazo is not None and time.time() >= prazo):
+            break
+        rng = semente_iteracao(seed, it)
+        indice, alpha = _alpha_da_iteracao(alphas, probabilidades, rng)
+        rotas, custo = _iteracao_grasp(G, demands, depot, capacity, alpha, rng, k_vizinhos, instrumentacao, elite, prazo, construcao)
+        historico.append((indice, custo))
+        if melhor is None or custo < melhor[0]:
+            melhor = (custo, it, rotas)
+        if custo_alvo is not None and custo <= custo_alvo:
+            return melhor, True, historico, instrumentacao, elite
+    return melhor, False, historico, instrumentacao, elite
+
 
 def grasp_cvrp(
-    G: nx.Graph,
+    G: Union["nx.Graph", MatrizDistancias],
     demands: Dict[int, int],
     depot: int,
     capacity: int,
     alpha: float = 0.5,
-    max_iterations: int = 10,
+    max_iterations: Optional[int] = 10,
+    seed: Optional[int] = None,
+    n_processos: int = 1,
+    custo_alvo: Optional[float] = None,
+    tempo_limite: Optional[float] = None,
+    k_vizinhos: Optional[int] = None,
+    alphas: Optional[Sequence[float]] = None,
+    instrumentacao: Optional[Instrumentacao] = None,
+    elite: int = 0,
+    ao_melhorar: Optional[Callable[[List[List[int]], float, float], None]] = None,
+    construcao: str = "rotas",
 ) -> Tuple[List[List[int]], float]:
+    """
+    executa o GRASP (construção gulosa aleatorizada + busca local) por `max_iterations` iterações.
+
+    argumentos:
+        max_iterations: None para rodar até o `tempo_limite` ou o `custo_alvo` (modo anytime:
+            devolve a melhor solução disponível no prazo; a iteração em andamento termina antes)
+        seed: semente mestre; cada iteração usa um gerador próprio derivado dela, então o
+            resultado é o mesmo com qualquer número de processos. sem seed, uma semente é
+            sorteada do módulo random global.
+        n_processos: número de processos que dividem as iterações (1 = sequencial)
+        custo_alvo: encerra assim que alguma iteração encontrar custo <= custo_alvo
+        tempo_limite: orçamento de tempo em segundos; iterações não iniciadas até lá são descartadas,
+            mas pelo menos uma iteração sempre é feita
+        k_vizinhos: se informado, a construção considera só os k vizinhos mais próximos do último
+            cliente (recomendado para instâncias com milhares de clientes)
+        alphas: se informado, GRASP reativo: o alpha de cada iteração é sorteado desta lista,
+            favorecendo os valores que deram soluções melhores (ver `AlphaReativo`); `alpha` é ignorado
+        instrumentacao: se informada, recebe o tempo gasto na construção e na busca local (somado
+            entre os processos) e um passo "iteracoes" por iteração, com o custo e o melhor custo
+        elite: tamanho do pool elite (0 = sem path relinking). cada ótimo local é religado a uma
+            solução do pool (ver `PoolElite` e `path_relinking`); em vários processos cada bloco
+            leva uma cópia do pool, e as soluções que entraram nela voltam para o pool principal
+        ao_melhorar: chamada como ao_melhorar(rotas, custo, segundos desde o início) a cada nova
+            melhor solução (em vários processos, quando o bloco que a achou termina)
+        construcao: "rotas" (cada rota recebe clientes da LRC até nenhum caber) ou "split" (um tour
+            gigante pela LRC, sem capacidade, dividido nas melhores rotas pelo `split` em O(n); o
+            ótimo local volta a ser dividido pelo split, contado em "split_melhorias" quando melhora)
+    retorna:
+        (rotas, custo_total)
+
+    com custo_alvo ou tempo_limite o resultado passa a depender de quais iterações
+    terminaram a tempo, então só é reprodutível sem esses critérios de parada. o GRASP
+    reativo em vários processos também depende da ordem em que os blocos terminam.
+    """
+
+    # converte uma única vez, as iterações reaproveitam a mesma matriz
+    G = como_matriz(G)
+    if max_iterations is None and tempo_limite is None and custo_alvo is None:
+        raise ValueError("Sem max_iterations é preciso informar tempo_limite ou custo_alvo")
+    if construcao not in CONSTRUCOES:
+        raise ValueError(f"Construção inválida: {construcao} (opções: {', '.join(CONSTRUCOES)})")
+    if seed is None:
+        seed = random.randrange(2**32)
+    inicio = time.time()
+    prazo = inicio + tempo_limite if tempo_limite is not None else None
+    reativo = AlphaReativo(alphas) if alphas is not None else None
+    lista_alphas = reativo.alphas if reativo is not None else [alpha]
 
-    best_solution = None
-    best_cost = float('inf')
+    def probabilidades() -> Optional[List[float]]:
+        return list(reativo.probabilidades) if reativo is not None else None
+
+    pool_elite = None
+    if elite > 0:
+        n_clientes = sum(1 for no in G.nos if no != depot)
+        pool_elite = PoolElite(elite, depot, max(1, int(_DIVERSIDADE_ELITE * n_clientes)))
+
+    # melhor solução como (custo, iteração, rotas): empates ficam com a iteração de menor índice
+    melhor: Optional[Tuple[float, int, List[List[int]]]] = None
+
+    def atualiza_melhor(candidata: Tuple[float, int, List[List[int]]]) -> None:
+        nonlocal melhor
+        if melhor is not None and candidata[:2] >= melhor[:2]:
+            return
+        melhorou = melhor is None or candidata[0] < melhor[0]
+        melhor = candidata
+        if melhorou and ao_melhorar is not None:
+            ao_melhorar(candidata[2], candidata[0], time.time() - inicio)
+
+    if n_processos <= 1:
+        for it in (range(max_iterations) if max_iterations is not None else itertools.count()):
+            if prazo is not None and time.time() >= prazo:
+                break
+            rng = semente_iteracao(seed, it)
+            indice, alpha_it = _alpha_da_iteracao(lista_alphas, probabilidades(), rng)
+            rotas, custo = _iteracao_grasp(
+                G, demands, depot, capacity, alpha_it, rng, k_vizinhos, instrumentacao, pool_elite, prazo, construcao
+            )
+            if reativo is not None:
+                reativo.registra(indice, custo)
+            atualiza_melhor((custo, it, rotas))
+            if instrumentacao is not None:
+                instrumentacao.passo("iteracoes", custo=custo, melhor=melhor[0])
+            if custo_alvo is not None and custo <= custo_alvo:
+                break
+    else:
+        # blocos pequenos para balancear a carga entre os processos; são enviados aos poucos para
+        # que cada bloco leve as probabilidades mais recentes do GRASP reativo
+        if max_iterations is not None:
+            tamanho_bloco = max(1, max_iterations // (n_processos * 4))
+            blocos = (range(i, min(i + tamanho_bloco, max_iterations)) for i in range(0, max_iterations, tamanho_bloco))
+        else:
+            blocos = (range(i, i + _BLOCO_ANYTIME) for i in itertools.count(0, _BLOCO_ANYTIME))
+        parar = multiprocessing.Event()
+        with ProcessPoolExecutor(
+            max_workers=n_processos,
+            initializer=_inicializa_worker,
+            initargs=(G, demands, depot, capacity, lista_alphas, k_vizinhos, construcao, parar, instrumentacao is not None),
+        ) as pool:
+            def envia_bloco() -> None:
+                if prazo is not None and time.time() >= prazo:
+                    return
+                bloco = next(blocos, None)
+                if bloco is not None:
+                    pendentes.add(pool.submit(
+                        _executa_bloco, seed, bloco, prazo, custo_alvo, probabilidades(), pool_elite
+                    ))
 
-    for _ in range(max_iterations):
-        candidatoGreedy = greedy_search(G, demands, depot, capacity, alpha)
-        candidato = local_search(G, candidatoGreedy, depot)
-        custo = custo_total(G, candidato, depot)
-        if custo < best_cost:
-            best_cost = custo
-            best_solution = candidato
+            pendentes = set()
+            for _ in range(n_processos * 2):
+                envia_bloco()
+            while pendentes:
+                prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    if futuro.cancelled():
+                        continue
+                    resultado, atingiu_alvo, historico, tempos, elite_bloco = futuro.result()
+                    if reativo is not None:
+                        for indice, custo in historico:
+                            reativo.registra(indice, custo)
+                    if pool_elite is not None:
+                        for custo, rotas in elite_bloco.entradas():
+                            pool_elite.adiciona(rotas, custo)
+                    if resultado is not None:
+                        atualiza_melhor(resultado)
+                    if instrumentacao is not None:
+                        instrumentacao.acumula(tempos)
+                        for _, custo in historico:
+                            instrumentacao.passo("iteracoes", custo=custo, melhor=melhor[0])
+                    if atingiu_alvo:
+                        parar.set()
+                        for p in pendentes:
+                            p.cancel()
+                    elif not parar.is_set():
+                        envia_bloco()
 
-    if best_solution is None:
+    if melhor is None and (max_iterations is None or max_iterations > 0):
+        # o prazo acabou antes da primeira iteração: uma iteração completa garante uma solução
+        rng = semente_iteracao(seed, 0)
+        _, alpha_it = _alpha_da_iteracao(lista_alphas, probabilidades(), rng)
+        rotas, custo = _iteracao_grasp(
+            G, demands, depot, capacity, alpha_it, rng, k_vizinhos, instrumentacao, pool_elite, prazo, construcao
+        )
+        atualiza_melhor((custo, 0, rotas))
+    if melhor is None:
         return [], 0.0
-    return best_solution, best_cost
+    return melhor[2], melhor[0]
@@ -0,0 +1,341 @@
+from typing import Callable, Dict, List, Optional, Tuple, Union, TYPE_CHECKING
+import math
+import random
+import time
+
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+from utils.instrumentacao import Instrumentacao
+from heuristicas.clarke_wright import clarke_wright
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+REMOCOES = ("aleatoria", "relacionada", "pior")
+# na remoção relacionada, tamanho máximo de cada trecho consecutivo tirado de uma rota
+_MAX_TRECHO = 10
+# na remoção pela pior posição, quantos clientes sorteados (por cliente removido) são comparados
+_CANDIDATOS_PIOR = 3
+
+
+def cvrp_lns(
+    G: Union["nx.Graph", MatrizDistancias],
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    max_iterations: Optional[int] = 20000,
+    tempo_limite: Optional[float] = None,
+    seed: Optional[int] = None,
+    remocao: str = "misto",
+    insercao: str = "regret",
+    aceitacao: str = "annealing",
+    max_removidos: int = 15,
+    temperatura_inicial: Optional[float] = None,
+    temperatura_final: Optional[float] = None,
+    desvio: float = 0.01,
+    k_vizinhos: int = 20,
+    rotas_iniciais: Optional[List[List[int]]] = None,
+    ao_melhorar: Optional[Callable[[List[List[int]], float, float], None]] = None,
+    instrumentacao: Optional[Instrumentacao] = None
+) -> Tuple[List[List[int]], float]:
+    """
+    busca em vizinhança grande (ruin and recreate) a partir da solução de Clarke & Wright.
+
+    a cada iteração remove de 1 a `max_removidos` clientes e os reinsere. só as rotas arruinadas
+    são recalculadas e, se a nova solução for rejeitada, só elas são restauradas (as listas
+    originais ficam guardadas), então uma iteração custa O(tamanho das rotas tocadas), não O(n).
+
+    argumentos:
+        max_iterations: número de iterações; None para rodar até o `tempo_limite`
+        tempo_limite: orçamento de tempo em segundos
+        seed: semente do gerador aleatório (resultado reprodutível sem tempo_limite)
+        remocao: "aleatoria", "relacionada" (trechos de rotas vizinhas a um cliente sorteado),
+            "pior" (clientes com maior economia ao serem retirados) ou "misto" (sorteia uma por iteração)
+        insercao: "regret" (regret-2: insere primeiro o cliente que mais perde se ficar para depois,
+            com os custos de inserção em cache e recalculados só na rota que mudou) ou "gulosa"
+            (cada cliente na posição mais barata, em ordem aleatória, por demanda ou por distância ao depósito)
+        aceitacao: "annealing" (simulated annealing com temperatura caindo geometricamente de
+            `temperatura_inicial` até `temperatura_final`; padrão: custo médio por cliente e 1% dele)
+            ou "rrt" (record-to-record: aceita até `desvio` acima do melhor custo)
+        k_vizinhos: a inserção testa as rotas dos k vizinhos mais próximos do cliente (e todas as
+            rotas só se nenhuma delas tiver capacidade)
+        rotas_iniciais: solução inicial no lugar da de Clarke & Wright
+        ao_melhorar: chamada como ao_melhorar(rotas, custo, segundos desde o início) a cada nova melhor solução
+        instrumentacao: se informada, recebe o tempo da fase "lns", um passo "iteracoes" por iteração
+            e os contadores "aceitas" e "melhorias"
+    retorna:
+        (rotas, custo_total)
+    """
+    G = como_matriz(G)
+    if max_iterations is None and tempo_limite is None:
+        raise ValueError("Sem max_iterations é preciso informar tempo_limite")
+    if remocao != "misto" and remocao not in REMOCOES:
+        raise ValueError(f"Remoção inválida: {remocao} (opções: misto, {', '.join(REMOCOES)})")
+    if insercao not in ("regret", "gulosa"):
+        raise ValueError(f"Inserção inválida: {insercao} (opções: regret, gulosa)")
+    if aceitacao not in ("annealing", "rrt"):
+        raise ValueError(f"Aceitação inválida: {aceitacao} (opções: annealing, rrt)")
+    inicio = time.time()
+    prazo = inicio + tempo_limite if tempo_limite is not None else None
+    rng = random.Random(seed)
+
+    if rotas_iniciais is None:
+        rotas_iniciais, _ = clarke_wright(G, demands, depot, capacity, instrumentacao=instrumentacao)
+    marca = time.perf_counter()
+
+    d = G.linhas()
+    dep = G.indice[depot]
+    n = len(G)
+    demanda = [0] * n
+    for no, dem in demands.items():
+        if no in G.indice:
+            demanda[G.indice[no]] = dem
+    Q = capacity
+
+    R: List[List[int]] = [[G.indice[c] for c in r] for r in rotas_iniciais if r]
+    clientes = [c for r in R for c in r]
+    if not clientes:
+        return [], 0.0
+    rota_de = [-1] * n
+    for k, rota in enumerate(R):
+        for c in rota:
+            rota_de[c] = k
+
+    def custo_de(rota: List[int]) -> int:
+        custo = 0
+        anterior = dep
+        for c in rota:
+            custo += d[anterior][c]
+            anterior = c
+        return custo + d[anterior][dep] if rota else 0
+
+    carga = [sum(demanda[c] for c in r) for r in R]
+    custo = [custo_de(r) for r in R]
+    atual = sum(custo)
+    melhor_custo = atual
+    melhores = [list(r) for r in R]
+    vizinhos = G.vizinhos_mais_proximos(k_vizinhos, excluir=[dep]).tolist()
+    vizinhos_de = [set(v) for v in vizinhos]
+    max_removidos = max(1, min(max_removidos, len(clientes)))
+
+    if temperatura_inicial is None:
+        temperatura_inicial = atual / len(clientes)
+    if temperatura_final is None:
+        temperatura_final = temperatura_inicial / 100
+    razao = math.log(temperatura_final / temperatura_inicial) if temperatura_inicial > 0 and temperatura_final > 0 else 0.0
+
+    # estado da iteração: rotas alteradas (com lista, carga e custo originais) e rotas vazias reaproveitáveis
+    salvas: Dict[int, Tuple[List[int], int, int]] = {}
+    vazias: List[int] = []
+
+    def toca(r: int) -> None:
+        """guarda a rota r antes da primeira alteração da iteração"""
+        if r not in salvas and r < n_rotas:
+            salvas[r] = (R[r], carga[r], custo[r])
+            R[r] = list(R[r])
+
+    def refaz(r: int, rota: List[int]) -> None:
+        nonlocal atual
+        toca(r)
+        R[r] = rota
+        carga[r] = sum(demanda[c] for c in rota)
+        novo = custo_de(rota)
+        atual += novo - custo[r]
+        custo[r] = novo
+        if not rota:
+            vazias.append(r)
+
+    def arruina(removidos: List[int]) -> None:
+        """tira os clientes das rotas, recalculando cada rota tocada uma vez só"""
+        por_rota: Dict[int, set] = {}
+        for c in removidos:
+            por_rota.setdefault(rota_de[c], set()).add(c)
+            rota_de[c] = -1
+        for r, fora in por_rota.items():
+            refaz(r, [c for c in R[r] if c not in fora])
+
+    def remove_aleatoria(q: int) -> List[int]:
+        return rng.sample(clientes, q)
+
+    def remove_relacionada(q: int) -> List[int]:
+        semente = rng.choice(clientes)
+        removidos: List[int] = []
+        arruinadas = set()
+        for c in [semente] + vizinhos[semente]:
+            if len(removidos) >= q:
+                break
+            r = rota_de[c]
+            if r < 0 or r in arruinadas:
+                continue
+            arruinadas.add(r)
+            rota = R[r]
+            tamanho = rng.randint(1, min(len(rota), _MAX_TRECHO, q - len(removidos)))
+            i = rota.index(c)
+            comeco = rng.randint(max(0, i - tamanho + 1), min(i, len(rota) - tamanho))
+            removidos.extend(rota[comeco:comeco + tamanho])
+        return removidos
+
+    def remove_pior(q: int) -> List[int]:
+        candidatos = rng.sample(clientes, min(len(clientes), _CANDIDATOS_PIOR * q))
+        economias = []
+        for c in candidatos:
+            rota = R[rota_de[c]]
+            i = rota.index(c)
+            a = rota[i - 1] if i > 0 else dep
+            b = rota[i + 1] if i + 1 < len(rota) else dep
+            economias.append((d[a][c] + d[c][b] - d[a][b], c))
+        economias.sort(reverse=True)
+        return [c for _, c in economias[:q]]
+
+    remocoes = {"aleatoria": remove_aleatoria, "relacionada": remove_relacionada, "pior": remove_pior}
+    sorteaveis = [remocoes[nome] for nome in (REMOCOES if remocao == "misto" else (remocao,))]
+
+    def melhor_na_rota(c: int, r: int) -> Tuple[int, int]:
+        """(variação do custo, posição) da inserção mais barata de c na rota r"""
+        dc = d[c]
+        anterior = dep
+        melhor, posicao = math.inf, 0
+        for i, x in enumerate(R[r]):
+            delta = dc[anterior] + dc[x] - d[anterior][x]
+            if delta < melhor:
+                melhor, posicao = delta, i
+            anterior = x
+        delta = dc[anterior] + dc[dep] - d[anterior][dep]
+        if delta < melhor:
+            melhor, posicao = delta, len(R[r])
+        return melhor, posicao
+
+    def rotas_candidatas(c: int) -> set:
+        dem = demanda[c]
+        rotas = {rota_de[v] for v in vizinhos[c]}
+        rotas.discard(-1)
+        rotas = {r for r in rotas if carga[r] + dem <= Q}
+        if not rotas:
+            rotas = {r for r in range(len(R)) if R[r] and carga[r] + dem <= Q}
+        return rotas
+
+    def insere(c: int, r: Optional[int], posicao: int) -> int:
+        """insere c na posição da rota r (None: rota nova) e devolve a rota"""
+        nonlocal atual
+        if r is None:
+            while vazias and (vazias[-1] >= len(R) or R[vazias[-1]]):
+                vazias.pop()
+            if vazias:
+                r = vazias.pop()
+            else:
+                R.append([])
+                carga.append(0)
+                custo.append(0)
+                r = len(R) - 1
+        toca(r)
+        rota = R[r]
+        anterior = rota[posicao - 1] if posicao > 0 else dep
+        seguinte = rota[posicao] if posicao < len(rota) else dep
+        delta = d[anterior][c] + d[c][seguinte] - d[anterior][seguinte]
+        rota.insert(posicao, c)
+        carga[r] += demanda[c]
+        custo[r] += delta
+        atual += delta
+        rota_de[c] = r
+        return r
+
+    def recria_gulosa(pendentes: List[int]) -> None:
+        ordem = rng.randrange(3)
+        if ordem == 0:
+            rng.shuffle(pendentes)
+        elif ordem == 1:
+            pendentes.sort(key=lambda c: -demanda[c])
+        else:
+            pendentes.sort(key=lambda c: -d[dep][c])
+        for c in pendentes:
+            escolha: Tuple[int, Optional[int], int] = (2 * d[dep][c], None, 0)
+            for r in rotas_candidatas(c):
+                delta, posicao = melhor_na_rota(c, r)
+                if delta < escolha[0]:
+                    escolha = (delta, r, posicao)
+            insere(c, escolha[1], escolha[2])
+
+    def recria_regret(pendentes: List[int]) -> None:
+        # cache: cliente -> {rota: (variação, posição)}; só a rota que recebeu um cliente é reavaliada
+        cache = {c: {r: melhor_na_rota(c, r) for r in rotas_candidatas(c)} for c in pendentes}
+        pendentes = set(pendentes)
+        while pendentes:
+            escolha = None
+            for c in pendentes:
+                nova = 2 * d[dep][c]
+                primeiro, segundo, rota_escolhida, posicao = nova, nova, None, 0
+                for r, (delta, p) in cache[c].items():
+                    if delta < primeiro:
+                        primeiro, segundo, rota_escolhida, posicao = delta, primeiro, r, p
+                    elif delta < segundo:
+                        segundo = delta
+                arrependimento = segundo - primeiro
+                if escolha is None or arrependimento > escolha[0] or (arrependimento == escolha[0] and primeiro < escolha[1]):
+                    escolha = (arrependimento, primeiro, c, rota_escolhida, posicao)
+            _, _, c, r, posicao = escolha
+            pendentes.discard(c)
+            r = insere(c, r, posicao)
+            for outro in pendentes:
+                custos = cache[outro]
+                if r in custos or c in vizinhos_de[outro]:
+                    if carga[r] + demanda[outro] <= Q:
+                        custos[r] = melhor_na_rota(outro, r)
+                    else:
+                        custos.pop(r, None)
+
+    recria = recria_regret if insercao == "regret" else recria_gulosa
+
+    iteracao = 0
+    while max_iterations is None or iteracao < max_iterations:
+        agora = time.time()
+        if prazo is not None and agora >= prazo:
+            break
+        iteracao += 1
+        anterior = atual
+        n_rotas = len(R)
+        salvas.clear()
+
+        removidos = rng.choice(sorteaveis)(rng.randint(1, max_removidos))
+        arruina(removidos)
+        recria(removidos)
+
+        if aceitacao == "annealing":
+            progresso = iteracao / max_iterations if max_iterations is not None else 0.0
+            if tempo_limite:
+                progresso = max(progresso, (agora - inicio) / tempo_limite)
+            temperatura = temperatura_inicial * math.exp(razao * progresso)
+            aceita = atual < anterior - temperatura * math.log(1.0 - rng.random())
+        else:
+            aceita = atual <= melhor_custo * (1 + desvio)
+
+        if aceita:
+            if atual < melhor_custo:
+                melhor_custo = atual
+                melhores = [list(r) for r in R if r]
+                if instrumentacao is not None:
+                    instrumentacao.conta("melhorias")
+                if ao_melhorar is not None:
+                    ao_melhorar([[G.nos[c] for c in r] for r in melhores], float(melhor_custo), time.time() - inicio)
+            if instrumentacao is not None:
+                instrumentacao.conta("aceitas")
+        else:
+            # desfaz: volta as listas guardadas e descarta as rotas criadas na iteração; uma rota que
+            # estava vazia pode ter saído de `vazias` na iteração, então volta para lá
+            for r, (rota, carga_r, custo_r) in salvas.items():
+                R[r] = rota
+                carga[r] = carga_r
+                custo[r] = custo_r
+                for c in rota:
+                    rota_de[c] = r
+                if not rota:
+                    vazias.append(r)
+            del R[n_rotas:], carga[n_rotas:], custo[n_rotas:]
+            atual = anterior
+        if len(vazias) > 2 * len(R):
+            vazias = [r for r in set(vazias) if r < len(R) and not R[r]]
+        if instrumentacao is not None:
+            instrumentacao.passo("iteracoes", custo=atual, melhor=melhor_custo)
+
+    if instrumentacao is not None:
+        instrumentacao.cronometra("lns", marca)
+    nos = G.nos
+    return [[nos[c] for c in r] for r in melhores], float(melhor_custo)
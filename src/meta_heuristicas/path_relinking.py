@@ -0,0 +1,163 @@
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union, TYPE_CHECKING
+import random
+import time
+
+from utils.matriz_distancias import MatrizDistancias
+from utils.solucao import Solucao
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+Arestas = FrozenSet[Tuple[int, int]]
+
+
+def arestas_solucao(rotas: List[List[int]], depot: int) -> Arestas:
+    """arestas (menor nó, maior nó) usadas pelas rotas, incluindo as ligações com o depósito"""
+    arestas = set()
+    for rota in rotas:
+        caminho = [depot] + rota + [depot]
+        for a, b in zip(caminho, caminho[1:]):
+            arestas.add((a, b) if a < b else (b, a))
+    return frozenset(arestas)
+
+
+def distancia_solucoes(a: Arestas, b: Arestas) -> int:
+    """quantas arestas de uma solução não aparecem na outra"""
+    return len(a - b)
+
+
+class PoolElite:
+    """
+    até `tamanho` soluções boas e diferentes entre si, usadas como guias do path relinking.
+
+    uma solução entra se for melhor que todas do pool (substituindo a mais parecida com ela) ou
+    se estiver a pelo menos `diversidade_minima` arestas de todas; com o pool cheio, só entra
+    se for melhor que alguma, e substitui a mais parecida entre as piores que ela.
+    """
+
+    def __init__(self, tamanho: int, depot: int, diversidade_minima: int = 1) -> None:
+        self.tamanho = tamanho
+        self.depot = depot
+        self.diversidade_minima = diversidade_minima
+        self.solucoes: List[Tuple[float, List[List[int]], Arestas]] = []
+
+    def __len__(self) -> int:
+        return len(self.solucoes)
+
+    def melhor(self) -> Optional[Tuple[float, List[List[int]]]]:
+        if not self.solucoes:
+            return None
+        custo, rotas, _ = min(self.solucoes, key=lambda s: s[0])
+        return custo, rotas
+
+    def entradas(self) -> List[Tuple[float, List[List[int]]]]:
+        return [(custo, rotas) for custo, rotas, _ in self.solucoes]
+
+    def adiciona(self, rotas: List[List[int]], custo: float) -> bool:
+        """tenta colocar a solução no pool; retorna se ela entrou"""
+        if self.tamanho <= 0:
+            return False
+        arestas = arestas_solucao(rotas, self.depot)
+        distancias = [distancia_solucoes(arestas, s[2]) for s in self.solucoes]
+        if 0 in distancias:
+            return False
+        nova = (custo, [list(r) for r in rotas], arestas)
+
+        if self.solucoes and custo < min(s[0] for s in self.solucoes):
+            if len(self.solucoes) < self.tamanho:
+                self.solucoes.append(nova)
+            else:
+                self.solucoes[distancias.index(min(distancias))] = nova
+            return True
+        if distancias and min(distancias) < self.diversidade_minima:
+            return False
+        if len(self.solucoes) < self.tamanho:
+            self.solucoes.append(nova)
+            return True
+        piores = [i for i, s in enumerate(self.solucoes) if s[0] > custo]
+        if not piores:
+            return False
+        self.solucoes[min(piores, key=lambda i: distancias[i])] = nova
+        return True
+
+    def sorteia(self, rng: Optional[random.Random] = None) -> List[List[int]]:
+        return (rng or random).choice(self.solucoes)[1]
+
+
+def path_relinking(
+    G: Union["nx.Graph", MatrizDistancias],
+    inicial: List[List[int]],
+    guia: List[List[int]],
+    depot: int,
+    demands: Dict[int, int],
+    capacity: int,
+    prazo: Optional[float] = None
+) -> Tuple[List[List[int]], float]:
+    """
+    caminha da solução `inicial` em direção à `guia`: a cada passo cria uma aresta entre
+    clientes que a guia tem e a solução atual não, realocando um dos dois clientes para o lado
+    do outro (o movimento factível de menor custo, avaliado em O(1) pela `Solucao`). cada cliente
+    é movido no máximo uma vez, então o caminho tem no máximo n passos. `prazo` (time.time()) interrompe o caminho.
+
+    retorna:
+        (melhor solução intermediária, custo), ou a própria inicial se nenhum movimento foi possível
+    """
+    solucao = Solucao.de_rotas(G, inicial, depot, demands, capacity)
+    G = solucao.G
+    demanda = solucao.demanda
+    rota_de = solucao.rota_de
+    melhor = solucao
+
+    # arestas entre clientes que a guia tem, indexadas pelos dois extremos
+    alvo_de: Dict[int, List[Tuple[int, int]]] = {}
+    for rota in guia:
+        posicoes = [G.indice[c] for c in rota]
+        for a, b in zip(posicoes, posicoes[1:]):
+            aresta = (a, b) if a < b else (b, a)
+            alvo_de.setdefault(a, []).append(aresta)
+            alvo_de.setdefault(b, []).append(aresta)
+
+    def presente(a: int, b: int) -> bool:
+        return rota_de[a] == rota_de[b] and (solucao.anterior(a) == b or solucao.proximo(a) == b)
+
+    faltam = {e for arestas in alvo_de.values() for e in arestas if not presente(*e)}
+    movidos = set()
+    while faltam:
+        if prazo is not None and time.time() >= prazo:
+            break
+        escolha = None
+        for a, b in faltam:
+            for fixo, movel in ((a, b), (b, a)):
+                if movel in movidos:
+                    continue
+                if rota_de[fixo] != rota_de[movel] and not solucao.cabe(rota_de[fixo], demanda[movel]):
+                    continue
+                fp, fs = solucao.anterior(fixo), solucao.proximo(fixo)
+                antes = solucao.delta_insercao(movel, fp, fixo)
+                depois = solucao.delta_insercao(movel, fixo, fs)
+                delta = solucao.delta_remocao(movel) + min(antes, depois)
+                if escolha is None or delta < escolha[0]:
+                    escolha = (delta, fixo, movel, antes <= depois)
+        if escolha is None:
+            break
+
+        _, fixo, movel, antes = escolha
+        afetados = {movel, fixo, solucao.anterior(movel), solucao.proximo(movel), solucao.anterior(fixo), solucao.proximo(fixo)}
+        i = solucao.indice_de[fixo]
+        if rota_de[movel] == rota_de[fixo] and solucao.indice_de[movel] < i:
+            i -= 1
+        solucao.move(movel, rota_de[fixo], i if antes else i + 1)
+        rota_de = solucao.rota_de
+        movidos.add(movel)
+
+        for x in afetados:
+            for aresta in alvo_de.get(x, ()):
+                if presente(*aresta):
+                    faltam.discard(aresta)
+                else:
+                    faltam.add(aresta)
+        # cópia copy-on-write: só as rotas alteradas depois daqui são copiadas
+        if melhor is solucao or solucao.custo_total < melhor.custo_total:
+            melhor = solucao.copia()
+
+    return melhor.como_rotas(), float(melhor.custo_total)
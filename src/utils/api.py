@@ -0,0 +1,168 @@
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import glob
+import importlib
+import inspect
+import os
+import time
+
+from utils.file_reader import InstanciaCVRP, le_instancia
+from utils.instrumentacao import Instrumentacao
+from utils.validacao import verifica_solucao
+
+DIR_INSTANCIAS: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), "instancias")
+
+# algoritmo -> "módulo:função". o módulo só é importado quando o algoritmo é usado, então um
+# processo que roda só o Clarke & Wright não paga a importação dos exatos e do GRASP
+ALGORITMOS: Dict[str, str] = {
+    "clarke_wright": "heuristicas.clarke_wright:clarke_wright",
+    "grasp": "meta_heuristicas.grasp:grasp_cvrp",
+    "branch_and_bound": "exatos.branch_and_bound:cvrp_branch_and_bound",
+    "geracao_colunas": "exatos.geracao_colunas:cvrp_geracao_colunas",
+    "decomposicao": "heuristicas.decomposicao:cvrp_decomposicao",
+    "lns": "meta_heuristicas.lns:cvrp_lns",
+    "portfolio": "heuristicas.portfolio:cvrp_portfolio",
+}
+# os nomes das funções também são aceitos
+_APELIDOS: Dict[str, str] = {
+    "grasp_cvrp": "grasp",
+    "cvrp_branch_and_bound": "branch_and_bound",
+    "cvrp_geracao_colunas": "geracao_colunas",
+    "cvrp_decomposicao": "decomposicao",
+    "cvrp_lns": "lns",
+    "cvrp_portfolio": "portfolio",
+}
+
+
+def nome_algoritmo(nome: str) -> str:
+    nome = _APELIDOS.get(nome, nome)
+    if nome not in ALGORITMOS:
+        raise ValueError(f"Algoritmo inválido: {nome} (opções: {', '.join(ALGORITMOS)})")
+    return nome
+
+
+def carrega_algoritmo(nome: str) -> Callable[..., Tuple[List[List[int]], float]]:
+    """importa o módulo do algoritmo e devolve a função"""
+    modulo, _, funcao = ALGORITMOS[nome_algoritmo(nome)].partition(":")
+    return getattr(importlib.import_module(modulo), funcao)
+
+
+def listar_instancias(padroes: Sequence[str], diretorio: str = DIR_INSTANCIAS) -> List[str]:
+    """
+    caminhos dos .vrp de `diretorio` que casam com algum dos padrões glob (ex.: "A-n3*", "mini-*")
+    """
+    caminhos = set()
+    for padrao in padroes:
+        if not padrao.endswith(".vrp"):
+            padrao += ".vrp"
+        caminhos.update(glob.glob(os.path.join(diretorio, padrao)))
+    return sorted(caminhos)
+
+
+def resolver_caminhos(padroes: Sequence[str], diretorio: str = DIR_INSTANCIAS) -> List[str]:
+    """
+    aceita caminhos de arquivos, padrões glob relativos à pasta atual ou nomes/padrões de
+    instâncias de `diretorio` (ex.: "A-n32-k5", "mini-*"), nessa ordem de preferência
+    """
+    caminhos: List[str] = []
+    for padrao in padroes:
+        if os.path.isfile(padrao):
+            encontrados = [padrao]
+        else:
+            encontrados = sorted(c for c in glob.glob(padrao) if c.endswith(".vrp")) or listar_instancias([padrao], diretorio)
+        if not encontrados:
+            raise FileNotFoundError(f"Nenhuma instância encontrada para {padrao}")
+        caminhos.extend(c for c in encontrados if c not in caminhos)
+    return caminhos
+
+
+@dataclass
+class ResultadoSolucao:
+    """resultado de `solve`; `como_dicionario` é serializável em JSON"""
+    instancia: str
+    algoritmo: str
+    rotas: List[List[int]]
+    custo: float
+    veiculos: int
+    deposito: int
+    # segundos gastos pelo algoritmo e na leitura da instância (com a matriz de distâncias)
+    tempo: float
+    tempo_leitura: float
+    parametros: Dict[str, Any] = field(default_factory=dict)
+    # preenchidos só com instrumentação: contadores, tempos por fase e resultados finais
+    # (limitante inferior, gap, ótimo provado) dos algoritmos
+    contadores: Dict[str, int] = field(default_factory=dict)
+    tempos_fases: Dict[str, float] = field(default_factory=dict)
+    estatisticas: Dict[str, Any] = field(default_factory=dict)
+
+    def como_dicionario(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def solve(
+    instancia: Union[str, InstanciaCVRP],
+    algoritmo: str = "clarke_wright",
+    instrumentacao: Union[bool, Instrumentacao, None] = None,
+    diretorio_cache: Optional[str] = None,
+    validar: bool = True,
+    **parametros: Any
+) -> ResultadoSolucao:
+    """
+    resolve uma instância com um dos algoritmos de ALGORITMOS, sem nenhuma interação.
+
+    argumentos:
+        instancia: caminho do .vrp, nome de uma instância de src/instancias ou InstanciaCVRP já lida
+        algoritmo: nome do algoritmo (ou da função)
+        instrumentacao: True para coletar contadores e tempos por fase, ou uma Instrumentacao
+            (por exemplo, com callback de progresso)
+        diretorio_cache: pasta do cache binário das instâncias (ver `le_instancia`)
+        validar: confere cobertura, capacidade e custo da solução (ver `verifica_solucao`) e lança
+            ValueError se ela for inválida; custa O(n), desprezível perto dos algoritmos
+        parametros: repassados ao algoritmo (ex.: alpha, max_iterations, seed, tempo_limite)
+    retorna:
+        ResultadoSolucao
+    """
+    funcao = carrega_algoritmo(algoritmo)
+    aceitos = inspect.signature(funcao).parameters
+    invalidos = [p for p in parametros if p not in aceitos]
+    if invalidos:
+        raise ValueError(f"Parâmetros não aceitos por {nome_algoritmo(algoritmo)}: {', '.join(invalidos)}")
+
+    inicio = time.perf_counter()
+    if isinstance(instancia, str):
+        caminho = instancia if os.path.isfile(instancia) else os.path.join(DIR_INSTANCIAS, instancia.removesuffix(".vrp") + ".vrp")
+        instancia = le_instancia(caminho, diretorio_cache)
+    _, demands, capacity, depot = instancia.como_dicionarios()
+    G = instancia.matriz()
+    tempo_leitura = time.perf_counter() - inicio
+
+    if instrumentacao is True:
+        instrumentacao = Instrumentacao()
+    elif instrumentacao is False:
+        instrumentacao = None
+    extras = dict(parametros)
+    if instrumentacao is not None:
+        extras["instrumentacao"] = instrumentacao
+
+    inicio = time.perf_counter()
+    rotas, custo = funcao(G, demands, depot, capacity, **extras)
+    tempo = time.perf_counter() - inicio
+    if validar:
+        verifica_solucao(G, rotas, demands, depot, capacity, custo)
+
+    resultado = ResultadoSolucao(
+        instancia=instancia.nome,
+        algoritmo=nome_algoritmo(algoritmo),
+        rotas=[list(r) for r in rotas],
+        custo=float(custo),
+        veiculos=len(rotas),
+        deposito=depot,
+        tempo=tempo,
+        tempo_leitura=tempo_leitura,
+        parametros=dict(parametros),
+    )
+    if instrumentacao is not None:
+        resultado.contadores = dict(instrumentacao.contadores)
+        resultado.tempos_fases = dict(instrumentacao.tempos)
+        resultado.estatisticas = dict(instrumentacao.resultados)
+    return resultado
@@ -1,18 +1,33 @@
-from typing import Dict, List, Tuple, Iterable
-import itertools
+from typing import Dict, List, Optional, Sequence, Tuple, Iterable, Iterator, Union, TYPE_CHECKING
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
 import math
-import networkx as nx
+import time
+import numpy as np
 
+from utils.matriz_distancias import MatrizDistancias, como_matriz
 
-def calcular_distancia(G: nx.Graph, a: int, b: int) -> float:
+if TYPE_CHECKING:
+    import networkx as nx
+
+# `gerar_rotas` consulta o relógio a cada tantas rotas geradas
+_CONSULTA_PRAZO_A_CADA = 4096
+
+
+def calcular_distancia(G: Union["nx.Graph", MatrizDistancias], a: int, b: int) -> float:
     """retorna a distância (peso da aresta) entre dois nós"""
+    if isinstance(G, MatrizDistancias):
+        return G.distancia(a, b)
     return G[a][b]['weight']
 
 
-def custo_rota(G: nx.Graph, rota: Tuple[int, ...], depot: int) -> float:
+def custo_rota(G: Union["nx.Graph", MatrizDistancias], rota: Tuple[int, ...], depot: int) -> float:
     """
     calcula o custo total de uma rota, incluindo ida e volta ao depósito
     """
+    if isinstance(G, MatrizDistancias):
+        return G.custo_rota(rota, depot)
 
     # caso especial aqui
     if len(rota) == 1:
@@ -27,63 +42,346 @@ def custo_rota(G: nx.Graph, rota: Tuple[int, ...], depot: int) -> float:
 
 
 def gerar_rotas_factiveis(
-    G: nx.Graph, clientes: List[int], demands: Dict[int, int],
+    G: Union["nx.Graph", MatrizDistancias], clientes: List[int], demands: Dict[int, int],
     depot: int, capacity: int
 ) -> List[Tuple[List[int], float]]:
     """
-    gera todas as rotas factíveis, ou seja, conjuntos de clientes cuja soma de demandas é menor ou igual a capacidade do veículo. pra cada rota válida, calcula o custo mínimo de percorrer os clientes em qualquer ordem (permutações)
+    gera todas as rotas factíveis, ou seja, conjuntos de clientes cuja soma de demandas é menor ou igual a capacidade do veículo. pra cada rota válida, calcula o custo mínimo de percorrer os clientes e a ordem que atinge esse custo.
+
+    o custo mínimo vem de uma única programação dinâmica de Held-Karp sobre todos os subconjuntos factíveis:
+    dp[S][k] = menor custo saindo do depósito, visitando todo o conjunto S e terminando em k. como todo subconjunto de
+    uma rota factível também é factível, cada dp[S] é calculado a partir dos dp[S - {k}] já prontos.
+
+    guarda a tabela inteira e todas as rotas com a ordem de visita, então serve para poucos clientes
+    (como em `ordem_otima`); o branch and bound usa `gerar_rotas`, que não materializa nada disso.
     """
+    G = como_matriz(G)
+    d = G.linhas()
+    dep = G.indice[depot]
+    pos = [G.indice[c] for c in clientes]
+    dem = [demands[c] for c in clientes]
+    ida = [d[dep][p] for p in pos]
+    # chegada[k][j] = distância do cliente j até o cliente k, em índices locais
+    chegada = [[d[pj][pk] for pj in pos] for pk in pos]
+
+    # dp[máscara] = {k: custo}; os subconjuntos são gerados por tamanho, estendendo só os factíveis
+    dp: Dict[int, Dict[int, int]] = {}
+    nivel: List[Tuple[int, int, List[int]]] = []
+    for k in range(len(clientes)):
+        if dem[k] <= capacity:
+            dp[1 << k] = {k: ida[k]}
+            nivel.append((1 << k, dem[k], [k]))
+
+    ordem_masks: List[Tuple[int, List[int]]] = [(mask, bits) for mask, _, bits in nivel]
+    while nivel:
+        proximo_nivel: List[Tuple[int, int, List[int]]] = []
+        for mask, carga, bits in nivel:
+            for k in range(bits[-1] + 1, len(clientes)):
+                if carga + dem[k] > capacity:
+                    continue
+                novo = mask | (1 << k)
+                novos_bits = bits + [k]
+                custos: Dict[int, int] = {}
+                for ultimo in novos_bits:
+                    anterior = dp[novo ^ (1 << ultimo)]
+                    coluna = chegada[ultimo]
+                    custos[ultimo] = min(c + coluna[j] for j, c in anterior.items())
+                dp[novo] = custos
+                proximo_nivel.append((novo, carga + dem[k], novos_bits))
+                ordem_masks.append((novo, novos_bits))
+        nivel = proximo_nivel
+
     rotas = []
-    for r in range(1, len(clientes) + 1):
-        for comb in itertools.combinations(clientes, r):
-            if sum(demands[c] for c in comb) <= capacity:
-                melhor = math.inf
-                for perm in itertools.permutations(comb):
-                    custo = custo_rota(G, perm, depot)
-                    if custo < melhor:
-                        melhor = custo
-                rotas.append((list(comb), melhor))
+    for mask, bits in ordem_masks:
+        custos = dp[mask]
+        ultimo = min(bits, key=lambda k: custos[k] + d[pos[k]][dep])
+        melhor = custos[ultimo] + d[pos[ultimo]][dep]
+        rotas.append((_reconstroi_ordem(dp, d, pos, mask, ultimo, clientes), melhor))
     rotas.sort(key=lambda x: x[1] / len(x[0]))  # priorizar custo médio
     return rotas
 
 
-def mapear_clientes_para_rotas(
-    clientes: List[int],
-    rotas: List[Tuple[List[int], float]]
-) -> Dict[int, List[int]]:
+def _reconstroi_ordem(
+    dp: Dict[int, Dict[int, int]], d: List[List[int]], pos: List[int],
+    mask: int, ultimo: int, clientes: List[int]
+) -> List[int]:
+    """
+    refaz, de trás pra frente, a sequência de clientes que atinge dp[mask][ultimo]
+    """
+    sequencia = [clientes[ultimo]]
+    while mask != 1 << ultimo:
+        alvo = dp[mask][ultimo]
+        mask ^= 1 << ultimo
+        for j, c in dp[mask].items():
+            if c + d[pos[j]][pos[ultimo]] == alvo:
+                ultimo = j
+                break
+        sequencia.append(clientes[ultimo])
+    sequencia.reverse()
+    return sequencia
+
+
+def gerar_rotas(
+    G: Union["nx.Graph", MatrizDistancias], clientes: List[int], demands: Dict[int, int],
+    depot: int, capacity: int, prazo: Optional[float] = None
+) -> Iterator[Tuple[int, int]]:
+    """
+    versão em fluxo de `gerar_rotas_factiveis`: gera (máscara, custo mínimo) de cada conjunto factível
+    de clientes, com o bit k representando clientes[k], sem montar a lista de rotas nem a ordem de visita.
+
+    os conjuntos são gerados por tamanho e a programação dinâmica de Held-Karp só guarda dois níveis
+    (o atual e o anterior), então a memória fica limitada pelo maior nível e não pelo total de rotas.
+    os clientes são estendidos em ordem crescente de demanda: o primeiro que não cabe encerra a
+    extensão do conjunto. a ordem de visita das rotas escolhidas sai de `ordem_otima`.
+    com `prazo` (time.monotonic()), levanta TimeoutError se ele passar durante a geração.
+    """
+    G = como_matriz(G)
+    d = G.linhas()
+    dep = G.indice[depot]
+    # índices locais em ordem crescente de demanda, sem os clientes que não cabem sozinhos
+    ordem = sorted((k for k in range(len(clientes)) if demands[clientes[k]] <= capacity), key=lambda k: demands[clientes[k]])
+    m = len(ordem)
+    bit = [1 << k for k in ordem]
+    pos = [G.indice[clientes[k]] for k in ordem]
+    dem = [demands[clientes[k]] for k in ordem]
+    ida = [d[dep][p] for p in pos]
+    volta = [d[p][dep] for p in pos]
+    chegada = [[d[pj][pk] for pj in pos] for pk in pos]
+
+    # nivel[máscara] = (clientes locais em ordem crescente, custos terminando em cada um, carga)
+    nivel: Dict[int, Tuple[Tuple[int, ...], Tuple[int, ...], int]] = {}
+    geradas = 0
+    for i in range(m):
+        nivel[bit[i]] = ((i,), (ida[i],), dem[i])
+        yield bit[i], ida[i] + volta[i]
+
+    while nivel:
+        proximo: Dict[int, Tuple[Tuple[int, ...], Tuple[int, ...], int]] = {}
+        for mask, (membros, _, carga) in nivel.items():
+            for j in range(membros[-1] + 1, m):
+                if carga + dem[j] > capacity:
+                    break
+                novo = mask | bit[j]
+                novos = membros + (j,)
+                custos = []
+                for ultimo in novos:
+                    anteriores, custos_anteriores, _ = nivel[novo ^ bit[ultimo]]
+                    coluna = chegada[ultimo]
+                    custos.append(min(c + coluna[a] for a, c in zip(anteriores, custos_anteriores)))
+                proximo[novo] = (novos, tuple(custos), carga + dem[j])
+                yield novo, min(c + volta[u] for u, c in zip(novos, custos))
+                geradas += 1
+                if prazo is not None and geradas % _CONSULTA_PRAZO_A_CADA == 0 and time.monotonic() >= prazo:
+                    raise TimeoutError("prazo esgotado durante a geração de rotas")
+        nivel = proximo
+
+
+def ordem_otima(G: Union["nx.Graph", MatrizDistancias], rota: List[int], depot: int) -> List[int]:
+    """
+    ordem de menor custo para visitar os clientes de uma rota: Held-Karp só sobre eles, vetorizado
+    pelo NumPy nível a nível (todas as máscaras com o mesmo número de clientes de uma vez), e só a
+    máscara completa é reconstruída. O(2^L·L²) operações e 2^L·L inteiros de memória
+    """
+    G = como_matriz(G)
+    L = len(rota)
+    if L <= 1:
+        return list(rota)
+    dep = G.indice[depot]
+    pos = [G.indice[c] for c in rota]
+    d = G.matriz[np.ix_(pos, pos)].astype(np.int64)
+    ida = G.matriz[dep, pos].astype(np.int64)
+    volta = G.matriz[pos, dep].astype(np.int64)
+
+    # dp[máscara, k] = menor custo saindo do depósito, visitando a máscara e terminando em k
+    infinito = np.iinfo(np.int64).max // 4
+    dp = np.full((1 << L, L), infinito, dtype=np.int64)
+    bit = 1 << np.arange(L)
+    dp[bit, np.arange(L)] = ida
+    mascaras = np.arange(1 << L)
+    tamanhos = np.zeros(1 << L, dtype=np.int64)
+    for k in range(L):
+        tamanhos += (mascaras >> k) & 1
+    for tamanho in range(2, L + 1):
+        nivel = mascaras[tamanhos == tamanho]
+        for k in range(L):
+            com_k = nivel[(nivel >> k) & 1 == 1]
+            dp[com_k, k] = (dp[com_k ^ (1 << k)] + d[:, k]).min(axis=1)
+
+    # reconstrução de trás pra frente só da máscara completa
+    mask = (1 << L) - 1
+    ultimo = int(np.argmin(dp[mask] + volta))
+    ordem = [ultimo]
+    while mask != 1 << ultimo:
+        alvo = dp[mask, ultimo]
+        mask ^= 1 << ultimo
+        ultimo = int(np.flatnonzero(dp[mask] + d[:, ultimo] == alvo)[0])
+        ordem.append(ultimo)
+    ordem.reverse()
+    return [rota[k] for k in ordem]
+
+
+def compacta_rotas(rotas: Iterable[Tuple[int, float]], n_clientes: int) -> Tuple[Sequence[int], "array[float]"]:
     """
-    gera um dicionário que, para cada cliente, lista os índices das rotas que contêm ele
+    guarda as rotas (máscara, custo) em arrays compactos: máscaras em int64 (8 bytes por rota) e custos
+    em float64. com 63 clientes ou mais as máscaras não cabem em int64 e ficam numa lista de int.
     """
-    rotas_por_cliente = {c: [] for c in clientes}
-    for idx, (rota, _) in enumerate(rotas):
-        for c in rota:
-            rotas_por_cliente[c].append(idx)
-    return rotas_por_cliente
+    mascaras: Sequence[int] = array("q") if n_clientes < 63 else []
+    custos = array("d")
+    for mask, custo in rotas:
+        mascaras.append(mask)
+        custos.append(custo)
+    return mascaras, custos
+
+
+def mascaras_numpy(mascaras: Sequence[int]) -> np.ndarray:
+    """as máscaras como array NumPy (int64 sem cópia quando vêm de `compacta_rotas`, senão object)"""
+    if isinstance(mascaras, array):
+        return np.frombuffer(mascaras, dtype=np.int64) if len(mascaras) else np.zeros(0, dtype=np.int64)
+    return np.array(mascaras, dtype=object)
+
+
+def soma_por_rota(mascaras: Sequence[int], pesos: Sequence[float]) -> np.ndarray:
+    """soma dos pesos dos bits de cada máscara, calculada um bit de cada vez sobre todas as rotas"""
+    M = mascaras_numpy(mascaras)
+    soma = np.zeros(len(M))
+    for k, peso in enumerate(pesos):
+        if peso:
+            soma += peso * ((M >> k) & 1).astype(np.float64)
+    return soma
+
+
+def rotas_por_bit(
+    mascaras: Sequence[int], n_clientes: int, chave: np.ndarray, limite: float = math.inf
+) -> List["array[int]"]:
+    """
+    para cada bit k, os índices das rotas que contêm o cliente k em ordem crescente de `chave`,
+    só com as rotas de chave < limite
+    """
+    M = mascaras_numpy(mascaras)
+    ordem = np.argsort(chave, kind="stable")
+    ordem = ordem[chave[ordem] < limite]
+    ordenadas = M[ordem]
+    listas = []
+    for k in range(n_clientes):
+        indices = array("q")
+        indices.frombytes(ordem[((ordenadas >> k) & 1).astype(bool)].astype(np.int64).tobytes())
+        listas.append(indices)
+    return listas
+
+
+def bits(mask: int) -> Iterator[int]:
+    """percorre os índices dos bits ligados de uma máscara"""
+    while mask:
+        menor = mask & -mask
+        yield menor.bit_length() - 1
+        mask ^= menor
+
+
+@dataclass
+class EstatisticasBB:
+    """
+    contadores do branch and bound
+    """
+    nos: int = 0
+    podas_lower_bound: int = 0
+    podas_memo: int = 0
+    memo_acertos: int = 0
+    memo_despejos: int = 0
+    solucoes: int = 0
+    # ao final da busca: melhor limitante inferior provado, gap relativo da solução devolvida
+    # e se a busca terminou (ótimo provado) ou foi interrompida pelo orçamento
+    limite_inferior: float = 0.0
+    gap: float = math.inf
+    otimo: bool = False
+
+    def acumula(self, outra: "EstatisticasBB") -> None:
+        """soma os contadores de outra busca (por exemplo, de um processo da busca paralela)"""
+        self.nos += outra.nos
+        self.podas_lower_bound += outra.podas_lower_bound
+        self.podas_memo += outra.podas_memo
+        self.memo_acertos += outra.memo_acertos
+        self.memo_despejos += outra.memo_despejos
+
+
+# estimativa de bytes por entrada da tabela (chave int + custo float + nó do OrderedDict)
+BYTES_POR_ENTRADA_MEMO = 160
+
+
+class TabelaTransposicao:
+    """
+    memoização limitada: máscara dos clientes restantes -> menor custo acumulado já visto.
+    quando atinge o limite de entradas, descarta a entrada usada há mais tempo (LRU).
+    """
+
+    __slots__ = ("max_entradas", "_tabela", "estatisticas")
+
+    def __init__(self, max_mb: float, estatisticas: Optional[EstatisticasBB] = None) -> None:
+        self.max_entradas = max(1, int(max_mb * 2**20 / BYTES_POR_ENTRADA_MEMO))
+        self._tabela: "OrderedDict[int, float]" = OrderedDict()
+        self.estatisticas = estatisticas if estatisticas is not None else EstatisticasBB()
+
+    def __len__(self) -> int:
+        return len(self._tabela)
+
+    def deve_podar(self, mask: int, custo: float) -> bool:
+        """
+        retorna True se o conjunto já foi visitado com custo menor ou igual;
+        caso contrário registra o custo atual para a máscara
+        """
+        anterior = self._tabela.get(mask)
+        if anterior is not None:
+            self.estatisticas.memo_acertos += 1
+            self._tabela.move_to_end(mask)
+            if custo >= anterior:
+                self.estatisticas.podas_memo += 1
+                return True
+        elif len(self._tabela) >= self.max_entradas:
+            self._tabela.popitem(last=False)
+            self.estatisticas.memo_despejos += 1
+        self._tabela[mask] = custo
+        return False
 
 
-def custo_minimo_por_cliente(
-    clientes: List[int],
-    rotas: List[Tuple[List[int], float]],
-    rotas_por_cliente: Dict[int, List[int]]
-) -> Dict[int, float]:
+@dataclass
+class ContextoBB:
     """
-    Pra cada cliente, calcula o menor custo médio (custo total / num. de clientes) entre todas as rotas que o incluem. Usado para o cálculo do lower bound.
+    dados da instância já convertidos para bits, compartilhados pelo branch and bound e pelos limitantes
     """
-    min_cost = {}
-    for c in clientes:
-        custos_medios = [
-            rotas[i][1] / len(rotas[i][0])
-            for i in rotas_por_cliente[c]
-        ]
-        min_cost[c] = min(custos_medios) if custos_medios else math.inf
-    return min_cost
+    G: MatrizDistancias
+    depot: int
+    capacity: int
+    clientes: List[int]                 # cliente do bit k
+    demanda_bit: List[int]              # demanda do cliente do bit k
+    route_masks: Sequence[int]          # array int64 (ver `compacta_rotas`)
+    route_costs: Sequence[float]        # array float64
+    # índices das rotas que contêm o cliente do bit k, preenchidos depois do limitante
+    rotas_do_bit: List[Sequence[int]]
+    # prazo (time.monotonic()) para os limitantes que resolvem um LP
+    prazo: Optional[float] = None
 
 
-def calcular_lower_bound(
-    clientes_restantes: Iterable[int],
-    min_cost_per_customer: Dict[int, float]
-) -> float:
+def solucao_incumbente(
+    G: MatrizDistancias,
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    solucao_inicial: Optional[List[List[int]]],
+    heuristica_inicial: Optional[str]
+) -> Tuple[List[List[int]], float]:
     """
-    retorna uma cota inferior do custo adicional mínimo necessário para atender os clientes restantes.
+    solução usada como limitante superior inicial dos algoritmos exatos
     """
-    return sum(min_cost_per_customer[c] for c in clientes_restantes)
+    if solucao_inicial is None:
+        if heuristica_inicial is None:
+            return [], math.inf
+        if heuristica_inicial == "clarke_wright":
+            from heuristicas.clarke_wright import clarke_wright
+            solucao_inicial, _ = clarke_wright(G, demands, depot, capacity)
+        elif heuristica_inicial == "grasp":
+            from meta_heuristicas.grasp import grasp_cvrp
+            solucao_inicial, _ = grasp_cvrp(G, demands, depot, capacity, alpha=0.3, max_iterations=20)
+        else:
+            raise ValueError(f"Heurística inicial inválida: {heuristica_inicial}")
+    rotas = [list(r) for r in solucao_inicial if r]
+    # recalcula o custo na mesma matriz usada pela busca
+    return rotas, float(sum(G.custo_rota(r, depot) for r in rotas))
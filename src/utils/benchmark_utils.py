@@ -0,0 +1,240 @@
+import argparse
+import ast
+import csv
+import json
+import os
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from utils.file_reader import le_instancia
+from utils.matriz_distancias import MatrizDistancias
+from utils.api import ALGORITMOS, DIR_INSTANCIAS, carrega_algoritmo, listar_instancias, nome_algoritmo
+from utils.validacao import custo_referencia, valida_solucao
+
+
+@dataclass
+class ResultadoBenchmark:
+    """uma linha do relatório: um algoritmo rodado `repeticoes` vezes em uma instância"""
+    instancia: str
+    algoritmo: str
+    custo: float = float("nan")
+    otimo: Optional[float] = None
+    gap_percentual: Optional[float] = None
+    veiculos: int = 0
+    repeticoes: int = 0
+    tempo_mediana: float = float("nan")
+    tempo_p95: float = float("nan")
+    tempo_min: float = float("nan")
+    memoria_pico_mb: Optional[float] = None
+    erro: str = ""
+
+
+def custo_otimo(caminho_instancia: str) -> Optional[float]:
+    """custo do .sol com o mesmo nome da instância, ou None se não houver"""
+    return custo_referencia(caminho_instancia)
+
+
+def medir(
+    funcao: Callable[[], Tuple[List[List[int]], float]],
+    repeticoes: int,
+    medir_memoria: bool = True
+) -> Tuple[List[List[int]], float, List[float], Optional[float]]:
+    """
+    roda `funcao` `repeticoes` vezes medindo o tempo com perf_counter.
+    o pico de memória é medido numa execução extra com tracemalloc, pra não distorcer os tempos.
+    retorna:
+        (rotas, custo, tempos, pico de memória em MB)
+    """
+    tempos: List[float] = []
+    rotas: List[List[int]] = []
+    custo = float("nan")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        rotas, custo = funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    pico: Optional[float] = None
+    if medir_memoria:
+        tracemalloc.start()
+        try:
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+    return rotas, custo, tempos, pico
+
+
+def executar_instancia(
+    caminho: str,
+    algoritmos: Sequence[str],
+    repeticoes: int = 3,
+    parametros: Optional[Dict[str, Dict[str, Any]]] = None,
+    medir_memoria: bool = True,
+    diretorio_cache: Optional[str] = None
+) -> List[ResultadoBenchmark]:
+    """
+    roda cada algoritmo numa instância; a leitura e a matriz de distâncias ficam fora da medição
+    """
+    parametros = parametros or {}
+    instancia = le_instancia(caminho, diretorio_cache)
+    _, demands, capacity, depot = instancia.como_dicionarios()
+    G: MatrizDistancias = instancia.matriz()
+    otimo = custo_otimo(caminho)
+    nome_instancia = os.path.splitext(os.path.basename(caminho))[0]
+
+    resultados: List[ResultadoBenchmark] = []
+    for nome in algoritmos:
+        algoritmo = carrega_algoritmo(nome)
+        extras = parametros.get(nome, {})
+        resultado = ResultadoBenchmark(instancia=nome_instancia, algoritmo=nome, otimo=otimo)
+        try:
+            rotas, custo, tempos, pico = medir(
+                lambda: algoritmo(G, demands, depot, capacity, **extras), repeticoes, medir_memoria
+            )
+        except Exception as erro:
+            # uma instância inviável para um algoritmo não interrompe o lote
+            resultado.erro = f"{type(erro).__name__}: {erro}"
+            resultados.append(resultado)
+            continue
+        # uma otimização que quebre a correção aparece no relatório em vez de um custo bom demais
+        validacao = valida_solucao(G, rotas, demands, depot, capacity, custo)
+        if not validacao.valida:
+            resultado.erro = "solução inválida: " + "; ".join(validacao.erros)
+            resultados.append(resultado)
+            continue
+
+        resultado.custo = float(custo)
+        resultado.veiculos = len(rotas)
+        resultado.repeticoes = repeticoes
+        resultado.tempo_mediana = float(np.median(tempos))
+        resultado.tempo_p95 = float(np.percentile(tempos, 95))
+        resultado.tempo_min = min(tempos)
+        resultado.memoria_pico_mb = pico
+        if otimo:
+            resultado.gap_percentual = 100.0 * (resultado.custo - otimo) / otimo
+        resultados.append(resultado)
+    return resultados
+
+
+def executar_benchmark(
+    padroes: Sequence[str],
+    algoritmos: Sequence[str],
+    repeticoes: int = 3,
+    parametros: Optional[Dict[str, Dict[str, Any]]] = None,
+    n_processos: int = 1,
+    medir_memoria: bool = True,
+    diretorio: str = DIR_INSTANCIAS,
+    diretorio_cache: Optional[str] = None
+) -> List[ResultadoBenchmark]:
+    """
+    roda os algoritmos em todas as instâncias que casam com `padroes`.
+
+    com `n_processos` > 1 as instâncias são distribuídas entre processos (os algoritmos de uma
+    mesma instância rodam sempre no mesmo processo); os tempos ficam sujeitos à disputa por CPU,
+    então para comparar desempenho o ideal é n_processos <= número de núcleos livres.
+    com `diretorio_cache` as instâncias são lidas do cache binário (ver `le_instancia`).
+    """
+    algoritmos = [nome_algoritmo(a) for a in algoritmos]
+    parametros = {nome_algoritmo(a): p for a, p in (parametros or {}).items()}
+    caminhos = listar_instancias(padroes, diretorio)
+    if not caminhos:
+        raise FileNotFoundError(f"Nenhuma instância encontrada em {diretorio} para {list(padroes)}")
+
+    resultados: List[ResultadoBenchmark] = []
+    if n_processos > 1 and len(caminhos) > 1:
+        with ProcessPoolExecutor(max_workers=n_processos) as pool:
+            futuros = [
+                pool.submit(executar_instancia, c, algoritmos, repeticoes, parametros, medir_memoria, diretorio_cache)
+                for c in caminhos
+            ]
+            for futuro in futuros:
+                resultados.extend(futuro.result())
+    else:
+        for caminho in caminhos:
+            resultados.extend(executar_instancia(caminho, algoritmos, repeticoes, parametros, medir_memoria, diretorio_cache))
+    return resultados
+
+
+def salvar_resultados(resultados: Sequence[ResultadoBenchmark], caminho: str) -> None:
+    """salva em JSON se a extensão for .json, senão em CSV"""
+    linhas = [asdict(r) for r in resultados]
+    if caminho.endswith(".json"):
+        with open(caminho, "w") as f:
+            json.dump(linhas, f, indent=2, ensure_ascii=False)
+        return
+    with open(caminho, "w", newline="") as f:
+        escritor = csv.DictWriter(f, fieldnames=[campo.name for campo in fields(ResultadoBenchmark)])
+        escritor.writeheader()
+        escritor.writerows(linhas)
+
+
+def imprimir_tabela(resultados: Sequence[ResultadoBenchmark]) -> None:
+    """
+    exibe um resumo dos resultados no terminal
+    """
+    print(f"\n{'Instância':<14}{'Algoritmo':<18}{'Custo':>10}{'Ótimo':>10}{'Gap %':>9}"
+          f"{'Mediana (s)':>13}{'p95 (s)':>11}{'Memória (MB)':>14}")
+    for r in resultados:
+        if r.erro:
+            print(f"{r.instancia:<14}{r.algoritmo:<18}  erro: {r.erro}")
+            continue
+        otimo = f"{r.otimo:.0f}" if r.otimo is not None else "-"
+        gap = f"{r.gap_percentual:.2f}" if r.gap_percentual is not None else "-"
+        memoria = f"{r.memoria_pico_mb:.2f}" if r.memoria_pico_mb is not None else "-"
+        print(f"{r.instancia:<14}{r.algoritmo:<18}{r.custo:>10.2f}{otimo:>10}{gap:>9}"
+              f"{r.tempo_mediana:>13.4f}{r.tempo_p95:>11.4f}{memoria:>14}")
+
+
+def _le_parametros(itens: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """converte ["grasp.max_iterations=50", ...] em {"grasp": {"max_iterations": 50}}"""
+    parametros: Dict[str, Dict[str, Any]] = {}
+    for item in itens:
+        chave, _, valor = item.partition("=")
+        algoritmo, _, nome = chave.partition(".")
+        if not nome or not valor:
+            raise ValueError(f"Parâmetro inválido: {item} (use algoritmo.nome=valor)")
+        try:
+            convertido = ast.literal_eval(valor)
+        except (ValueError, SyntaxError):
+            convertido = valor
+        parametros.setdefault(algoritmo, {})[nome] = convertido
+    return parametros
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """
+    executa o benchmark pela linha de comando, por exemplo:
+        python src/benchmark.py "A-n3*" -a clarke_wright grasp -r 5 -p grasp.max_iterations=50 -o resultados.csv
+    """
+    parser = argparse.ArgumentParser(description="Benchmark dos algoritmos do CVRP nas instâncias de src/instancias")
+    parser.add_argument("instancias", nargs="*", default=["*"], help="padrões glob dos nomes das instâncias")
+    parser.add_argument("-a", "--algoritmos", nargs="+", default=["clarke_wright", "grasp"],
+                        help=f"algoritmos a rodar ({', '.join(ALGORITMOS)})")
+    parser.add_argument("-r", "--repeticoes", type=int, default=3, help="execuções medidas por algoritmo")
+    parser.add_argument("-p", "--parametro", action="append", default=[],
+                        help="parâmetro extra de um algoritmo, no formato algoritmo.nome=valor")
+    parser.add_argument("-j", "--processos", type=int, default=1, help="instâncias rodando em paralelo")
+    parser.add_argument("-o", "--saida", help="arquivo .csv ou .json com os resultados")
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--diretorio", default=DIR_INSTANCIAS, help="pasta das instâncias")
+    parser.add_argument("--cache", help="pasta do cache binário das instâncias")
+    args = parser.parse_args(argv)
+
+    resultados = executar_benchmark(
+        args.instancias,
+        args.algoritmos,
+        repeticoes=args.repeticoes,
+        parametros=_le_parametros(args.parametro),
+        n_processos=args.processos,
+        medir_memoria=not args.sem_memoria,
+        diretorio=args.diretorio,
+        diretorio_cache=args.cache,
+    )
+    imprimir_tabela(resultados)
+    if args.saida:
+        salvar_resultados(resultados, args.saida)
+        print(f"\nResultados salvos em {args.saida}")
@@ -1,4 +1,98 @@
-from typing import Dict, Tuple, Optional
+from dataclasses import dataclass
+from typing import Dict, List, Tuple, Optional
+import hashlib
+import json
+import os
+import numpy as np
+
+from utils.matriz_distancias import MatrizDistancias, matriz_euclidiana
+
+# versão do formato do cache em disco; mudar quando os arquivos salvos mudarem
+_VERSAO_CACHE = 1
+_ARRAYS_CACHE = ("nos", "coords", "demandas", "tempos_servico", "distancias")
+
+
+@dataclass
+class InstanciaCVRP:
+    """
+    instância lida do arquivo TSPLIB/CVRPLIB, com as seções em arrays NumPy.
+
+    `nos[k]` é o identificador do nó da posição k de `coords`, `demandas`, `tempos_servico`
+    e das linhas/colunas de `distancias`. `coords` é None nas instâncias só com pesos explícitos
+    e `distancias` é None até ser calculada (ou lida do cache).
+    """
+    nome: str
+    nos: np.ndarray
+    coords: Optional[np.ndarray]
+    demandas: np.ndarray
+    capacidade: int
+    depositos: List[int]
+    tipo_peso: str = "EUC_2D"
+    tempos_servico: Optional[np.ndarray] = None
+    distancia_maxima: Optional[float] = None
+    distancias: Optional[np.ndarray] = None
+
+    @property
+    def depot(self) -> int:
+        """primeiro depósito, o único usado pelos algoritmos do projeto"""
+        return self.depositos[0]
+
+    def matriz(self) -> MatrizDistancias:
+        """
+        matriz de distâncias da instância, calculada uma única vez. os depósitos além do primeiro
+        ficam de fora, já que os algoritmos tratariam como cliente todo nó da matriz
+        """
+        if self.distancias is None:
+            self.distancias = _calcula_distancias(self)
+        euclidiana = self.tipo_peso in ("EUC_2D", "CEIL_2D")
+        G = MatrizDistancias(self.nos.tolist(), self.distancias, self.coords, euclidiana)
+        extras = set(self.depositos[1:])
+        if extras:
+            G = G.submatriz([no for no in G.nos if no not in extras])
+        return G
+
+    def como_dicionarios(self) -> Tuple[Dict[int, Tuple[float, float]], Dict[int, int], int, int]:
+        """mesmo retorno de `le_arquivo`: (coords, demands, capacity, depot), sem os depósitos extras"""
+        extras = set(self.depositos[1:])
+        nos = self.nos.tolist()
+        coords: Dict[int, Tuple[float, float]] = {}
+        if self.coords is not None:
+            coords = {no: (x, y) for no, (x, y) in zip(nos, self.coords.tolist()) if no not in extras}
+        demands = {no: dem for no, dem in zip(nos, self.demandas.tolist()) if no not in extras}
+        return coords, demands, self.capacidade, self.depot
+
+
+def le_instancia(caminho_arquivo: str, diretorio_cache: Optional[str] = None) -> InstanciaCVRP:
+    """
+    lê uma instância CVRP no formato TSPLIB/CVRPLIB.
+
+    aceita EDGE_WEIGHT_TYPE EUC_2D, CEIL_2D e EXPLICIT (EDGE_WEIGHT_FORMAT FULL_MATRIX, LOWER_ROW,
+    LOWER_DIAG_ROW, UPPER_ROW ou UPPER_DIAG_ROW), vários depósitos, SERVICE_TIME (no cabeçalho
+    ou em SERVICE_TIME_SECTION) e DISTANCE. as linhas de cada seção são juntadas e convertidas
+    de uma vez para NumPy.
+
+    com `diretorio_cache`, a instância e a matriz de distâncias já calculada são salvas em
+    arquivos .npy numa pasta com o hash do conteúdo do arquivo; nas próximas leituras os
+    arrays são abertos com memory map, sem reprocessar o texto nem recalcular as distâncias.
+
+    argumentos:
+        caminho_arquivo (str): caminho para o arquivo da instância.
+        diretorio_cache (str): pasta do cache binário (opcional).
+    retorna:
+        InstanciaCVRP
+    """
+    if diretorio_cache is None:
+        return _le_texto(caminho_arquivo)
+
+    pasta = os.path.join(diretorio_cache, _hash_arquivo(caminho_arquivo))
+    if os.path.exists(os.path.join(pasta, "meta.json")):
+        return _carrega_cache(pasta)
+
+    instancia = _le_texto(caminho_arquivo)
+    instancia.distancias = _calcula_distancias(instancia)
+    _salva_cache(instancia, pasta)
+    return instancia
+
 
 def le_arquivo(caminho_arquivo: str) -> Tuple[Dict[int, Tuple[float, float]], Dict[int, int], int, int]:
     """
@@ -6,49 +100,226 @@ def le_arquivo(caminho_arquivo: str) -> Tuple[Dict[int, Tuple[float, float]], Di
     - coords: dicionário {nó: (x, y)}
     - demands: dicionário {nó: demanda}
     - capacity: capacidade máxima do veículo
-    - depot: identificador do depósito
-    
+    - depot: identificador do depósito (o primeiro, se houver mais de um; os demais são descartados)
+
     argumentos:
         caminho_arquivo (str): caminho para o arquivo da instância.
     retorna:
         Tuple[Dict[int, Tuple[float, float]], Dict[int, int], int, int]
     """
-    coords: Dict[int, Tuple[float, float]] = {}
-    demands: Dict[int, int] = {}
-    capacity: Optional[int] = None
-    depot: Optional[int] = None
+    return _le_texto(caminho_arquivo).como_dicionarios()
 
-    modo: Optional[str] = None
+
+def _le_texto(caminho_arquivo: str) -> InstanciaCVRP:
+    cabecalho: Dict[str, str] = {}
+    secoes: Dict[str, List[str]] = {}
+    linhas_secao: Optional[List[str]] = None
 
     with open(caminho_arquivo, "r") as f:
         for linha in f:
-            linha = linha.strip()
-            if not linha or linha == "EOF":
-                continue
-
-            if linha.startswith("CAPACITY"):
-                capacity = int(linha.split(":")[1]) if ":" in linha else int(linha.split()[1])
+            inicio = linha.lstrip()[:1]
+            if not inicio:
                 continue
-            if linha.startswith("NODE_COORD_SECTION"):
-                modo = "coords"; continue
-            if linha.startswith("DEMAND_SECTION"):
-                modo = "demand"; continue
-            if linha.startswith("DEPOT_SECTION"):
-                modo = "depot"; continue
-            if any(linha.startswith(key) for key in ["NAME", "COMMENT", "TYPE", "DIMENSION", "EDGE_WEIGHT_TYPE"]):
+            if not inicio.isalpha():
+                # linha de dados: guarda como texto e converte a seção inteira no final
+                if linhas_secao is not None:
+                    linhas_secao.append(linha)
                 continue
 
-            partes = linha.split()
-            if modo == "coords" and len(partes) >= 3:
-                idx, x, y = int(partes[0]), float(partes[1]), float(partes[2])
-                coords[idx] = (x, y)
-            elif modo == "demand" and len(partes) >= 2:
-                idx, demand = int(partes[0]), int(partes[1])
-                demands[idx] = demand
-            elif modo == "depot" and partes[0] != "-1":
-                depot = int(partes[0])
-
-    if capacity is None or depot is None:
+            # "CHAVE : valor" ou, em arquivos mais antigos, "CHAVE valor"
+            if ":" in linha:
+                chave, _, valor = linha.partition(":")
+            else:
+                chave, valor = (linha.split(None, 1) + [""])[:2]
+            chave = chave.strip()
+            if chave == "EOF":
+                break
+            if chave.endswith("_SECTION"):
+                linhas_secao = secoes.setdefault(chave, [])
+            else:
+                cabecalho[chave] = valor.strip()
+                linhas_secao = None
+
+    if "CAPACITY" not in cabecalho or "DEPOT_SECTION" not in secoes:
+        raise ValueError("Arquivo de instância inválido: falta CAPACITY ou DEPOT_SECTION")
+
+    numeros = {secao: _numeros(linhas) for secao, linhas in secoes.items()}
+
+    coords: Optional[np.ndarray] = None
+    secao_coords = "NODE_COORD_SECTION" if "NODE_COORD_SECTION" in numeros else "DISPLAY_DATA_SECTION"
+    if secao_coords in numeros:
+        tabela = numeros[secao_coords].reshape(-1, 3)
+        nos = tabela[:, 0].astype(np.int64)
+        coords = np.ascontiguousarray(tabela[:, 1:3])
+    else:
+        nos = np.arange(1, int(cabecalho["DIMENSION"]) + 1, dtype=np.int64)
+    posicao = _posicoes(nos)
+
+    demandas = np.zeros(len(nos), dtype=np.int64)
+    if "DEMAND_SECTION" in numeros:
+        tabela = numeros["DEMAND_SECTION"].reshape(-1, 2).astype(np.int64)
+        demandas[posicao(tabela[:, 0])] = tabela[:, 1]
+
+    tempos_servico: Optional[np.ndarray] = None
+    if "SERVICE_TIME_SECTION" in numeros:
+        tabela = numeros["SERVICE_TIME_SECTION"].reshape(-1, 2)
+        tempos_servico = np.zeros(len(nos), dtype=np.float64)
+        tempos_servico[posicao(tabela[:, 0].astype(np.int64))] = tabela[:, 1]
+    elif "SERVICE_TIME" in cabecalho:
+        # mesmo tempo de serviço para todos os clientes
+        tempos_servico = np.full(len(nos), float(cabecalho["SERVICE_TIME"]))
+
+    depositos = [int(d) for d in numeros["DEPOT_SECTION"] if d != -1]
+    if not depositos:
         raise ValueError("Arquivo de instância inválido: falta CAPACITY ou DEPOT_SECTION")
+    if tempos_servico is not None:
+        tempos_servico[posicao(np.array(depositos, dtype=np.int64))] = 0.0
+
+    tipo_peso = cabecalho.get("EDGE_WEIGHT_TYPE", "EUC_2D").upper()
+    distancias: Optional[np.ndarray] = None
+    if tipo_peso == "EXPLICIT":
+        formato = cabecalho.get("EDGE_WEIGHT_FORMAT", "FULL_MATRIX").upper()
+        distancias = _pesos_explicitos(numeros.get("EDGE_WEIGHT_SECTION", np.empty(0)), len(nos), formato)
+    elif tipo_peso not in ("EUC_2D", "CEIL_2D"):
+        raise ValueError(f"EDGE_WEIGHT_TYPE não suportado: {tipo_peso}")
+    elif coords is None:
+        raise ValueError("Arquivo de instância inválido: falta NODE_COORD_SECTION")
+
+    distancia_maxima = float(cabecalho["DISTANCE"]) if "DISTANCE" in cabecalho else None
+
+    return InstanciaCVRP(
+        nome=cabecalho.get("NAME", os.path.splitext(os.path.basename(caminho_arquivo))[0]),
+        nos=nos,
+        coords=coords,
+        demandas=demandas,
+        capacidade=int(float(cabecalho["CAPACITY"])),
+        depositos=depositos,
+        tipo_peso=tipo_peso,
+        tempos_servico=tempos_servico,
+        distancia_maxima=distancia_maxima,
+        distancias=distancias,
+    )
+
+
+def _numeros(linhas: List[str]) -> np.ndarray:
+    """converte as linhas de uma seção em um único vetor de números"""
+    return np.array("".join(linhas).split(), dtype=np.float64)
+
+
+def _posicoes(nos: np.ndarray):
+    """função que leva identificadores de nós às suas posições nos arrays"""
+    if len(nos) and np.array_equal(nos, np.arange(nos[0], nos[0] + len(nos))):
+        primeiro = int(nos[0])
+        return lambda ids: ids - primeiro
+    ordem = np.argsort(nos)
+    return lambda ids: ordem[np.searchsorted(nos, ids, sorter=ordem)]
+
+
+def _pesos_explicitos(valores: np.ndarray, n: int, formato: str) -> np.ndarray:
+    """monta a matriz simétrica a partir da EDGE_WEIGHT_SECTION"""
+    matriz = np.zeros((n, n), dtype=np.int32)
+    valores = np.rint(valores).astype(np.int32)
+    if formato == "FULL_MATRIX":
+        return valores[:n * n].reshape(n, n).copy()
+    indices = {
+        "LOWER_ROW": lambda: np.tril_indices(n, -1),
+        "LOWER_DIAG_ROW": lambda: np.tril_indices(n),
+        "UPPER_ROW": lambda: np.triu_indices(n, 1),
+        "UPPER_DIAG_ROW": lambda: np.triu_indices(n),
+    }
+    if formato not in indices:
+        raise ValueError(f"EDGE_WEIGHT_FORMAT não suportado: {formato}")
+    linhas, colunas = indices[formato]()
+    if valores.size < linhas.size:
+        raise ValueError("Arquivo de instância inválido: EDGE_WEIGHT_SECTION incompleta")
+    matriz[linhas, colunas] = valores[:linhas.size]
+    matriz[colunas, linhas] = valores[:linhas.size]
+    return matriz
+
+
+def _calcula_distancias(instancia: InstanciaCVRP) -> np.ndarray:
+    if instancia.distancias is not None:
+        return instancia.distancias
+    return matriz_euclidiana(instancia.coords, teto=instancia.tipo_peso == "CEIL_2D")
+
+
+def _hash_arquivo(caminho_arquivo: str) -> str:
+    h = hashlib.sha256()
+    with open(caminho_arquivo, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def _salva_cache(instancia: InstanciaCVRP, pasta: str) -> None:
+    # grava numa pasta temporária e renomeia no final, para outro processo nunca ver o cache pela metade
+    temporaria = f"{pasta}.{os.getpid()}.tmp"
+    os.makedirs(temporaria, exist_ok=True)
+    for nome in _ARRAYS_CACHE:
+        array = getattr(instancia, nome)
+        if array is not None:
+            np.save(os.path.join(temporaria, f"{nome}.npy"), array)
+    meta = {
+        "versao": _VERSAO_CACHE,
+        "nome": instancia.nome,
+        "capacidade": instancia.capacidade,
+        "depositos": instancia.depositos,
+        "tipo_peso": instancia.tipo_peso,
+        "distancia_maxima": instancia.distancia_maxima,
+    }
+    with open(os.path.join(temporaria, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    try:
+        os.replace(temporaria, pasta)
+    except OSError:
+        # outro processo já gravou o mesmo cache
+        for nome in os.listdir(temporaria):
+            os.remove(os.path.join(temporaria, nome))
+        os.rmdir(temporaria)
+
+
+def _carrega_cache(pasta: str) -> InstanciaCVRP:
+    with open(os.path.join(pasta, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("versao") != _VERSAO_CACHE:
+        raise ValueError(f"Cache de instância em versão antiga: {pasta}")
+    arrays = {}
+    for nome in _ARRAYS_CACHE:
+        caminho = os.path.join(pasta, f"{nome}.npy")
+        arrays[nome] = np.load(caminho, mmap_mode="r") if os.path.exists(caminho) else None
+    return InstanciaCVRP(
+        nome=meta["nome"],
+        capacidade=meta["capacidade"],
+        depositos=meta["depositos"],
+        tipo_peso=meta["tipo_peso"],
+        distancia_maxima=meta["distancia_maxima"],
+        **arrays,
+    )
+
+
+def le_solucao(caminho_arquivo: str) -> Tuple[List[List[int]], float]:
+    """
+    lê um arquivo .sol no formato do CVRPLIB ("Route #1: 21 31 19 ..." e "Cost 784") e retorna:
+    - rotas: lista de rotas com os clientes como aparecem no arquivo
+    - custo: custo ótimo (ou melhor conhecido) informado
+
+    argumentos:
+        caminho_arquivo (str): caminho para o arquivo da solução.
+    retorna:
+        Tuple[List[List[int]], float]
+    """
+    rotas: List[List[int]] = []
+    custo: Optional[float] = None
+
+    with open(caminho_arquivo, "r") as f:
+        for linha in f:
+            linha = linha.strip()
+            if linha.startswith("Route"):
+                rotas.append([int(c) for c in linha.split(":", 1)[1].split()])
+            elif linha.lower().startswith("cost"):
+                custo = float(linha.split()[1])
+
+    if custo is None:
+        raise ValueError("Arquivo de solução inválido: falta a linha Cost")
 
-    return coords, demands, capacity, depot
+    return rotas, custo
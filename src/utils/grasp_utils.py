@@ -1,10 +1,15 @@
+import math
 import random
-from typing import List, Dict
-import networkx as nx
+from typing import List, Dict, Optional, Sequence, Union, TYPE_CHECKING
+import numpy as np
 from .bb_utils import custo_rota
+from .matriz_distancias import MatrizDistancias
 
+if TYPE_CHECKING:
+    import networkx as nx
 
-def custo_total(G: nx.Graph, rotas: List[List[int]], depot: int) -> float:
+
+def custo_total(G: Union["nx.Graph", MatrizDistancias], rotas: List[List[int]], depot: int) -> float:
     """ 
     retorna o custo total do conjunto de rotas 
     """
@@ -21,28 +26,121 @@ def numero_veiculos_estimado(demands: Dict[int, int], capacity: int) -> int:
         n += 1
     return max(1, n)
 
-def criar_LRC(alpha: float, G: nx.Graph, current_node: int, candidatos: List[int]) -> List[int]:
+def criar_LRC(alpha: float, G: Union["nx.Graph", MatrizDistancias], current_node: int, candidatos: List[int]) -> List[int]:
     """
     constrói a Lista Restrita de Candidatos (LRC)
     """
     if not candidatos:
         return []
-    distancias = []
-    for c in candidatos:
-        distancias.append((c, G[current_node][c]['weight']))
-    distancias.sort(key=lambda x: x[1])
+    if isinstance(G, MatrizDistancias):
+        # linha da matriz do nó atual, evita o acesso dicionário-de-dicionário do grafo
+        indice = G.indice
+        linha = G.linhas()[indice[current_node]]
+        distancias = [(c, linha[indice[c]]) for c in candidatos]
+    else:
+        distancias = [(c, G[current_node][c]['weight']) for c in candidatos]
+    # só o mínimo e o máximo definem o limite, não é preciso ordenar
     dists = [d for (_, d) in distancias]
-    dmin = dists[0]
-    dmax = dists[-1]
+    dmin = min(dists)
+    dmax = max(dists)
     limite = dmin + alpha * (dmax - dmin)
-    lrc = [c for (c, d) in distancias if d <= limite]
-    if not lrc:
-        lrc = [distancias[0][0]]
-    return lrc
+    return [c for (c, d) in distancias if d <= limite]
+
+
+def criar_LRC_vetorizada(alpha: float, distancias: np.ndarray, candidatos: np.ndarray) -> np.ndarray:
+    """
+    mesma regra de `criar_LRC` sobre arrays: `distancias[i]` é a distância do nó atual até `candidatos[i]`
+    """
+    dmin = distancias.min()
+    limite = dmin + alpha * (distancias.max() - dmin)
+    return candidatos[distancias <= limite]
+
+
+class CandidatosGRASP:
+    """
+    clientes ainda não visitados (em posições da matriz) ordenados por demanda, para a construção
+    incremental do GRASP: os que cabem na capacidade restante estão num prefixo achado por busca
+    binária, e retirar um cliente só desmarca a sua posição (O(1)). a ordem é refeita sem os
+    visitados quando eles passam da metade.
+    """
+
+    __slots__ = ("ordem", "demandas", "nao_visitado", "demanda", "restantes")
+
+    def __init__(self, G: MatrizDistancias, demands: Dict[int, int], depot: int) -> None:
+        dep = G.indice[depot]
+        self.demanda = np.array([demands.get(no, 0) for no in G.nos], dtype=np.int64)
+        self.nao_visitado = np.arange(len(G)) != dep
+        clientes = np.flatnonzero(self.nao_visitado)
+        self.ordem = clientes[np.argsort(self.demanda[clientes], kind="stable")]
+        self.demandas = self.demanda[self.ordem]
+        self.restantes = int(self.ordem.size)
+
+    def __len__(self) -> int:
+        return self.restantes
+
+    def que_cabem(self, capacidade_restante: int) -> np.ndarray:
+        """posições dos clientes não visitados com demanda <= capacidade_restante"""
+        fim = int(np.searchsorted(self.demandas, capacidade_restante, side="right"))
+        prefixo = self.ordem[:fim]
+        return prefixo[self.nao_visitado[prefixo]]
+
+    def disponiveis(self, posicoes: np.ndarray, capacidade_restante: int) -> np.ndarray:
+        """filtra `posicoes` (ex.: vizinhos do nó atual) deixando os não visitados que cabem"""
+        return posicoes[self.nao_visitado[posicoes] & (self.demanda[posicoes] <= capacidade_restante)]
 
+    def remove(self, posicao: int) -> None:
+        self.nao_visitado[posicao] = False
+        self.restantes -= 1
+        if self.restantes * 2 < self.ordem.size:
+            self.ordem = self.ordem[self.nao_visitado[self.ordem]]
+            self.demandas = self.demanda[self.ordem]
 
-def escolher_da_LRC_random(lrc: List[int]) -> int:
-    return random.choice(lrc)
+
+class AlphaReativo:
+    """
+    GRASP reativo: o alpha de cada iteração é sorteado entre `alphas` com probabilidade
+    proporcional a (melhor custo / custo médio obtido com aquele alpha) ** delta, então os
+    valores que geram soluções melhores passam a ser mais sorteados. alphas ainda não usados
+    recebem a maior qualidade, para que todos sejam testados.
+    """
+
+    def __init__(self, alphas: Sequence[float], delta: float = 10.0) -> None:
+        if not alphas:
+            raise ValueError("Lista de alphas vazia")
+        self.alphas = list(alphas)
+        self.delta = delta
+        self.soma = [0.0] * len(self.alphas)
+        self.contagem = [0] * len(self.alphas)
+        self.melhor = math.inf
+        self.probabilidades = [1.0 / len(self.alphas)] * len(self.alphas)
+
+    def registra(self, indice: int, custo: float) -> None:
+        self.soma[indice] += custo
+        self.contagem[indice] += 1
+        self.melhor = min(self.melhor, custo)
+        qualidade = [
+            (self.melhor / (self.soma[i] / self.contagem[i])) ** self.delta if self.contagem[i] and self.soma[i] else None
+            for i in range(len(self.alphas))
+        ]
+        maior = max((q for q in qualidade if q is not None), default=1.0)
+        qualidade = [maior if q is None else q for q in qualidade]
+        total = sum(qualidade)
+        self.probabilidades = [q / total for q in qualidade]
+
+
+def escolher_da_LRC_random(lrc: List[int], rng: Optional[random.Random] = None) -> int:
+    """
+    sorteia um candidato da LRC; usa o gerador `rng` quando informado e o módulo random global caso contrário
+    """
+    return (rng or random).choice(lrc)
+
+
+def semente_iteracao(seed: int, iteracao: int) -> random.Random:
+    """
+    cria o gerador de uma iteração do GRASP a partir da semente mestre, assim o
+    resultado de cada iteração não depende de qual processo a executou
+    """
+    return random.Random(f"{seed}:{iteracao}")
 
 def pode_adicionar(demand: int, capacidade_restante: int) -> bool:
     """
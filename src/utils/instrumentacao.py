@@ -0,0 +1,79 @@
+from dataclasses import fields, is_dataclass
+from typing import Any, Callable, Dict, Optional, Union
+import time
+
+# callback de progresso: (etapa, quantidade de passos da etapa, informações do algoritmo)
+Progresso = Callable[[str, int, Dict[str, Any]], None]
+
+
+class Instrumentacao:
+    """
+    contadores, tempos por fase e callback de progresso dos algoritmos.
+
+    os algoritmos recebem `instrumentacao=None` por padrão e só chamam estes métodos depois de
+    testar `is not None`, então sem instrumentação o custo é esse teste por evento. os tempos
+    são acumulados por nome de fase (`cronometra`), os contadores somados (`conta`, `passo`,
+    `absorve`) e `progresso` é chamado a cada `a_cada` passos de uma etapa; `a_cada` pode ser um
+    número só ou um dicionário por etapa (ex.: {"nos": 10000, "iteracoes": 1}).
+    """
+
+    __slots__ = ("contadores", "tempos", "resultados", "progresso", "a_cada")
+
+    def __init__(self, progresso: Optional[Progresso] = None, a_cada: Union[int, Dict[str, int]] = 1000) -> None:
+        self.contadores: Dict[str, int] = {}
+        self.tempos: Dict[str, float] = {}
+        # valores finais que não são somados (limitante inferior, gap, ...)
+        self.resultados: Dict[str, Any] = {}
+        self.progresso = progresso
+        self.a_cada = a_cada
+
+    def intervalo(self, etapa: str) -> int:
+        """número de passos da etapa entre duas chamadas do callback de progresso"""
+        if isinstance(self.a_cada, dict):
+            return max(1, self.a_cada.get(etapa, 1000))
+        return max(1, self.a_cada)
+
+    def conta(self, nome: str, n: int = 1) -> None:
+        self.contadores[nome] = self.contadores.get(nome, 0) + n
+
+    def cronometra(self, fase: str, inicio: float) -> float:
+        """
+        soma à fase o tempo desde `inicio` (time.perf_counter) e devolve o instante atual,
+        que serve de início da fase seguinte
+        """
+        agora = time.perf_counter()
+        self.tempos[fase] = self.tempos.get(fase, 0.0) + agora - inicio
+        return agora
+
+    def notifica(self, etapa: str, n: int, **info: Any) -> None:
+        if self.progresso is not None:
+            self.progresso(etapa, n, info)
+
+    def passo(self, etapa: str, **info: Any) -> None:
+        """conta um passo da etapa (iteração, nó...) e chama o callback a cada `intervalo(etapa)` passos"""
+        n = self.contadores.get(etapa, 0) + 1
+        self.contadores[etapa] = n
+        if self.progresso is not None and n % self.intervalo(etapa) == 0:
+            self.progresso(etapa, n, info)
+
+    def absorve(self, estatisticas: Any) -> None:
+        """
+        copia um dataclass de estatísticas (ex.: EstatisticasBB): campos inteiros são somados aos
+        contadores e os demais guardados em `resultados`
+        """
+        if not is_dataclass(estatisticas):
+            raise TypeError("absorve espera um dataclass de estatísticas")
+        for campo in fields(estatisticas):
+            valor = getattr(estatisticas, campo.name)
+            if isinstance(valor, int) and not isinstance(valor, bool):
+                self.conta(campo.name, valor)
+            else:
+                self.resultados[campo.name] = valor
+
+    def acumula(self, outra: "Instrumentacao") -> None:
+        """soma contadores e tempos de outra instrumentação (por exemplo, de um processo do pool)"""
+        for nome, n in outra.contadores.items():
+            self.conta(nome, n)
+        for fase, segundos in outra.tempos.items():
+            self.tempos[fase] = self.tempos.get(fase, 0.0) + segundos
+        self.resultados.update(outra.resultados)
@@ -0,0 +1,210 @@
+from typing import Any, List, Optional, Sequence
+from array import array
+import math
+import numpy as np
+
+from utils.bb_utils import ContextoBB, bits, mascaras_numpy, soma_por_rota
+from utils.simplex import matriz_incidencia, simplex_revisado
+
+
+class LimitanteInferior:
+    """
+    interface dos limitantes inferiores do branch and bound.
+
+    cada nó da busca carrega um `estado` do limitante; ao fixar uma rota o estado é
+    atualizado de forma incremental por `apos_rota` e `valor` devolve a cota inferior
+    do custo para atender os clientes restantes.
+    """
+
+    def estado_inicial(self, restantes: int) -> Any:
+        raise NotImplementedError
+
+    def apos_rota(self, estado: Any, restantes: int, ridx: int) -> Any:
+        """estado depois de fixar a rota `ridx`; `restantes` já é a máscara sem a rota"""
+        return self.estado_inicial(restantes)
+
+    def valor(self, estado: Any) -> float:
+        raise NotImplementedError
+
+    def custos_reduzidos(self) -> Optional[Sequence[float]]:
+        """
+        para limitantes com parte aditiva (soma de u_k), o custo de cada rota menos a soma de u nela;
+        None caso contrário. o filho que fixa a rota r tem limitante >= custo acumulado +
+        parte_aditiva(estado) + custos_reduzidos[r], o que deixa o branch and bound percorrer as
+        rotas em ordem de custo reduzido e parar na primeira que já seria podada.
+        """
+        return None
+
+    def parte_aditiva(self, estado: Any) -> float:
+        return 0.0
+
+
+class LimitanteAditivo(LimitanteInferior):
+    """
+    limitante da forma soma de u_k sobre os clientes restantes, com u dual-factível
+    (para toda rota r, soma de u_k em r <= custo de r). o estado é a própria soma e
+    fixar uma rota custa O(1): subtrai a soma de u na rota, calculada antes da busca.
+    """
+
+    def __init__(self, contexto: ContextoBB, u: Sequence[float]) -> None:
+        self.u = list(u)
+        soma = soma_por_rota(contexto.route_masks, self.u)
+        # arrays float64: 8 bytes por rota em vez de um float do Python em cada lista
+        self.soma_rota = array("d", soma.tobytes())
+        self.reduzidos = array("d", (np.asarray(contexto.route_costs, dtype=np.float64) - soma).tobytes())
+
+    def estado_inicial(self, restantes: int) -> float:
+        return sum(self.u[k] for k in bits(restantes))
+
+    def apos_rota(self, estado: float, restantes: int, ridx: int) -> float:
+        return estado - self.soma_rota[ridx]
+
+    def valor(self, estado: float) -> float:
+        return estado
+
+    def custos_reduzidos(self) -> Sequence[float]:
+        return self.reduzidos
+
+    def parte_aditiva(self, estado: float) -> float:
+        return estado
+
+
+class LimitanteCustoMedio(LimitanteAditivo):
+    """
+    limitante original: cada cliente restante contribui com o menor custo médio
+    (custo / número de clientes) entre as rotas que o contêm
+    """
+
+    def __init__(self, contexto: ContextoBB) -> None:
+        M = mascaras_numpy(contexto.route_masks)
+        n = len(contexto.clientes)
+        contem = [((M >> k) & 1).astype(bool) for k in range(n)]
+        medio = np.asarray(contexto.route_costs, dtype=np.float64) / sum(c.astype(np.float64) for c in contem)
+        super().__init__(contexto, [float(medio[c].min()) if c.any() else math.inf for c in contem])
+
+
+class LimitanteDual(LimitanteAditivo):
+    """
+    relaxação linear do particionamento de conjuntos sobre o conjunto de rotas gerado:
+    min soma c_r x_r  s.a.  cada cliente coberto exatamente uma vez, x >= 0.
+
+    as variáveis duais ótimas formam o vetor u dual-factível de maior soma; o
+    limitante usa esses duais (com o erro numérico descontado de cada cliente).
+    o simplex respeita `contexto.prazo` e levanta TimeoutError quando ele passa.
+    """
+
+    def __init__(self, contexto: ContextoBB) -> None:
+        n = len(contexto.clientes)
+        A = matriz_incidencia(contexto.route_masks, n)
+        c = np.asarray(contexto.route_costs, dtype=np.float64)
+
+        # as rotas com um único cliente formam uma base inicial factível (identidade)
+        singulares = {mask: r for r, mask in enumerate(contexto.route_masks) if mask & (mask - 1) == 0}
+        if len(singulares) < n:
+            raise ValueError("Instância inviável: há cliente com demanda maior que a capacidade")
+        base = [singulares[1 << k] for k in range(n)]
+        _, duais, self.valor_lp, _ = simplex_revisado(A, c, np.ones(n), base, prazo=contexto.prazo)
+
+        # garante factibilidade dual exata: desconta a maior violação de todos os clientes
+        folga = float(min(0.0, (c - duais @ A).min()))
+        super().__init__(contexto, (duais + folga).tolist())
+
+
+class LimitanteGrau(LimitanteInferior):
+    """
+    limitante pelos graus dos nós, combinado com um limitante de bin packing para o número de veículos.
+
+    todo cliente tem duas arestas na solução, então contribui com pelo menos metade das suas duas
+    arestas mais baratas (o depósito pode contar duas vezes). o depósito tem 2k arestas, com
+    k >= max(ceil(demanda restante / capacidade), clientes com demanda > capacidade / 2), e contribui
+    com pelo menos a soma das k menores distâncias até os clientes restantes.
+    """
+
+    def __init__(self, contexto: ContextoBB) -> None:
+        G = contexto.G
+        d = G.linhas()
+        dep = G.indice[contexto.depot]
+        pos = [G.indice[c] for c in contexto.clientes]
+        self.capacity = contexto.capacity
+        self.demanda = contexto.demanda_bit
+        self.grande = [1 if dem * 2 > contexto.capacity else 0 for dem in contexto.demanda_bit]
+
+        self.meia_aresta: List[float] = []
+        for p in pos:
+            candidatos = sorted([d[p][q] for q in pos if q != p] + [d[p][dep], d[p][dep]])
+            self.meia_aresta.append((candidatos[0] + candidatos[1]) / 2)
+
+        self.ida = [d[dep][p] for p in pos]
+        self.ordem_deposito = sorted(range(len(pos)), key=lambda k: self.ida[k])
+
+    def estado_inicial(self, restantes: int) -> tuple:
+        soma = carga = grandes = 0
+        for k in bits(restantes):
+            soma += self.meia_aresta[k]
+            carga += self.demanda[k]
+            grandes += self.grande[k]
+        return soma, carga, grandes, restantes
+
+    def apos_rota(self, estado: tuple, restantes: int, ridx: int) -> tuple:
+        soma, carga, grandes, anteriores = estado
+        for k in bits(anteriores ^ restantes):
+            soma -= self.meia_aresta[k]
+            carga -= self.demanda[k]
+            grandes -= self.grande[k]
+        return soma, carga, grandes, restantes
+
+    def valor(self, estado: tuple) -> float:
+        soma, carga, grandes, restantes = estado
+        if not restantes:
+            return 0.0
+        veiculos = max(math.ceil(carga / self.capacity), grandes, 1)
+        deposito = 0
+        for k in self.ordem_deposito:
+            if restantes >> k & 1:
+                deposito += self.ida[k]
+                veiculos -= 1
+                if not veiculos:
+                    break
+        return soma + deposito
+
+
+class LimitanteMaximo(LimitanteInferior):
+    """
+    combina vários limitantes usando o maior valor entre eles
+    """
+
+    def __init__(self, limitantes: Sequence[LimitanteInferior]) -> None:
+        self.limitantes = list(limitantes)
+        # a parte aditiva é a do primeiro limitante que tiver uma
+        self._aditivo = next((i for i, l in enumerate(self.limitantes) if l.custos_reduzidos() is not None), None)
+
+    def estado_inicial(self, restantes: int) -> tuple:
+        return tuple(l.estado_inicial(restantes) for l in self.limitantes)
+
+    def apos_rota(self, estado: tuple, restantes: int, ridx: int) -> tuple:
+        return tuple(l.apos_rota(e, restantes, ridx) for l, e in zip(self.limitantes, estado))
+
+    def valor(self, estado: tuple) -> float:
+        return max(l.valor(e) for l, e in zip(self.limitantes, estado))
+
+    def custos_reduzidos(self) -> Optional[Sequence[float]]:
+        if self._aditivo is None:
+            return None
+        return self.limitantes[self._aditivo].custos_reduzidos()
+
+    def parte_aditiva(self, estado: tuple) -> float:
+        if self._aditivo is None:
+            return 0.0
+        return self.limitantes[self._aditivo].parte_aditiva(estado[self._aditivo])
+
+
+def limitante_padrao(contexto: ContextoBB) -> LimitanteInferior:
+    """
+    limitante usado por padrão: o maior entre o dual da relaxação linear, o custo médio e o de graus
+    (o dual vem primeiro para ser a parte aditiva usada na ordenação das rotas)
+    """
+    return LimitanteMaximo([
+        LimitanteDual(contexto),
+        LimitanteCustoMedio(contexto),
+        LimitanteGrau(contexto),
+    ])
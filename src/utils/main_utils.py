@@ -1,13 +1,20 @@
+import argparse
+import ast
+import csv
+import json
 import os
+import sys
 import time
-from typing import List, Tuple, Dict
-import networkx as nx
+from typing import Any, List, Optional, Sequence, Tuple, Dict, Union, TYPE_CHECKING
 
-from utils.file_reader import le_arquivo
-from utils.graph_constructor import constroi_grafo
-from heuristicas.clarke_wright import clarke_wright
-from exatos.branch_and_bound import cvrp_branch_and_bound
-from meta_heuristicas.grasp import grasp_cvrp
+from utils.file_reader import le_instancia
+from utils.matriz_distancias import MatrizDistancias
+from utils.instrumentacao import Instrumentacao
+from utils.api import ALGORITMOS, ResultadoSolucao, carrega_algoritmo, nome_algoritmo, resolver_caminhos, solve
+from utils.validacao import valida_resultados
+
+if TYPE_CHECKING:
+    import networkx as nx
 
 
 def selecionar_instancia(diretorio: str) -> str:
@@ -46,6 +53,10 @@ def selecionar_algoritmo() -> str:
     print("1. Clarke & Wright (Heurístico)")
     print("2. Branch and Bound (Exato)")
     print("3. GRASP (Meta-heurística)")
+    print("4. Geração de Colunas (Exato)")
+    print("5. Decomposição em clusters (instâncias grandes)")
+    print("6. LNS - ruin and recreate (Meta-heurística)")
+    print("7. Portfólio (C&W, GRASP e Branch and Bound ao mesmo tempo)")
 
     while True:
         try:
@@ -57,27 +68,63 @@ def selecionar_algoritmo() -> str:
                 return "branch_and_bound"
             elif opcao == 3:
                 return "grasp"
+            elif opcao == 4:
+                return "geracao_colunas"
+            elif opcao == 5:
+                return "decomposicao"
+            elif opcao == 6:
+                return "lns"
+            elif opcao == 7:
+                return "portfolio"
             else:
-                print("Número inválido. Escolha 1, 2 ou 3.")
+                print("Número inválido. Escolha um número de 1 a 7.")
         except ValueError:
             print("Entrada inválida. Digite um número válido.")
 
 
-def executar_algoritmo(G: nx.Graph,
+def executar_algoritmo(G: Union["nx.Graph", MatrizDistancias],
                        demands: Dict[int, int],
                        depot: int,
                        capacity: int,
-                       algoritmo: str) -> Tuple[List[List[int]], float]:
+                       algoritmo: str,
+                       instrumentacao: Optional[Instrumentacao] = None) -> Tuple[List[List[int]], float]:
     """
     Executa o algoritmo selecionado e retorna as rotas e o custo total
     """
 
     if algoritmo == "clarke_wright":
-        rotas, custo = clarke_wright(G, demands, depot, capacity)
+        clarke_wright = carrega_algoritmo("clarke_wright")
+        rotas, custo = clarke_wright(G, demands, depot, capacity, instrumentacao=instrumentacao)
         return rotas, custo
 
     elif algoritmo == "branch_and_bound":
-        rotas, custo = cvrp_branch_and_bound(G, demands, depot, capacity)
+        cvrp_branch_and_bound = carrega_algoritmo("branch_and_bound")
+        rotas, custo = cvrp_branch_and_bound(G, demands, depot, capacity, instrumentacao=instrumentacao)
+        return rotas, custo
+
+    elif algoritmo == "geracao_colunas":
+        cvrp_geracao_colunas = carrega_algoritmo("geracao_colunas")
+        rotas, custo = cvrp_geracao_colunas(G, demands, depot, capacity, instrumentacao=instrumentacao)
+        return rotas, custo
+
+    elif algoritmo == "decomposicao":
+        cvrp_decomposicao = carrega_algoritmo("decomposicao")
+        rotas, custo = cvrp_decomposicao(G, demands, depot, capacity, instrumentacao=instrumentacao)
+        return rotas, custo
+
+    elif algoritmo == "lns":
+        cvrp_lns = carrega_algoritmo("lns")
+        rotas, custo = cvrp_lns(G, demands, depot, capacity, instrumentacao=instrumentacao)
+        return rotas, custo
+
+    elif algoritmo == "portfolio":
+        try:
+            tempo_limite = float(input("Tempo limite em segundos: "))
+        except ValueError:
+            tempo_limite = 30.0
+            print("Tempo limite inválido, usando 30 segundos")
+        cvrp_portfolio = carrega_algoritmo("portfolio")
+        rotas, custo = cvrp_portfolio(G, demands, depot, capacity, tempo_limite=tempo_limite, instrumentacao=instrumentacao)
         return rotas, custo
 
     elif algoritmo == "grasp":
@@ -100,6 +147,7 @@ def executar_algoritmo(G: nx.Graph,
             alpha = 0.5
             print("Entrada inválida para alpha; usando 0.5")
 
+        grasp_cvrp = carrega_algoritmo("grasp")
         rotas, custo = grasp_cvrp(
             G=G,
             demands=demands,
@@ -107,6 +155,7 @@ def executar_algoritmo(G: nx.Graph,
             capacity=capacity,
             alpha=alpha,
             max_iterations=max_it,
+            instrumentacao=instrumentacao,
         )
         return rotas, custo
 
@@ -119,10 +168,12 @@ def imprimir_resultados(
     rotas: List[List[int]],
     custo_total: float,
     depot: int,
-    tempo_total: float
+    tempo_total: float,
+    instrumentacao: Optional[Instrumentacao] = None
 ) -> None:
     """
-    exibe as rotas, custo total e tempo de execução
+    exibe as rotas, custo total e tempo de execução; com `instrumentacao`, também os
+    tempos por fase e os contadores do algoritmo
     """
     print("\nRotas encontradas:\n")
     for idx, rota in enumerate(rotas, start=1):
@@ -133,14 +184,36 @@ def imprimir_resultados(
     print(f"Veículos utilizados: {len(rotas)}")
     print(f"Tempo total de execução: {tempo_total:.4f} segundos\n")
 
+    if instrumentacao is None:
+        return
+    if instrumentacao.tempos:
+        print("Tempo por fase:")
+        for fase, segundos in instrumentacao.tempos.items():
+            print(f" {fase:<20}{segundos:>12.4f} s")
+    if instrumentacao.contadores:
+        print("\nContadores:")
+        for nome, n in instrumentacao.contadores.items():
+            print(f" {nome:<20}{n:>12}")
+    if instrumentacao.resultados:
+        print()
+        for nome, valor in instrumentacao.resultados.items():
+            print(f" {nome:<20}{valor!s:>12}")
+    print()
+
 
-def main() -> None:
+def imprimir_progresso(etapa: str, n: int, info: Dict[str, Any]) -> None:
+    """callback de progresso usado pelo menu"""
+    detalhes = ", ".join(f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in info.items())
+    print(f"  [{etapa} {n}] {detalhes}")
+
+
+def menu_interativo() -> None:
     """
-    executa o fluxo principal:
+    executa o fluxo interativo:
       1. seleciona instância
       2. escolhe algoritmo
       3. lê arquivo .vrp
-      4. constrói grafo
+      4. constrói a matriz de distâncias
       5. executa algoritmo
       6. mostra resultados
     """
@@ -159,13 +232,122 @@ def main() -> None:
         caminho_arquivo: str = selecionar_instancia("instancias")
         print(f"\nLendo instância: {caminho_arquivo}\n")
 
-        coords, demands, capacity, depot = le_arquivo(caminho_arquivo)
-        G: nx.Graph = constroi_grafo(coords)
+        instancia = le_instancia(caminho_arquivo)
+        _, demands, capacity, depot = instancia.como_dicionarios()
+        G: MatrizDistancias = instancia.matriz()
 
         algoritmo: str = selecionar_algoritmo()
 
+        instrumentacao = Instrumentacao(imprimir_progresso, a_cada={"nos": 100_000, "iteracoes": 10, "rodadas": 10})
         inicio: float = time.time()
-        rotas, custo_total = executar_algoritmo(G, demands, depot, capacity, algoritmo)
+        rotas, custo_total = executar_algoritmo(G, demands, depot, capacity, algoritmo, instrumentacao)
         fim: float = time.time()
 
-        imprimir_resultados(rotas, custo_total, depot, fim - inicio)
+        imprimir_resultados(rotas, custo_total, depot, fim - inicio, instrumentacao)
+
+
+def salvar_solucoes(resultados: Sequence[ResultadoSolucao], formato: str, arquivo) -> None:
+    """escreve os resultados em JSON (lista de objetos) ou CSV (uma linha por instância)"""
+    if formato == "json":
+        json.dump([r.como_dicionario() for r in resultados], arquivo, indent=2, ensure_ascii=False)
+        arquivo.write("\n")
+        return
+    escritor = csv.writer(arquivo)
+    escritor.writerow(["instancia", "algoritmo", "custo", "veiculos", "tempo", "tempo_leitura", "rotas"])
+    for r in resultados:
+        escritor.writerow([r.instancia, r.algoritmo, r.custo, r.veiculos, r.tempo, r.tempo_leitura, json.dumps(r.rotas)])
+
+
+def _le_parametros(itens: Sequence[str]) -> Dict[str, Any]:
+    """converte ["n_processos=4", ...] em {"n_processos": 4}"""
+    parametros: Dict[str, Any] = {}
+    for item in itens:
+        nome, _, valor = item.partition("=")
+        if not nome or not valor:
+            raise ValueError(f"Parâmetro inválido: {item} (use nome=valor)")
+        try:
+            parametros[nome] = ast.literal_eval(valor)
+        except (ValueError, SyntaxError):
+            parametros[nome] = valor
+    return parametros
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """
+    sem argumentos (ou com --interativo) abre o menu; com instâncias resolve sem interação, por exemplo:
+        python src/main.py A-n32-k5 "mini-*" -a grasp --alpha 0.3 --iteracoes 50 --seed 1 -f json -o saida.json
+    """
+    argv = sys.argv[1:] if argv is None else list(argv)
+    parser = argparse.ArgumentParser(description="Resolve instâncias do CVRP")
+    parser.add_argument("instancias", nargs="*",
+                        help="caminhos de .vrp, padrões glob ou nomes de instâncias de src/instancias")
+    parser.add_argument("-a", "--algoritmo", default="clarke_wright", help=f"algoritmo ({', '.join(ALGORITMOS)})")
+    parser.add_argument("--alpha", type=float, help="alpha do GRASP")
+    parser.add_argument("--iteracoes", type=int, help="iterações do GRASP")
+    parser.add_argument("--seed", type=int, help="semente do GRASP")
+    parser.add_argument("--tempo-limite", type=float, help="orçamento de tempo em segundos")
+    parser.add_argument("-p", "--parametro", action="append", default=[],
+                        help="outro parâmetro do algoritmo, no formato nome=valor")
+    parser.add_argument("-f", "--formato", choices=["texto", "json", "csv"], default="texto")
+    parser.add_argument("-o", "--saida", help="arquivo de saída com -f json ou csv (padrão: terminal)")
+    parser.add_argument("--estatisticas", action="store_true", help="coleta contadores e tempos por fase")
+    parser.add_argument("--cache", help="pasta do cache binário das instâncias")
+    parser.add_argument("-i", "--interativo", action="store_true", help="abre o menu interativo")
+    parser.add_argument("--validar", action="store_true",
+                        help="em vez de resolver, valida as soluções dos arquivos/pastas informados "
+                             "(JSON ou CSV salvos com -f e .sol do CVRPLIB)")
+    args = parser.parse_args(argv)
+
+    if args.interativo or not args.instancias:
+        menu_interativo()
+        return
+    if args.validar:
+        try:
+            relatorios = valida_resultados(args.instancias, diretorio_cache=args.cache)
+        except (ValueError, FileNotFoundError) as erro:
+            parser.error(str(erro))
+        for relatorio in relatorios:
+            print(relatorio.resumo())
+        invalidas = sum(not r.valida for r in relatorios)
+        print(f"\n{len(relatorios)} soluções verificadas, {invalidas} inválidas")
+        if invalidas:
+            sys.exit(1)
+        return
+
+    if args.saida and args.formato == "texto":
+        parser.error("-o/--saida só vale com -f json ou -f csv")
+    try:
+        algoritmo = nome_algoritmo(args.algoritmo)
+        parametros = _le_parametros(args.parametro)
+        caminhos = resolver_caminhos(args.instancias)
+    except (ValueError, FileNotFoundError) as erro:
+        parser.error(str(erro))
+    for nome, valor in (("alpha", args.alpha), ("max_iterations", args.iteracoes),
+                        ("seed", args.seed), ("tempo_limite", args.tempo_limite)):
+        if valor is not None:
+            parametros[nome] = valor
+
+    resultados: List[ResultadoSolucao] = []
+    falhas = 0
+    for caminho in caminhos:
+        instrumentacao = Instrumentacao() if args.estatisticas else None
+        try:
+            resultado = solve(caminho, algoritmo, instrumentacao, args.cache, **parametros)
+        except Exception as erro:
+            # uma instância com erro não interrompe as demais; o código de saída indica a falha
+            print(f"{caminho}: {type(erro).__name__}: {erro}", file=sys.stderr)
+            falhas += 1
+            continue
+        if args.formato == "texto":
+            print(f"\nInstância: {resultado.instancia} ({resultado.algoritmo})")
+            imprimir_resultados(resultado.rotas, resultado.custo, resultado.deposito, resultado.tempo, instrumentacao)
+        resultados.append(resultado)
+
+    if args.formato != "texto":
+        if args.saida:
+            with open(args.saida, "w", newline="") as arquivo:
+                salvar_solucoes(resultados, args.formato, arquivo)
+        else:
+            salvar_solucoes(resultados, args.formato, sys.stdout)
+    if falhas:
+        sys.exit(1)
@@ -0,0 +1,281 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+from utils.vizinhanca import IndiceVizinhos
+
+# tamanho do bloco de linhas calculado por vez, limita a memória temporária em instâncias grandes
+_BLOCO_LINHAS = 1024
+# a partir deste número de nós os vizinhos mais próximos são buscados na grade de coordenadas
+_MIN_NOS_GRADE = 256
+# acima disso `custo_rota` não cria a lista de listas (n² inteiros do Python) só para somar uma rota
+_MAX_NOS_LINHAS = 2000
+# folga da reserva de `adiciona_no`: n // _FOLGA_RESERVA linhas e colunas a mais a cada realocação
+_FOLGA_RESERVA = 8
+
+
+class MatrizDistancias:
+    """
+    matriz densa (int32) com as distâncias entre todos os nós da instância.
+
+    os nós são indexados de forma contígua: `nos[k]` é o identificador do nó
+    que ocupa a linha/coluna k e `indice[no]` faz o caminho inverso. pode ser
+    usada no lugar do grafo NetworkX em todos os algoritmos do projeto.
+
+    `euclidiana` indica que a matriz foi calculada a partir de `coords` (EUC_2D/CEIL_2D); só assim
+    as coordenadas servem para buscar vizinhos ou calcular distâncias de nós novos. nas instâncias
+    EXPLICIT as coordenadas, quando existem, são só de exibição (DISPLAY_DATA_SECTION).
+    """
+
+    __slots__ = ("nos", "indice", "matriz", "coords", "euclidiana", "_linhas", "_vizinhos", "_grade", "_reserva")
+
+    def __init__(
+        self,
+        nos: Sequence[int],
+        matriz: np.ndarray,
+        coords: Optional[np.ndarray] = None,
+        euclidiana: bool = False
+    ) -> None:
+        self.nos: List[int] = list(nos)
+        self.indice: Dict[int, int] = {no: k for k, no in enumerate(self.nos)}
+        self.matriz: np.ndarray = matriz
+        self.coords: Optional[np.ndarray] = coords
+        self.euclidiana = euclidiana and coords is not None
+        self._linhas: Optional[List[List[int]]] = None
+        self._vizinhos: Dict[Tuple[int, Tuple[int, ...]], np.ndarray] = {}
+        self._grade: Optional[IndiceVizinhos] = None
+        # matriz com linhas/colunas de folga usada por `adiciona_no`; `matriz` é uma visão dela
+        self._reserva: Optional[np.ndarray] = None
+
+    @classmethod
+    def de_coordenadas(cls, coords: Dict[int, Tuple[float, float]]) -> "MatrizDistancias":
+        """
+        constrói a matriz a partir das coordenadas, com a distância euclidiana
+        arredondada (mesma regra de `distancia_euclides`), de forma vetorizada.
+        """
+        nos = sorted(coords)
+        xy = np.array([coords[n] for n in nos], dtype=np.float64).reshape(-1, 2)
+        return cls(nos, matriz_euclidiana(xy), xy, euclidiana=True)
+
+    @classmethod
+    def de_grafo(cls, G) -> "MatrizDistancias":
+        """
+        converte um grafo NetworkX com pesos 'weight' nas arestas para a matriz.
+        """
+        nos = sorted(G.nodes)
+        indice = {no: k for k, no in enumerate(nos)}
+        matriz = np.zeros((len(nos), len(nos)), dtype=np.int32)
+        for a, b, peso in G.edges(data="weight"):
+            matriz[indice[a], indice[b]] = peso
+            matriz[indice[b], indice[a]] = peso
+        return cls(nos, matriz)
+
+    def __getstate__(self):
+        # a lista de listas é só um cache, não vale a pena enviar para outros processos
+        return self.nos, self.matriz, self.coords, self.euclidiana
+
+    def __setstate__(self, estado) -> None:
+        nos, matriz, coords, euclidiana = estado
+        self.nos = nos
+        self.indice = {no: k for k, no in enumerate(nos)}
+        self.matriz = matriz
+        self.coords = coords
+        self.euclidiana = euclidiana
+        self._linhas = None
+        self._vizinhos = {}
+        self._grade = None
+        self._reserva = None
+
+    @property
+    def nodes(self) -> List[int]:
+        """lista de nós, mesmo nome usado pelo NetworkX"""
+        return self.nos
+
+    def __len__(self) -> int:
+        return len(self.nos)
+
+    def distancia(self, a: int, b: int) -> int:
+        """retorna a distância entre dois nós (pelos identificadores originais)"""
+        return self.matriz.item(self.indice[a], self.indice[b])
+
+    def linhas(self) -> List[List[int]]:
+        """
+        matriz como lista de listas (indexada pela posição), mais rápida que o
+        numpy para acessos escalares dentro de laços em Python. é criada uma vez só.
+        """
+        if self._linhas is None:
+            self._linhas = self.matriz.tolist()
+        return self._linhas
+
+    def distancias_ate(self, coord: Tuple[float, float], teto: bool = False) -> np.ndarray:
+        """distâncias arredondadas de um ponto até todos os nós (mesma regra de `matriz_euclidiana`)"""
+        if not self.euclidiana:
+            raise ValueError("A matriz não foi calculada das coordenadas; informe as distâncias do novo nó")
+        arredonda = np.ceil if teto else np.rint
+        distancias = arredonda(np.hypot(self.coords[:, 0] - coord[0], self.coords[:, 1] - coord[1]))
+        return distancias.astype(self.matriz.dtype)
+
+    def adiciona_no(
+        self,
+        no: int,
+        distancias: Sequence[int],
+        coord: Optional[Tuple[float, float]] = None
+    ) -> int:
+        """
+        acrescenta um nó (ou substitui as distâncias de um que já existe) com as distâncias simétricas
+        até os nós atuais, na ordem de `nos`, e devolve a posição dele. em O(n) amortizado: a matriz
+        fica numa reserva com 1/8 de folga, refeita quando a folga acaba (uma matriz somente leitura,
+        como a do memory map do cache, é copiada na primeira alteração), e a lista de listas, se
+        já existir, é atualizada no lugar. os vizinhos mais próximos guardados são descartados.
+        """
+        n = len(self.nos)
+        novo = no not in self.indice
+        if self.coords is not None and coord is None:
+            raise ValueError("A matriz tem coordenadas; informe a coordenada do novo nó")
+        if self._reserva is None or (novo and n >= self._reserva.shape[0]):
+            reserva = np.empty((n + max(n // _FOLGA_RESERVA, 16),) * 2, dtype=self.matriz.dtype)
+            reserva[:n, :n] = self.matriz
+            self._reserva = reserva
+        distancias = np.asarray(distancias, dtype=self.matriz.dtype)
+        p = n if novo else self.indice[no]
+        self._reserva[p, :n] = distancias
+        self._reserva[:n, p] = distancias
+        self._reserva[p, p] = 0
+        if novo:
+            self.nos.append(no)
+            self.indice[no] = p
+        self.matriz = self._reserva[:len(self.nos), :len(self.nos)]
+        if self.coords is not None:
+            # cópia O(n): as coordenadas podem ser somente leitura
+            coords = np.vstack([self.coords, [coord]]) if novo else np.array(self.coords)
+            coords[p] = coord
+            self.coords = coords
+
+        if self._linhas is not None:
+            valores = distancias.tolist()
+            for linha, distancia in zip(self._linhas, valores):
+                if novo:
+                    linha.append(distancia)
+                else:
+                    linha[p] = distancia
+            if novo:
+                self._linhas.append(valores + [0])
+            else:
+                self._linhas[p] = valores
+                self._linhas[p][p] = 0
+        self._vizinhos = {}
+        self._grade = None
+        return p
+
+    def submatriz(self, nos: Sequence[int]) -> "MatrizDistancias":
+        """matriz só com os nós informados (identificadores originais), na ordem dada"""
+        posicoes = np.array([self.indice[no] for no in nos], dtype=np.intp)
+        coords = self.coords[posicoes] if self.coords is not None else None
+        return MatrizDistancias(list(nos), self.matriz[np.ix_(posicoes, posicoes)], coords, self.euclidiana)
+
+    def indice_espacial(self) -> Optional[IndiceVizinhos]:
+        """
+        grade sobre as coordenadas usada nas consultas de vizinhos (None se a matriz não foi
+        calculada das coordenadas)
+        """
+        if self._grade is None and self.euclidiana:
+            self._grade = IndiceVizinhos(self.coords, self.matriz)
+        return self._grade
+
+    def vizinhos_mais_proximos(self, k: int, excluir: Sequence[int] = ()) -> np.ndarray:
+        """
+        retorna uma matriz (n, k) com as posições dos k nós mais próximos de cada
+        posição (sem o próprio nó e sem as posições em `excluir`), em ordem crescente
+        de distância (empates pela posição). o resultado fica guardado para as próximas
+        chamadas e é compartilhado pelo GRASP, pelo Clarke & Wright e pela busca local.
+
+        com matriz euclidiana e muitos nós a busca usa a grade de `indice_espacial`, em ~O(n·k);
+        com pesos explícitos ordena parcialmente cada linha da matriz.
+        """
+        chave = (k, tuple(sorted(excluir)))
+        if chave in self._vizinhos:
+            return self._vizinhos[chave]
+        n = len(self.nos)
+        excluir = list(excluir)
+        k = max(0, min(k, n - 1 - len(excluir)))
+        if self.euclidiana and n >= _MIN_NOS_GRADE:
+            vizinhos = self.indice_espacial().k_vizinhos(k, excluir)
+            self._vizinhos[chave] = vizinhos
+            return vizinhos
+
+        vizinhos = np.empty((n, k), dtype=np.int32)
+        self._vizinhos[chave] = vizinhos
+        if k == 0:
+            return vizinhos
+        infinito = np.iinfo(np.int32).max
+        posicoes = np.arange(n, dtype=np.int64)
+        for inicio in range(0, n, _BLOCO_LINHAS):
+            fim = min(inicio + _BLOCO_LINHAS, n)
+            bloco = self.matriz[inicio:fim].astype(np.int64)
+            linhas = np.arange(fim - inicio)
+            bloco[linhas, linhas + inicio] = infinito
+            if excluir:
+                bloco[:, excluir] = infinito
+            # chave única (distância, posição) para desempatar sempre do mesmo jeito
+            bloco = bloco * n + posicoes
+            chaves = np.partition(bloco, k - 1, axis=1)[:, :k]
+            chaves.sort(axis=1)
+            vizinhos[inicio:fim] = chaves % n
+        return vizinhos
+
+    def custo_rota(self, rota: Sequence[int], depot: int) -> int:
+        """
+        calcula o custo de uma rota (sem o depósito), incluindo ida e volta ao depósito
+        """
+        if not rota:
+            return 0
+        indice = self.indice
+        if self._linhas is None and len(self.nos) > _MAX_NOS_LINHAS:
+            caminho = [indice[depot]] + [indice[c] for c in rota] + [indice[depot]]
+            return int(self.matriz[caminho[:-1], caminho[1:]].sum())
+        linhas = self.linhas()
+        anterior = indice[depot]
+        custo = 0
+        for c in rota:
+            atual = indice[c]
+            custo += linhas[anterior][atual]
+            anterior = atual
+        return custo + linhas[anterior][indice[depot]]
+
+
+def matriz_euclidiana(xy: np.ndarray, teto: bool = False) -> np.ndarray:
+    """
+    distâncias euclidianas arredondadas entre todos os pares de pontos,
+    calculadas em blocos de linhas. com `teto` arredonda pra cima (CEIL_2D do TSPLIB).
+    """
+    n = xy.shape[0]
+    arredonda = np.ceil if teto else np.rint
+    matriz = np.empty((n, n), dtype=np.int32)
+    for inicio in range(0, n, _BLOCO_LINHAS):
+        fim = min(inicio + _BLOCO_LINHAS, n)
+        dx = xy[inicio:fim, 0, None] - xy[None, :, 0]
+        dy = xy[inicio:fim, 1, None] - xy[None, :, 1]
+        arredonda(np.hypot(dx, dy), out=dx)
+        matriz[inicio:fim] = dx
+    return matriz
+
+
+def constroi_matriz(coords: Dict[int, Tuple[float, float]]) -> MatrizDistancias:
+    """
+    constrói a matriz de distâncias euclidianas arredondadas.
+
+    argumentos:
+        coords: dicionário {nó: (x, y)}.
+    retorna:
+        MatrizDistancias com os nós indexados de forma contígua.
+    """
+    return MatrizDistancias.de_coordenadas(coords)
+
+
+def como_matriz(G) -> MatrizDistancias:
+    """
+    garante que a estrutura de distâncias é uma MatrizDistancias, convertendo
+    grafos NetworkX quando necessário
+    """
+    if isinstance(G, MatrizDistancias):
+        return G
+    return MatrizDistancias.de_grafo(G)
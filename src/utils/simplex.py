@@ -0,0 +1,112 @@
+from typing import List, Optional, Sequence, Tuple
+import time
+import numpy as np
+
+# tolerância numérica dos testes de custo reduzido e da razão mínima
+_TOL = 1e-9
+# refaz a inversa da base do zero a cada tantas iterações, para conter o erro acumulado
+_REINVERTER_A_CADA = 50
+# iterações seguidas sem melhora no objetivo antes de trocar para a regra de Bland (evita ciclagem)
+_ITERACOES_DEGENERADAS = 30
+
+
+def simplex_revisado(
+    A: np.ndarray,
+    c: np.ndarray,
+    b: np.ndarray,
+    base: List[int],
+    max_iteracoes: int = 100000,
+    prazo: Optional[float] = None
+) -> Tuple[np.ndarray, np.ndarray, float, List[int]]:
+    """
+    resolve min c·x  s.a.  A x = b, x >= 0 pelo simplex revisado, partindo de uma base factível.
+
+    argumentos:
+        A: matriz (linhas, colunas) das restrições
+        c: custos das colunas
+        b: lado direito (>= 0)
+        base: índices das colunas da base inicial; A[:, base] deve ser inversível com A[:, base]^-1 b >= 0
+            (no particionamento de conjuntos, as rotas com um cliente só formam a identidade)
+        prazo: time.monotonic() limite; se passar, levanta TimeoutError
+    retorna:
+        (x, duais, valor, base)
+    """
+    base = list(base)
+    inversa = np.linalg.inv(A[:, base])
+    x_base = inversa @ b
+    ultimo_valor = float(c[base] @ x_base)
+    sem_melhora = 0
+
+    for iteracao in range(max_iteracoes):
+        if prazo is not None and time.monotonic() >= prazo:
+            raise TimeoutError("prazo esgotado durante o simplex")
+        if iteracao and iteracao % _REINVERTER_A_CADA == 0:
+            inversa = np.linalg.inv(A[:, base])
+            x_base = inversa @ b
+
+        duais = c[base] @ inversa
+        reduzidos = c - duais @ A
+
+        # Dantzig (custo reduzido mais negativo) e, se o objetivo empacar, Bland (menor índice)
+        if sem_melhora < _ITERACOES_DEGENERADAS:
+            entra = int(np.argmin(reduzidos))
+            if reduzidos[entra] >= -_TOL:
+                break
+        else:
+            negativos = np.flatnonzero(reduzidos < -_TOL)
+            if negativos.size == 0:
+                break
+            entra = int(negativos[0])
+
+        direcao = inversa @ A[:, entra]
+        positivos = np.flatnonzero(direcao > _TOL)
+        if positivos.size == 0:
+            raise ValueError("problema ilimitado")
+        razoes = x_base[positivos] / direcao[positivos]
+        menor = razoes.min()
+        empatados = positivos[razoes <= menor + _TOL]
+        sai = int(min(empatados, key=lambda i: base[i]))
+
+        # atualização da inversa pela forma produto
+        pivo = direcao[sai]
+        passo = x_base[sai] / pivo
+        x_base -= passo * direcao
+        x_base[sai] = passo
+        linha_pivo = inversa[sai] / pivo
+        inversa -= np.outer(direcao, linha_pivo)
+        inversa[sai] = linha_pivo
+        base[sai] = entra
+
+        valor = float(c[base] @ x_base)
+        if valor < ultimo_valor - _TOL:
+            ultimo_valor = valor
+            sem_melhora = 0
+        else:
+            sem_melhora += 1
+
+    inversa = np.linalg.inv(A[:, base])
+    x_base = inversa @ b
+    duais = c[base] @ inversa
+    x = np.zeros(A.shape[1])
+    x[base] = x_base
+    return x, duais, float(c @ x), base
+
+
+def matriz_incidencia(mascaras: Sequence[int], n: int) -> np.ndarray:
+    """
+    matriz (n, rotas) com 1 na linha k da coluna r quando o bit k está na máscara da rota r
+    """
+    if n < 63:
+        vetor = np.asarray(mascaras, dtype=np.int64)
+        # linha a linha, sem a matriz intermediária de int64 do tamanho de A
+        A = np.empty((n, len(vetor)))
+        for k in range(n):
+            A[k] = (vetor >> k) & 1
+        return A
+    A = np.zeros((n, len(mascaras)))
+    for r, mask in enumerate(mascaras):
+        while mask:
+            menor = mask & -mask
+            A[menor.bit_length() - 1, r] = 1.0
+            mask ^= menor
+    return A
@@ -0,0 +1,169 @@
+from typing import Dict, List, Optional, Union, TYPE_CHECKING
+
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+
+class Solucao:
+    """
+    solução do CVRP em posições da matriz de distâncias, com o que deixa as consultas em O(1):
+    rota e índice de cada cliente, carga e custo de cada rota, demanda acumulada (prefixos) ao
+    longo de cada rota e o custo total. como as distâncias são inteiras, o custo total mantido
+    de forma incremental é exato.
+
+    as rotas podem ser alteradas em `rota_mutavel(r)` seguida de `atualiza(r)`, ou pelos métodos
+    prontos (`move`, `troca_rota`). `copia()` é copy-on-write: custa O(número de rotas) e as listas
+    de cada rota só são copiadas quando uma das duas soluções altera aquela rota.
+    """
+
+    __slots__ = (
+        "G", "d", "dep", "demanda", "capacidade", "rotas", "rota_de", "indice_de", "carga", "custo",
+        "demanda_acumulada", "custo_total", "_proprias", "_indices_proprios",
+    )
+
+    def __init__(
+        self,
+        G: MatrizDistancias,
+        depot: int,
+        demanda: List[int],
+        rotas: List[List[int]],
+        capacidade: Optional[int] = None
+    ) -> None:
+        """`rotas` em posições da matriz e demanda[p] = demanda do nó na posição p"""
+        self.G = G
+        self.d = G.linhas()
+        self.dep = G.indice[depot]
+        self.demanda = demanda
+        self.capacidade = capacidade
+        self.rotas = [list(r) for r in rotas]
+        n = len(G)
+        self.rota_de = [-1] * n
+        self.indice_de = [-1] * n
+        self.carga = [0] * len(self.rotas)
+        self.custo = [0] * len(self.rotas)
+        self.demanda_acumulada: List[List[int]] = [[] for _ in self.rotas]
+        self.custo_total = 0
+        self._proprias = set(range(len(self.rotas)))
+        self._indices_proprios = True
+        for r in range(len(self.rotas)):
+            self.atualiza(r)
+
+    @classmethod
+    def de_rotas(
+        cls,
+        G: Union["nx.Graph", MatrizDistancias],
+        rotas: List[List[int]],
+        depot: int,
+        demands: Dict[int, int],
+        capacidade: Optional[int] = None
+    ) -> "Solucao":
+        """cria a solução a partir de rotas com os nós da instância (sem o depósito)"""
+        G = como_matriz(G)
+        demanda = [demands.get(no, 0) for no in G.nos]
+        return cls(G, depot, demanda, [[G.indice[c] for c in r] for r in rotas if r], capacidade)
+
+    def como_rotas(self) -> List[List[int]]:
+        """rotas com os nós da instância, sem as rotas vazias"""
+        nos = self.G.nos
+        return [[nos[p] for p in r] for r in self.rotas if r]
+
+    def __len__(self) -> int:
+        return len(self.rotas)
+
+    def atualiza(self, r: int) -> None:
+        """refaz as informações da rota r depois de alterada (O(tamanho da rota))"""
+        self.prepara_alteracoes()
+        rota_de, indice_de, demanda, d = self.rota_de, self.indice_de, self.demanda, self.d
+        anterior = self.dep
+        custo = carga = 0
+        cargas: List[int] = []
+        for i, c in enumerate(self.rotas[r]):
+            rota_de[c] = r
+            indice_de[c] = i
+            custo += d[anterior][c]
+            carga += demanda[c]
+            cargas.append(carga)
+            anterior = c
+        if cargas:
+            custo += d[anterior][self.dep]
+        # lista nova em vez de alterada, então cópias que compartilham a rota não são afetadas
+        self.demanda_acumulada[r] = cargas
+        self.custo_total += custo - self.custo[r]
+        self.custo[r] = custo
+        self.carga[r] = carga
+
+    def prepara_alteracoes(self) -> None:
+        """
+        copia já os índices compartilhados com uma cópia, para que `rota_de` e `indice_de` possam ser
+        guardados em variáveis locais durante uma sequência de alterações (como na busca local)
+        """
+        if not self._indices_proprios:
+            self.rota_de = list(self.rota_de)
+            self.indice_de = list(self.indice_de)
+            self._indices_proprios = True
+
+    def rota_mutavel(self, r: int) -> List[int]:
+        """lista da rota r que pode ser alterada no lugar (copiada antes se for compartilhada)"""
+        if r not in self._proprias:
+            self.rotas[r] = list(self.rotas[r])
+            self._proprias.add(r)
+        return self.rotas[r]
+
+    def troca_rota(self, r: int, rota: List[int]) -> None:
+        """substitui a rota r; os clientes que saíram dela precisam estar em outra rota atualizada"""
+        self.rotas[r] = rota
+        self._proprias.add(r)
+        self.atualiza(r)
+
+    def copia(self) -> "Solucao":
+        nova = object.__new__(Solucao)
+        nova.G, nova.d, nova.dep, nova.demanda, nova.capacidade = self.G, self.d, self.dep, self.demanda, self.capacidade
+        nova.rotas = list(self.rotas)
+        nova.carga = list(self.carga)
+        nova.custo = list(self.custo)
+        nova.demanda_acumulada = list(self.demanda_acumulada)
+        nova.custo_total = self.custo_total
+        # índices e listas das rotas passam a ser compartilhados pelas duas soluções
+        nova.rota_de, nova.indice_de = self.rota_de, self.indice_de
+        nova._indices_proprios = self._indices_proprios = False
+        nova._proprias = set()
+        self._proprias = set()
+        return nova
+
+    # consultas O(1)
+
+    def anterior(self, c: int) -> int:
+        """nó antes do cliente c na rota (o depósito se c for o primeiro)"""
+        i = self.indice_de[c]
+        return self.rotas[self.rota_de[c]][i - 1] if i > 0 else self.dep
+
+    def proximo(self, c: int) -> int:
+        """nó depois do cliente c na rota (o depósito se c for o último)"""
+        rota = self.rotas[self.rota_de[c]]
+        i = self.indice_de[c] + 1
+        return rota[i] if i < len(rota) else self.dep
+
+    def cabe(self, r: int, demanda_extra: int) -> bool:
+        return self.capacidade is None or self.carga[r] + demanda_extra <= self.capacidade
+
+    def delta_remocao(self, c: int) -> int:
+        """variação do custo ao retirar o cliente c da rota dele (negativa ou zero)"""
+        d = self.d
+        p, s = self.anterior(c), self.proximo(c)
+        return d[p][s] - d[p][c] - d[c][s]
+
+    def delta_insercao(self, c: int, a: int, b: int) -> int:
+        """variação do custo ao inserir o cliente c entre os nós vizinhos a e b"""
+        d = self.d
+        return d[a][c] + d[c][b] - d[a][b]
+
+    def move(self, c: int, r: int, i: int) -> None:
+        """retira o cliente c da rota dele e insere na posição i da rota r (índice depois da retirada)"""
+        origem = self.rota_de[c]
+        self.rota_mutavel(origem).pop(self.indice_de[c])
+        self.rota_mutavel(r).insert(i, c)
+        self.atualiza(origem)
+        if r != origem:
+            self.atualiza(r)
@@ -0,0 +1,286 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
+import csv
+import json
+import os
+
+from utils.file_reader import InstanciaCVRP, le_instancia, le_solucao
+from utils.matriz_distancias import MatrizDistancias, como_matriz
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# diferença aceita entre o custo informado pelo algoritmo e o recalculado
+_TOLERANCIA = 1e-6
+# quantos clientes listar nas mensagens de erro de cobertura
+_MAX_LISTADOS = 10
+
+
+@dataclass
+class RelatorioValidacao:
+    """resultado da validação de uma solução; `valida` é False se houver algum erro"""
+    instancia: str = ""
+    # arquivo (e posição nele) ou algoritmo de onde veio a solução
+    origem: str = ""
+    custo_informado: Optional[float] = None
+    custo_calculado: Optional[float] = None
+    # custo do .sol da instância, quando existe
+    custo_referencia: Optional[float] = None
+    gap_percentual: Optional[float] = None
+    erros: List[str] = field(default_factory=list)
+    avisos: List[str] = field(default_factory=list)
+
+    @property
+    def valida(self) -> bool:
+        return not self.erros
+
+    def resumo(self) -> str:
+        """uma linha com o resultado, seguida dos erros e avisos"""
+        custo = f"{self.custo_calculado:.0f}" if self.custo_calculado is not None else "-"
+        referencia = f"{self.custo_referencia:.0f}" if self.custo_referencia is not None else "-"
+        gap = f"{self.gap_percentual:.2f}%" if self.gap_percentual is not None else "-"
+        linhas = [f"{'OK  ' if self.valida else 'ERRO'} {self.instancia} [{self.origem}] custo {custo} referência {referencia} gap {gap}"]
+        linhas += [f"     erro: {e}" for e in self.erros]
+        linhas += [f"     aviso: {a}" for a in self.avisos]
+        return "\n".join(linhas)
+
+
+def _lista(nos: Sequence[int]) -> str:
+    nos = sorted(nos)
+    texto = ", ".join(str(n) for n in nos[:_MAX_LISTADOS])
+    return texto + (f" ... ({len(nos)} no total)" if len(nos) > _MAX_LISTADOS else "")
+
+
+def valida_solucao(
+    G: Union["nx.Graph", MatrizDistancias],
+    rotas: List[List[int]],
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    custo: Optional[float] = None,
+    custo_referencia: Optional[float] = None
+) -> RelatorioValidacao:
+    """
+    confere se cada cliente (nó de `demands`) aparece exatamente uma vez e nenhum outro nó aparece,
+    se nenhuma rota passa da capacidade e recalcula o custo pela matriz de distâncias (mesmo
+    arredondamento de `distancia_euclides`), comparando com `custo` quando informado. em O(n)
+    mais o custo das rotas.
+
+    um custo abaixo de `custo_referencia` vira aviso e não erro, já que o .sol pode trazer só o
+    melhor custo conhecido.
+    """
+    G = como_matriz(G)
+    relatorio = RelatorioValidacao(custo_informado=custo, custo_referencia=custo_referencia)
+    erros = relatorio.erros
+
+    vezes: Dict[int, int] = {}
+    desconhecidos = set()
+    sem_demanda = set()
+    deposito_no_meio = False
+    custo_calculado = 0
+    for k, rota in enumerate(rotas, 1):
+        if not rota:
+            relatorio.avisos.append(f"rota {k} vazia")
+            continue
+        carga = 0
+        validos = True
+        for c in rota:
+            if c == depot:
+                erros.append(f"rota {k}: depósito {depot} no meio da rota")
+                validos = False
+                deposito_no_meio = True
+            elif c not in G.indice:
+                desconhecidos.add(c)
+                validos = False
+            else:
+                if c not in demands:
+                    # nó ainda na matriz mas que não é mais cliente (ex.: cancelado na reotimização)
+                    sem_demanda.add(c)
+                vezes[c] = vezes.get(c, 0) + 1
+                carga += demands.get(c, 0)
+        if carga > capacity:
+            erros.append(f"rota {k}: carga {carga} maior que a capacidade {capacity}")
+        if validos:
+            custo_calculado += G.custo_rota(rota, depot)
+
+    if desconhecidos:
+        erros.append(f"nós que não existem na instância: {_lista(list(desconhecidos))}")
+    if sem_demanda:
+        erros.append(f"nós que não são clientes da instância: {_lista(list(sem_demanda))}")
+    repetidos = [c for c, n in vezes.items() if n > 1]
+    if repetidos:
+        erros.append(f"clientes em mais de uma posição: {_lista(repetidos)}")
+    # clientes são os nós com demanda informada, já que a matriz pode guardar nós removidos
+    faltando = [c for c in demands if c != depot and c not in vezes]
+    if faltando:
+        erros.append(f"clientes não atendidos: {_lista(faltando)}")
+
+    # com nós inválidos o custo recalculado fica incompleto, então não é comparado
+    if not desconhecidos and not deposito_no_meio:
+        relatorio.custo_calculado = float(custo_calculado)
+        if custo is not None and abs(custo - custo_calculado) > _TOLERANCIA:
+            erros.append(f"custo informado {custo} diferente do recalculado {custo_calculado}")
+        if custo_referencia:
+            relatorio.gap_percentual = 100.0 * (custo_calculado - custo_referencia) / custo_referencia
+            if custo_calculado < custo_referencia - _TOLERANCIA:
+                relatorio.avisos.append(f"custo {custo_calculado} abaixo do custo de referência {custo_referencia}")
+    return relatorio
+
+
+def verifica_solucao(
+    G: Union["nx.Graph", MatrizDistancias],
+    rotas: List[List[int]],
+    demands: Dict[int, int],
+    depot: int,
+    capacity: int,
+    custo: Optional[float] = None
+) -> RelatorioValidacao:
+    """`valida_solucao` para usar logo depois de um algoritmo: lança ValueError se a solução for inválida"""
+    relatorio = valida_solucao(G, rotas, demands, depot, capacity, custo)
+    if not relatorio.valida:
+        raise ValueError("Solução inválida: " + "; ".join(relatorio.erros))
+    return relatorio
+
+
+def rotas_do_cvrplib(rotas: List[List[int]], G: Union["nx.Graph", MatrizDistancias], depot: int) -> List[List[int]]:
+    """
+    converte as rotas de um .sol do CVRPLIB, em que os clientes são numerados 1, 2, ... na ordem
+    do arquivo sem contar o depósito, para os nós da instância
+    """
+    clientes = [no for no in como_matriz(G).nos if no != depot]
+    convertidas = []
+    for rota in rotas:
+        for c in rota:
+            if not 1 <= c <= len(clientes):
+                raise ValueError(f"Cliente {c} do .sol fora da instância ({len(clientes)} clientes)")
+        convertidas.append([clientes[c - 1] for c in rota])
+    return convertidas
+
+
+def custo_referencia(caminho_instancia: str) -> Optional[float]:
+    """custo do .sol com o mesmo nome da instância, ou None se não houver"""
+    caminho_sol = os.path.splitext(caminho_instancia)[0] + ".sol"
+    if not os.path.exists(caminho_sol):
+        return None
+    return le_solucao(caminho_sol)[1]
+
+
+def valida_arquivo_sol(
+    caminho_sol: str,
+    caminho_instancia: Optional[str] = None,
+    diretorio_cache: Optional[str] = None
+) -> RelatorioValidacao:
+    """valida um .sol do CVRPLIB contra a instância (por padrão, o .vrp com o mesmo nome)"""
+    caminho_instancia = caminho_instancia or os.path.splitext(caminho_sol)[0] + ".vrp"
+    instancia = le_instancia(caminho_instancia, diretorio_cache)
+    return _valida_arquivo_sol(caminho_sol, instancia, instancia.matriz())
+
+
+def _valida_arquivo_sol(caminho_sol: str, instancia: InstanciaCVRP, G: MatrizDistancias) -> RelatorioValidacao:
+    _, demands, capacity, depot = instancia.como_dicionarios()
+    rotas, custo = le_solucao(caminho_sol)
+    try:
+        rotas = rotas_do_cvrplib(rotas, G, depot)
+    except ValueError as erro:
+        relatorio = RelatorioValidacao(custo_informado=custo, erros=[str(erro)])
+    else:
+        relatorio = valida_solucao(G, rotas, demands, depot, capacity, custo)
+    relatorio.instancia = instancia.nome
+    relatorio.origem = os.path.basename(caminho_sol)
+    return relatorio
+
+
+def _le_resultados(caminho: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(origem, resultado) de um JSON ou CSV salvo pela linha de comando (`salvar_solucoes`)"""
+    nome = os.path.basename(caminho)
+    if caminho.endswith(".json"):
+        with open(caminho) as f:
+            dados = json.load(f)
+        for k, resultado in enumerate(dados if isinstance(dados, list) else [dados], 1):
+            yield f"{nome}#{k}", resultado
+        return
+    with open(caminho, newline="") as f:
+        for k, linha in enumerate(csv.DictReader(f), 1):
+            if linha.get("rotas"):
+                linha["rotas"] = json.loads(linha["rotas"])
+            yield f"{nome}#{k}", linha
+
+
+def _arquivos(caminhos: Sequence[str]) -> List[str]:
+    """arquivos .json, .csv e .sol dos caminhos, entrando nas pastas"""
+    arquivos: List[str] = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            arquivos.extend(sorted(
+                os.path.join(caminho, nome) for nome in os.listdir(caminho)
+                if os.path.splitext(nome)[1] in (".json", ".csv", ".sol")
+            ))
+        elif os.path.isfile(caminho):
+            arquivos.append(caminho)
+        else:
+            raise FileNotFoundError(f"Arquivo ou pasta não encontrado: {caminho}")
+    return arquivos
+
+
+def valida_resultados(
+    caminhos: Sequence[str],
+    diretorio_instancias: Optional[str] = None,
+    diretorio_cache: Optional[str] = None
+) -> List[RelatorioValidacao]:
+    """
+    valida em lote os arquivos e pastas de `caminhos`: soluções em JSON ou CSV salvas pela linha
+    de comando (precisam dos campos instancia, rotas e custo; linhas sem rotas, como as do
+    benchmark, são ignoradas) e arquivos .sol do CVRPLIB.
+
+    a instância de cada solução é procurada pelo nome na pasta do arquivo e depois em
+    `diretorio_instancias` (padrão: src/instancias); cada instância é lida uma vez só.
+    """
+    if diretorio_instancias is None:
+        from utils.api import DIR_INSTANCIAS
+        diretorio_instancias = DIR_INSTANCIAS
+    # caminho do .vrp -> (instância, matriz); a matriz é guardada para reaproveitar o cache das linhas
+    instancias: Dict[str, Tuple[InstanciaCVRP, MatrizDistancias]] = {}
+
+    def carrega(nome: str, pasta: str) -> Optional[str]:
+        for diretorio in (pasta, diretorio_instancias):
+            caminho = os.path.join(diretorio, nome + ".vrp")
+            if os.path.isfile(caminho):
+                if caminho not in instancias:
+                    instancia = le_instancia(caminho, diretorio_cache)
+                    instancias[caminho] = instancia, instancia.matriz()
+                return caminho
+        return None
+
+    relatorios: List[RelatorioValidacao] = []
+    for arquivo in _arquivos(caminhos):
+        pasta = os.path.dirname(arquivo)
+        if arquivo.endswith(".sol"):
+            nome = os.path.splitext(os.path.basename(arquivo))[0]
+            caminho = carrega(nome, pasta)
+            if caminho is None:
+                relatorios.append(RelatorioValidacao(nome, os.path.basename(arquivo), erros=["instância não encontrada"]))
+            else:
+                relatorios.append(_valida_arquivo_sol(arquivo, *instancias[caminho]))
+            continue
+
+        for origem, resultado in _le_resultados(arquivo):
+            if not resultado.get("rotas"):
+                continue
+            nome = str(resultado.get("instancia", ""))
+            if resultado.get("algoritmo"):
+                origem += f" {resultado['algoritmo']}"
+            caminho = carrega(nome, pasta)
+            if caminho is None:
+                relatorios.append(RelatorioValidacao(nome, origem, erros=["instância não encontrada"]))
+                continue
+            instancia, G = instancias[caminho]
+            _, demands, capacity, depot = instancia.como_dicionarios()
+            custo = resultado.get("custo")
+            relatorio = valida_solucao(
+                G, resultado["rotas"], demands, depot, capacity,
+                float(custo) if custo not in (None, "") else None, custo_referencia(caminho)
+            )
+            relatorio.instancia = nome
+            relatorio.origem = origem
+            relatorios.append(relatorio)
+    return relatorios
@@ -0,0 +1,78 @@
+from typing import Sequence
+import math
+import numpy as np
+
+# número médio de pontos por célula da grade
+_PONTOS_POR_CELULA = 2.0
+# valor usado para tirar o próprio ponto da disputa pelos vizinhos
+_INFINITO = 1 << 40
+
+
+class IndiceVizinhos:
+    """
+    grade uniforme sobre as coordenadas dos nós para responder consultas de k vizinhos mais
+    próximos sem varrer a matriz inteira: cada ponto só compara as distâncias com os pontos das
+    células em volta, aumentando o anel de células até garantir que nenhum ponto de fora está
+    mais perto. as distâncias comparadas são as da matriz (já arredondadas), então o resultado
+    é o mesmo de ordenar a linha inteira da matriz por (distância, posição).
+    """
+
+    __slots__ = ("matriz", "lado", "colunas", "linhas", "ordem", "inicio")
+
+    def __init__(self, xy: np.ndarray, matriz: np.ndarray) -> None:
+        self.matriz = matriz
+        n = xy.shape[0]
+        minimo = xy.min(axis=0)
+        largura, altura = np.maximum(xy.max(axis=0) - minimo, 1e-9)
+        self.lado = max(math.sqrt(largura * altura * _PONTOS_POR_CELULA / max(n, 1)), 1e-9)
+        self.colunas = int(largura // self.lado) + 1
+        self.linhas = int(altura // self.lado) + 1
+
+        cx = np.minimum(((xy[:, 0] - minimo[0]) // self.lado).astype(np.int64), self.colunas - 1)
+        cy = np.minimum(((xy[:, 1] - minimo[1]) // self.lado).astype(np.int64), self.linhas - 1)
+        celula = cy * self.colunas + cx
+        # pontos ordenados por célula; os pontos da célula c são ordem[inicio[c]:inicio[c + 1]]
+        self.ordem = np.argsort(celula, kind="stable").astype(np.int32)
+        contagem = np.bincount(celula, minlength=self.colunas * self.linhas)
+        self.inicio = np.concatenate(([0], np.cumsum(contagem)))
+
+    def k_vizinhos(self, k: int, excluir: Sequence[int] = ()) -> np.ndarray:
+        """
+        matriz (n, k) com as posições dos k pontos mais próximos de cada ponto (sem ele mesmo e sem
+        as posições em `excluir`), em ordem crescente de distância e, nos empates, de posição.
+        `k` deve ser no máximo n - 1 - len(excluir).
+        """
+        n = self.ordem.size
+        vizinhos = np.empty((n, k), dtype=np.int32)
+        if k == 0:
+            return vizinhos
+        valido = np.ones(n, dtype=bool)
+        valido[list(excluir)] = False
+        inicio = self.inicio.tolist()
+        raio_inicial = max(1, math.ceil(math.sqrt((k + 1) / _PONTOS_POR_CELULA) / 2))
+
+        for celula in np.flatnonzero(np.diff(self.inicio)).tolist():
+            cy, cx = divmod(celula, self.colunas)
+            pontos = self.ordem[inicio[celula]:inicio[celula + 1]]
+            raio = raio_inicial
+            while True:
+                x0, x1 = max(0, cx - raio), min(self.colunas - 1, cx + raio)
+                y0, y1 = max(0, cy - raio), min(self.linhas - 1, cy + raio)
+                cobre_tudo = x0 == 0 and y0 == 0 and x1 == self.colunas - 1 and y1 == self.linhas - 1
+                candidatos = np.concatenate([
+                    self.ordem[inicio[y * self.colunas + x0]:inicio[y * self.colunas + x1 + 1]]
+                    for y in range(y0, y1 + 1)
+                ])
+                candidatos = candidatos[valido[candidatos]]
+                if candidatos.size > k or cobre_tudo:
+                    distancias = self.matriz[pontos[:, None], candidatos[None, :]].astype(np.int64)
+                    distancias[pontos[:, None] == candidatos[None, :]] = _INFINITO
+                    # chave única (distância, posição) para desempatar sempre do mesmo jeito
+                    chaves = np.partition(distancias * n + candidatos, k - 1, axis=1)[:, :k]
+                    chaves.sort(axis=1)
+                    # um ponto fora do quadrado está a pelo menos raio * lado (menos 1 do arredondamento)
+                    if cobre_tudo or (chaves[:, -1] // n < raio * self.lado - 1).all():
+                        vizinhos[pontos] = chaves % n
+                        break
+                raio += 1
+        return vizinhos